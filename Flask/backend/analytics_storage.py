@@ -0,0 +1,118 @@
+"""
+Compact storage for UserAnalytics payloads.
+
+In 'full' mode the whole tracker payload is kept in `analytics_metadata`,
+duplicating every value that also lands in a typed column. In 'compact' mode
+(ANALYTICS_STORAGE_MODE=compact) only the residual - fields the typed columns
+do not capture exactly - is kept, zlib-compressed, in `analytics_payload`,
+and `rebuild_payload` puts the original payload back together on read.
+Exports and archives go through `plain_row`, so they always carry the full
+payload in `analytics_metadata` and never the binary column.
+
+A value is only dropped from the residual when its typed column stores it
+without loss (ints in Integer columns, floats in Float columns, strings that
+fit their String column), so rebuilding never changes a value or its type.
+"""
+
+import copy
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Payload path -> (UserAnalytics column, Python type the column stores exactly)
+FIELD_MAP = [
+    (('pageUrl',), 'page_url', str),
+    (('userAgent',), 'user_agent', str),
+    (('typing', 'wpm'), 'typing_wpm', float),
+    (('typing', 'keystrokes'), 'typing_keystrokes', int),
+    (('typing', 'backspaces'), 'typing_corrections', int),
+    (('mouse', 'clicks'), 'mouse_clicks', int),
+    (('mouse', 'totalDistance'), 'mouse_movements', int),
+    (('mouse', 'averageSpeed'), 'mouse_velocity', float),
+    (('mouse', 'idleTime'), 'mouse_idle_time', int),
+    (('scroll', 'maxDepth'), 'scroll_depth', float),
+    (('scroll', 'scrollSpeed'), 'scroll_speed', float),
+    (('scroll', 'totalScrollDistance'), 'scroll_events', int),
+    (('focus', 'totalFocusTime'), 'focus_time', int),
+    (('focus', 'tabSwitches'), 'tab_switches', int),
+    (('sessionDuration',), 'session_duration', int),
+]
+
+# Leading byte of an encoded residual
+_MSGPACK = b'M'
+_JSON = b'J'
+
+
+def _string_limit(column_name):
+    from .models import UserAnalytics
+    return getattr(UserAnalytics.__table__.c[column_name].type, 'length', None)
+
+
+def _stored_exactly(value, column_name, python_type):
+    if type(value) is not python_type:
+        return False
+    if python_type is str:
+        limit = _string_limit(column_name)
+        return limit is None or len(value) <= limit
+    return True
+
+
+def residual_payload(data):
+    """Copy of `data` without the values the typed columns already hold exactly."""
+    residual = copy.deepcopy(data)
+    for path, column_name, python_type in FIELD_MAP:
+        parent = residual
+        for key in path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict) or path[-1] not in parent:
+            continue
+        if _stored_exactly(parent[path[-1]], column_name, python_type):
+            del parent[path[-1]]
+            if len(path) > 1 and not parent:
+                # Recreated on rebuild from the values that were removed
+                del residual[path[0]]
+    return residual
+
+
+def pack(residual):
+    if msgpack is not None:
+        return _MSGPACK + zlib.compress(msgpack.packb(residual, use_bin_type=True))
+    return _JSON + zlib.compress(json.dumps(residual, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack(blob):
+    kind, body = blob[:1], zlib.decompress(blob[1:])
+    if kind == _MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("msgpack is required to read compact analytics payloads")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def rebuild_payload(record):
+    """The original payload of a UserAnalytics row (model or column dict), whichever mode stored it."""
+    get = record.get if isinstance(record, dict) else lambda name: getattr(record, name)
+    if get('analytics_payload') is None:
+        return get('analytics_metadata')
+
+    payload = unpack(get('analytics_payload'))
+    for path, column_name, _ in FIELD_MAP:
+        value = get(column_name)
+        if value is None:
+            continue
+        parent = payload
+        for key in path[:-1]:
+            parent = parent.setdefault(key, {})
+        parent.setdefault(path[-1], value)
+    return payload
+
+
+def plain_row(row):
+    """Column dict of a UserAnalytics row with the rebuilt payload in place of `analytics_payload`."""
+    row['analytics_metadata'] = rebuild_payload(row)
+    del row['analytics_payload']
+    return row
@@ -0,0 +1,426 @@
+"""
+Merkle-batched anchoring of AuditLog rows.
+
+Hashing and committing every audit event on its own (as the blockchain demo
+scripts and CyberIdentity.logSession do) costs one external write per
+event. Instead, every AUDIT_ANCHOR_INTERVAL seconds the anchorer takes the
+AuditLog rows written since the last anchor, hashes each row's canonical
+content (models.audit_canonical_bytes) into a leaf, builds a Merkle tree
+and commits only the root to a sink. An AuditAnchor row records the id
+range, root and the sink's receipt.
+
+Any row can then get an inclusion proof: its leaf hash and the log2(n)
+sibling hashes up to the anchored root. `verify_proof` checks a proof in
+O(log n) without the other rows. Leaves and nodes are hashed with distinct
+prefixes (0x00 / 0x01, as in RFC 6962). An odd node at the end of a level
+is promoted unchanged.
+
+Sinks are chosen by AUDIT_ANCHOR_SINK URL:
+
+- `file:///path/anchors.jsonl`: appends one JSON line per root, a local
+  stand-in for an external append-only log;
+- `memory://name`: `MemoryLedger`, an in-process chain of blocks shared by
+  all anchorers of the process, for tests;
+- `cyberidentity://name`: logs each root with CyberIdentity.logSession on
+  the simulated ledger in ledger_sim.py;
+- anything registered with `register_sink(scheme, factory)`.
+
+Batches are contiguous id ranges, so an id that is not visible yet must not
+end up inside one. Row timestamps can't tell: they are set by the app (or
+are the ingest `received_at`), not at commit. What is visible is a gap. On
+PostgreSQL and MySQL, ids are handed out before commit, so a missing id below
+the highest committed one is either a transaction still in flight or a
+rollback. A batch stops before the first gap until this anchorer has seen the
+gap for AUDIT_ANCHOR_SETTLE_SECONDS, and only then treats it as rolled back.
+A transaction that commits later than that lands inside an anchored range.
+Its row is reported by `verify` and makes proofs for that batch fail with a
+409, so the setting must exceed the longest write transaction. On SQLite,
+writers are serialized and ids are never committed out of order, so gaps only
+come from deletes.
+
+Proofs are rebuilt from the rows themselves, so once retention has archived
+part of a batch its remaining rows can no longer be proven (410).
+
+Usage (from the Flask directory):
+    python -m backend.anchoring run
+    python -m backend.anchoring proof 1234
+    python -m backend.anchoring verify
+"""
+
+import argparse
+import atexit
+import bisect
+import collections
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import sqlalchemy as sa
+
+# Use relative imports for local modules
+from .database import db
+from .models import AuditLog, AuditAnchor, audit_canonical_bytes
+
+logger = logging.getLogger(__name__)
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+class AnchorError(Exception):
+    pass
+
+
+class AnchorRowsMissing(AnchorError):
+    """Rows of an anchored batch were deleted (e.g. archived by retention)."""
+
+
+# === Merkle trees ===
+
+def leaf_hash(canonical):
+    return hashlib.sha256(LEAF_PREFIX + canonical).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def merkle_levels(leaves):
+    """All levels of the tree, leaves first and the root last."""
+    if not leaves:
+        raise AnchorError("Cannot build a Merkle tree without leaves")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def inclusion_proof(levels, index):
+    """Sibling hashes from leaf `index` up to the root, as [('L' | 'R', hex), ...]."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(('L' if sibling < index else 'R', level[sibling].hex()))
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    """True if `proof` links `leaf` to `root` (bytes or hex)."""
+    node = bytes.fromhex(leaf) if isinstance(leaf, str) else leaf
+    root = bytes.fromhex(root) if isinstance(root, str) else root
+    for side, sibling in proof:
+        sibling = bytes.fromhex(sibling)
+        node = node_hash(sibling, node) if side == 'L' else node_hash(node, sibling)
+    return node == root
+
+
+# === Sinks ===
+
+class FileSink:
+    """Appends one JSON line per root to a local file."""
+
+    name = 'file'
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.path = os.path.abspath(parsed.netloc + parsed.path)
+        self._lock = threading.Lock()
+
+    def commit(self, root, first_id, last_id, leaf_count):
+        record = {'root': root, 'first_id': first_id, 'last_id': last_id, 'leaf_count': leaf_count,
+                  'anchored_at': datetime.datetime.utcnow().isoformat()}
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                offset = f.tell()
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        return f'{self.path}@{offset}'
+
+    def lookup(self, receipt):
+        """Root committed under `receipt`, or None."""
+        path, _, offset = receipt.rpartition('@')
+        try:
+            with open(path, encoding='utf-8') as f:
+                f.seek(int(offset))
+                return json.loads(f.readline())['root']
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+class MemoryLedger:
+    """In-process ledger: one block per committed root, shared per ledger name."""
+
+    name = 'memory'
+
+    _chains = collections.defaultdict(list)
+    _lock = threading.Lock()
+
+    def __init__(self, url='memory://default'):
+        self.chain = self._chains[urlparse(url).netloc or 'default']
+
+    def commit(self, root, first_id, last_id, leaf_count):
+        with self._lock:
+            previous = self.chain[-1]['hash'] if self.chain else '0' * 64
+            block = {'number': len(self.chain), 'root': root, 'first_id': first_id, 'last_id': last_id,
+                     'leaf_count': leaf_count, 'previous': previous}
+            block['hash'] = hashlib.sha256(json.dumps(block, sort_keys=True).encode()).hexdigest()
+            self.chain.append(block)
+        return f"block:{block['number']}"
+
+    def lookup(self, receipt):
+        number = int(receipt.split(':', 1)[1])
+        return self.chain[number]['root'] if number < len(self.chain) else None
+
+
+def _cyberidentity_sink(url):
+    # ledger_sim builds on the Merkle helpers above, so import it on first use
+    from .ledger_sim import CyberIdentitySink
+    return CyberIdentitySink(url)
+
+
+SINKS = {'file': FileSink, 'memory': MemoryLedger, 'cyberidentity': _cyberidentity_sink}
+
+
+def register_sink(scheme, factory):
+    """Make AUDIT_ANCHOR_SINK URLs with `scheme` use `factory(url)`."""
+    SINKS[scheme] = factory
+
+
+def create_sink(url):
+    scheme = urlparse(url).scheme
+    if scheme not in SINKS:
+        raise AnchorError(f"Unknown anchor sink '{scheme}' (known: {', '.join(sorted(SINKS))})")
+    return SINKS[scheme](url)
+
+
+# === Anchorer ===
+
+def _content_columns():
+    """The AuditLog columns hashed, in audit_canonical_bytes argument order."""
+    table = AuditLog.__table__
+    return table.c.id, table.c.user_id, table.c.action, table.c.details, table.c.timestamp
+
+
+def _audit_rows(first_id, last_id):
+    table = AuditLog.__table__
+    return db.session.execute(
+        sa.select(*_content_columns())
+        .where(table.c.id >= first_id, table.c.id <= last_id)
+        .order_by(table.c.id)
+    ).all()
+
+
+def _leaves(rows):
+    return [leaf_hash(audit_canonical_bytes(*row)) for row in rows]
+
+
+class AuditAnchorer:
+    def __init__(self, app, sink):
+        self.app = app
+        self.sink = sink
+        self.interval = app.config['AUDIT_ANCHOR_INTERVAL']
+        self.max_batch = app.config['AUDIT_ANCHOR_MAX_BATCH']
+        self.settle = app.config['AUDIT_ANCHOR_SETTLE_SECONDS']
+        # First missing id of each gap seen -> time.monotonic() it was first seen
+        self._gaps = {}
+        # First missing id the last anchor_pending stopped at, if any
+        self.waiting_on_gap = None
+        # anchor id -> (row ids, levels) of recently built trees
+        self._trees = collections.OrderedDict()
+        self._trees_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _remember(self, anchor_id, ids, levels):
+        with self._trees_lock:
+            self._trees[anchor_id] = (ids, levels)
+            while len(self._trees) > 8:
+                self._trees.popitem(last=False)
+
+    def _settled(self, last_anchored, ids):
+        """The leading ids that are safe to anchor: up to the first gap not yet settled."""
+        now = time.monotonic()
+        previous = last_anchored
+        for index, row_id in enumerate(ids):
+            if row_id != previous + 1:
+                first_seen = self._gaps.setdefault(previous + 1, now)
+                if now - first_seen < self.settle:
+                    self.waiting_on_gap = previous + 1
+                    return ids[:index]
+            previous = row_id
+        return ids
+
+    def anchor_pending(self):
+        """Anchor every settled, unanchored row in batches of AUDIT_ANCHOR_MAX_BATCH. Returns the new anchors."""
+        table = AuditLog.__table__
+        anchors = []
+        self.waiting_on_gap = None
+        while True:
+            last_anchored = db.session.scalar(sa.select(sa.func.max(AuditAnchor.last_id))) or 0
+            # Gaps already behind us are settled one way or the other
+            self._gaps = {start: seen for start, seen in self._gaps.items() if start > last_anchored}
+            ids = self._settled(last_anchored, db.session.scalars(
+                sa.select(table.c.id)
+                .where(table.c.id > last_anchored)
+                .order_by(table.c.id)
+                .limit(self.max_batch)
+            ).all())
+            if not ids:
+                return anchors
+            rows = _audit_rows(ids[0], ids[-1])
+            levels = merkle_levels(_leaves(rows))
+            root = levels[-1][0].hex()
+            anchor = AuditAnchor(first_id=rows[0][0], last_id=rows[-1][0], leaf_count=len(rows),
+                                 root=root, sink=self.sink.name)
+            try:
+                db.session.add(anchor)
+                db.session.flush()
+                anchor.receipt = self.sink.commit(root, anchor.first_id, anchor.last_id, anchor.leaf_count)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            self._remember(anchor.id, [row[0] for row in rows], levels)
+            logger.info(f"Anchored audit rows {anchor.first_id}-{anchor.last_id} ({anchor.leaf_count}) root {root[:16]}")
+            anchors.append(anchor)
+
+    def _tree(self, anchor):
+        with self._trees_lock:
+            cached = self._trees.get(anchor.id)
+        if cached:
+            return cached
+        rows = _audit_rows(anchor.first_id, anchor.last_id)
+        if len(rows) < anchor.leaf_count:
+            raise AnchorRowsMissing(f"Anchor {anchor.id} covers {anchor.leaf_count} rows but only {len(rows)} "
+                                    f"remain; the batch was partially archived")
+        if len(rows) > anchor.leaf_count:
+            raise AnchorError(f"Anchor {anchor.id} covers {anchor.leaf_count} rows but {len(rows)} are in its "
+                              f"range; a transaction committed into it after it was anchored")
+        ids, levels = [row[0] for row in rows], merkle_levels(_leaves(rows))
+        self._remember(anchor.id, ids, levels)
+        return ids, levels
+
+    def proof(self, audit_id):
+        """Inclusion proof for one AuditLog row, or None if it isn't anchored yet."""
+        anchor = db.session.scalars(
+            sa.select(AuditAnchor).where(AuditAnchor.first_id <= audit_id, AuditAnchor.last_id >= audit_id)
+        ).first()
+        if anchor is None:
+            return None
+        row = db.session.execute(sa.select(*_content_columns()).where(AuditLog.id == audit_id)).first()
+        if row is None:
+            return None
+        ids, levels = self._tree(anchor)
+        index = bisect.bisect_left(ids, audit_id)
+        leaf = leaf_hash(audit_canonical_bytes(*row))
+        proof = inclusion_proof(levels, index)
+        return {
+            'audit_id': audit_id,
+            'leaf': leaf.hex(),
+            'index': index,
+            'leaf_count': anchor.leaf_count,
+            'proof': proof,
+            'root': anchor.root,
+            'anchor_id': anchor.id,
+            'sink': anchor.sink,
+            'receipt': anchor.receipt,
+            # False if the row changed after it was anchored
+            'verified': verify_proof(leaf, proof, anchor.root),
+        }
+
+    def verify_anchor(self, anchor):
+        """Recompute an anchor's root from its rows and check it against the record and the sink."""
+        rows = _audit_rows(anchor.first_id, anchor.last_id)
+        if len(rows) < anchor.leaf_count:
+            return False, f"{anchor.leaf_count - len(rows)} rows missing"
+        if len(rows) > anchor.leaf_count:
+            return False, f"{len(rows) - anchor.leaf_count} rows committed into the range after anchoring"
+        root = merkle_levels(_leaves(rows))[-1][0].hex()
+        if root != anchor.root:
+            return False, "rows changed since anchoring"
+        if anchor.sink == self.sink.name and self.sink.lookup(anchor.receipt) != anchor.root:
+            return False, "root in the sink does not match"
+        return True, 'ok'
+
+    # === Lifecycle ===
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.anchor_pending()
+                except Exception:
+                    logger.exception("Audit anchoring failed")
+                finally:
+                    db.session.remove()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='audit-anchor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def init_anchoring(app, start=True):
+    """Create the anchorer for AUDIT_ANCHOR_SINK, running every AUDIT_ANCHOR_INTERVAL unless `start` is False."""
+    url = app.config.get('AUDIT_ANCHOR_SINK')
+    if not url:
+        return None
+    anchorer = AuditAnchorer(app, create_sink(url))
+    if start and app.config['AUDIT_ANCHOR_INTERVAL'] > 0:
+        anchorer.start()
+        atexit.register(anchorer.stop)
+    app.extensions['audit_anchorer'] = anchorer
+    return anchorer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merkle-anchor AuditLog rows')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('run', help='Anchor all unanchored rows once (waiting out any gap in ids)')
+    proof = sub.add_parser('proof', help='Print the inclusion proof of an audit row')
+    proof.add_argument('audit_id', type=int)
+    sub.add_parser('verify', help='Recompute every anchor root and compare')
+    args = parser.parse_args()
+
+    from .app import create_app
+    app = create_app()
+    with app.app_context():
+        anchorer = app.extensions.get('audit_anchorer') or AuditAnchorer(app, create_sink('memory://cli'))
+        if anchorer.sink.name == 'memory':
+            print("AUDIT_ANCHOR_SINK is not set; using a throwaway in-process ledger")
+        if args.command == 'run':
+            anchors = anchorer.anchor_pending()
+            if anchorer.waiting_on_gap is not None:
+                # A fresh process has not seen the gap before; give it the settle time once
+                print(f"Waiting {anchorer.settle}s for id {anchorer.waiting_on_gap} to commit or settle as rolled back")
+                time.sleep(anchorer.settle)
+                anchors += anchorer.anchor_pending()
+            print(f"Created {len(anchors)} anchors covering {sum(a.leaf_count for a in anchors)} rows")
+        elif args.command == 'proof':
+            print(json.dumps(anchorer.proof(args.audit_id), indent=2))
+        else:
+            failures = 0
+            for anchor in db.session.scalars(sa.select(AuditAnchor).order_by(AuditAnchor.id)):
+                ok, reason = anchorer.verify_anchor(anchor)
+                failures += not ok
+                print(f"anchor {anchor.id} ({anchor.first_id}-{anchor.last_id}): {reason}")
+            raise SystemExit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
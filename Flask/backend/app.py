@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, g
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 import logging
 import random
@@ -17,7 +17,22 @@ from .auth import (
 )
 from .biometrics import analyze_user_behavior
 from .risk_assessment import assess_user_risk
-from .websocket import init_socketio
+from .retention import ARCHIVED_TABLES, search_archive
+from . import rollups
+from .analytics_storage import rebuild_payload
+from .ingestion import analytics_values, store_batch
+from .anchoring import AnchorError, AnchorRowsMissing, init_anchoring
+from .ingest_queue import IngestQueueFull, IngestUnavailable, init_ingest_queue, validate as validate_ingest
+from .export import EXPORTABLE_TABLES, FORMATS as EXPORT_FORMATS, export_stream
+from .json_provider import init_json
+from .decoders import FINGERPRINT, RISK, DecodeError, decode_id
+from .request_bodies import PayloadError, read_payload
+from .pagination import PaginationError, keyset_page, page_params, parse_datetime_arg, stream_rows
+from .live_metrics import init_live_metrics, live_metrics
+from .metrics import init_metrics
+from .profiling import format_folded, init_profiling, pstats_bytes
+from .risk_events import init_risk_events, risk_events
+from .websocket import broadcast_stats, init_socketio
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -26,6 +41,7 @@ logger = logging.getLogger("walmart_secure_backend")
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    init_json(app)
     
     # Enhanced CORS configuration
     CORS(app, 
@@ -35,10 +51,26 @@ def create_app():
          supports_credentials=app.config.get('CORS_SUPPORTS_CREDENTIALS', True))
     
     init_db(app)
+    init_metrics(app)
+    profiler = init_profiling(app)
+    init_live_metrics(app)
+    init_risk_events(app)
     
     # Initialize SocketIO
     socketio = init_socketio(app)
 
+    # Background writers for the tracker endpoints (INGEST_MODE=async only)
+    ingest = init_ingest_queue(app)
+    anchorer = init_anchoring(app)
+
+    def enqueue(kind, user_id, data, **extra):
+        """Validate and queue a tracker payload, answering 202 Accepted."""
+        error = validate_ingest(kind, data)
+        if error:
+            return jsonify({'error': 'Invalid payload', 'message': error}), 400
+        ingest.submit(kind, user_id, data)
+        return jsonify({'success': True, 'status': 'queued', **extra}), 202
+
     @app.route('/')
     def health_check():
         return jsonify({
@@ -60,6 +92,7 @@ def create_app():
         new_user = User(email=data['email'], password_hash=hashed_pwd)
         db.session.add(new_user)
         db.session.commit()
+        live_metrics.record_signup()
 
         return jsonify({'message': 'User created successfully'}), 201
 
@@ -79,6 +112,7 @@ def create_app():
                     self.role = 'admin'
             
             mock_admin = MockAdminUser()
+            live_metrics.record_login(True, mock_admin.id)
             token = create_token(mock_admin.id, mock_admin.email, mock_admin.role)
             
             return jsonify({
@@ -93,7 +127,9 @@ def create_app():
         user = User.query.filter_by(email=data['email']).first()
 
         if not user or not verify_password(data['password'], user.password_hash):
+            live_metrics.record_login(False)
             return jsonify({'message': 'Invalid credentials'}), 401
+        live_metrics.record_login(True, user.id)
         
         token = create_token(user.id, user.email, user.role)
 
@@ -153,7 +189,7 @@ def create_app():
                 
             # Mock OTP validation
             otp_code = data.get('otp_code', '')
-            user_id = data.get('user_id')
+            user_id = decode_id(data.get('user_id'))
             
             # Simulate OTP validation
             is_valid = len(otp_code) == 6 and otp_code.isdigit()
@@ -170,6 +206,7 @@ def create_app():
             )
             db.session.add(log_entry)
             db.session.commit()
+            live_metrics.record_otp(is_valid, user_id)
             
             return jsonify({
                 'success': is_valid,
@@ -189,45 +226,59 @@ def create_app():
         if request.method == 'GET':
             # Return user analytics data
             try:
-                total_users = User.query.count()
+                total_users = rollups.total('user_signup')
                 active_users = random.randint(total_users // 2, total_users)
+                today = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+                new_users_today = rollups.total('user_signup', since=today)
+                risk_counts = rollups.totals_by_dimension('risk_label')
+                action_counts = rollups.totals_by_dimension('audit_action')
+                hourly = rollups.hourly_counts('audit_action', hours=24)
             except Exception as e:
                 # Fallback if database is not available
                 total_users = 0
                 active_users = 0
+                new_users_today = 0
+                risk_counts = {}
+                action_counts = {}
+                hourly = []
+
+            # Risk distribution as percentages of all assessments
+            total_assessments = sum(risk_counts.values())
+            risk_distribution = {
+                label: round(100.0 * risk_counts.get(label, 0) / total_assessments, 1) if total_assessments else 0
+                for label in ('low', 'medium', 'high')
+            }
+            top_activities = sorted(action_counts.items(), key=lambda item: item[1], reverse=True)[:3]
             
             return jsonify({
                 'total_users': total_users,
                 'active_users': active_users,
-                'new_users_today': random.randint(0, 10),
+                'new_users_today': new_users_today,
                 'login_success_rate': round(random.uniform(85, 98), 2),
                 'average_session_duration': random.randint(300, 1800),
-                'risk_distribution': {
-                    'low': random.randint(60, 80),
-                    'medium': random.randint(15, 30),
-                    'high': random.randint(1, 10)
-                },
+                'risk_distribution': risk_distribution,
                 'top_activities': [
-                    {'activity': 'login', 'count': random.randint(100, 500)},
-                    {'activity': 'risk_assessment', 'count': random.randint(50, 200)},
-                    {'activity': 'profile_update', 'count': random.randint(20, 100)}
+                    {'activity': action, 'count': count} for action, count in top_activities
                 ],
                 'hourly_activity': [
-                    {'hour': i, 'activity_count': random.randint(10, 100)} 
-                    for i in range(24)
+                    {'hour': hour.hour, 'activity_count': count}
+                    for hour, count in hourly
                 ]
             })
         
         elif request.method == 'POST':
             # Handle analytics data submission
-            data = request.get_json()
+            data = read_payload()
             if not data:
                 return jsonify({'error': 'No data provided'}), 400
+            user_id = decode_id(data.get('user_id'))
+            if ingest:
+                return enqueue('event', user_id, data, message='Analytics data accepted')
                 
             try:
                 # Log analytics event
                 log_entry = AuditLog(
-                    user_id=data.get('user_id'),
+                    user_id=user_id,
                     action='analytics_event',
                     details=data
                 )
@@ -254,9 +305,13 @@ def create_app():
     @app.route('/api/fingerprint/update', methods=['POST'])
     @token_required
     def update_fingerprint(current_user):
-        data = request.get_json()
+        data = read_payload()
         if not data:
             return jsonify({"error": "No data provided"}), 400
+        if ingest:
+            return enqueue('fingerprint', current_user.id, data, message='Fingerprint update accepted',
+                           confidence_score=round(random.uniform(0.75, 0.95), 2))  # Mock score
+        FINGERPRINT.decode(data)
 
         new_fingerprint = BehavioralData(user_id=current_user.id, fingerprint_data=data)
         db.session.add(new_fingerprint)
@@ -274,6 +329,7 @@ def create_app():
         data = request.get_json()
         if not data:
             return jsonify({"error": "No data provided"}), 400
+        FINGERPRINT.decode(data)
 
         analysis_result = analyze_user_behavior(current_user, data)
 
@@ -287,7 +343,7 @@ def create_app():
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        assessment_result = assess_user_risk(current_user, data)
+        assessment_result = assess_user_risk(current_user, RISK.decode(data))
         return jsonify(assessment_result)
 
     # === Real-time Analytics Endpoints ===
@@ -320,9 +376,10 @@ def create_app():
     @app.route('/api/analytics/dashboard', methods=['GET'])
     @admin_required
     def get_dashboard_data(current_user):
-        active_sessions = User.query.count()
-        high_risk_count = RiskAssessment.query.filter(RiskAssessment.risk_label == 'high').count()
-        login_attempts = AuditLog.query.filter(AuditLog.action == 'login_success').count()
+        # Read from the rollups instead of counting the event tables
+        active_sessions = rollups.total('user_signup')
+        high_risk_count = rollups.total('risk_label', 'high')
+        login_attempts = rollups.total('audit_action', 'login_success')
         
         return jsonify({
             "active_sessions": active_sessions,
@@ -335,48 +392,19 @@ def create_app():
     @app.route('/api/analytics/store', methods=['POST'])
     @token_required
     def store_user_analytics(current_user):
-        data = request.get_json()
+        data = read_payload()
         if not data:
             return jsonify({"error": "No data provided"}), 400
+        if ingest:
+            return enqueue('analytics', current_user.id, data, message='Analytics data accepted')
 
         # Create a new UserAnalytics record
-        analytics = UserAnalytics(
-            user_id=current_user.id,
-            session_id=data.get('sessionId', ''),
-            page_url=data.get('pageUrl'),
-            user_agent=data.get('userAgent'),
-            
-            # Typing metrics
-            typing_wpm=data.get('typing', {}).get('wpm'),
-            typing_keystrokes=data.get('typing', {}).get('keystrokes'),
-            typing_corrections=data.get('typing', {}).get('backspaces'),
-            
-            # Mouse metrics
-            mouse_clicks=data.get('mouse', {}).get('clicks'),
-            mouse_movements=data.get('mouse', {}).get('totalDistance'),
-            mouse_velocity=data.get('mouse', {}).get('averageSpeed'),
-            mouse_idle_time=data.get('mouse', {}).get('idleTime'),
-            
-            # Scroll metrics
-            scroll_depth=data.get('scroll', {}).get('maxDepth'),
-            scroll_speed=data.get('scroll', {}).get('scrollSpeed'),
-            scroll_events=data.get('scroll', {}).get('totalScrollDistance'),
-            
-            # Focus metrics
-            focus_changes=data.get('focus', {}).get('focusEvents') + data.get('focus', {}).get('blurEvents', 0),
-            focus_time=data.get('focus', {}).get('totalFocusTime'),
-            tab_switches=data.get('focus', {}).get('tabSwitches'),
-            
-            # Session metrics
-            session_duration=data.get('sessionDuration'),
-            interactions_count=data.get('typing', {}).get('keystrokes', 0) + data.get('mouse', {}).get('clicks', 0),
-            
-            # Store the original data as analytics_metadata
-            analytics_metadata=data
-        )
+        values = analytics_values(current_user.id, data, app.config['ANALYTICS_STORAGE_MODE'])
+        analytics = UserAnalytics(**values)
         
         db.session.add(analytics)
         db.session.commit()
+        live_metrics.record_analytics(current_user.id, values['session_duration'])
 
         return jsonify({
             "success": True,
@@ -384,6 +412,38 @@ def create_app():
             "analytics_id": analytics.id
         })
 
+    @app.route('/api/analytics/batch', methods=['POST'])
+    @token_required
+    def store_analytics_batch(current_user):
+        data = read_payload()
+        # Either a bare array of snapshots or {"snapshots": [...], "events": [...]}
+        if isinstance(data, list):
+            data = {'snapshots': data}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected an array of snapshots or an object with 'snapshots'/'events'"}), 400
+        snapshots = data.get('snapshots', [])
+        events = data.get('events', [])
+        if not isinstance(snapshots, list) or not isinstance(events, list):
+            return jsonify({"error": "'snapshots' and 'events' must be arrays"}), 400
+        if not snapshots and not events:
+            return jsonify({"error": "No data provided"}), 400
+        if len(snapshots) + len(events) > app.config['ANALYTICS_BATCH_MAX_ITEMS']:
+            return jsonify({"error": f"Batch exceeds {app.config['ANALYTICS_BATCH_MAX_ITEMS']} items"}), 413
+
+        snapshot_results, event_results = store_batch(
+            current_user.id, snapshots, events, app.config['ANALYTICS_STORAGE_MODE']
+        )
+        results = snapshot_results + event_results
+        stored = sum(1 for result in results if result['status'] == 'stored')
+
+        return jsonify({
+            "success": stored == len(results),
+            "stored": stored,
+            "rejected": len(results) - stored,
+            "snapshots": snapshot_results,
+            "events": event_results
+        })
+
     @app.route('/api/analytics/user/<int:user_id>', methods=['GET'])
     @token_required
     def get_user_analytics(current_user, user_id):
@@ -404,7 +464,7 @@ def create_app():
             'focus_time': record.focus_time,
             'session_duration': record.session_duration,
             'created_at': record.created_at.isoformat(),
-            'analytics_metadata': record.analytics_metadata
+            'analytics_metadata': rebuild_payload(record)
         } for record in analytics])
 
     # === Risk Score Endpoint (for compatibility) ===
@@ -416,7 +476,8 @@ def create_app():
         
         # For non-authenticated users, create a simplified assessment
         # This is useful for the shop page where users might not be logged in
-        user_id = data.get('user_id')
+        risk_request = RISK.decode(data)
+        user_id = risk_request.user_id
         user = None
         
         if user_id:
@@ -439,34 +500,206 @@ def create_app():
             })
         
         # If user is authenticated, use the proper risk assessment
-        assessment_result = assess_user_risk(user, data)
+        assessment_result = assess_user_risk(user, risk_request)
         return jsonify(assessment_result)
 
     # === Admin Endpoints ===
     @app.route('/api/admin/users', methods=['GET'])
     @admin_required
     def get_users(current_user):
-        users = User.query.all()
-        return jsonify([{
+        limit, cursor, output = page_params()
+        page, next_cursor = keyset_page(User.query, [User.id], [int], cursor, limit, descending=False)
+        return stream_rows(page, lambda user: {
             'id': user.id,
             'email': user.email,
             'role': user.role,
             'created_at': user.created_at.isoformat()
-        } for user in users])
+        }, output, next_cursor)
 
     @app.route('/api/admin/audit-logs', methods=['GET'])
     @admin_required
     def get_audit_logs(current_user):
-        logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).limit(100).all()
-        return jsonify([{
+        limit, cursor, output = page_params()
+        query = AuditLog.query
+        if request.args.get('action'):
+            query = query.filter(AuditLog.action == request.args['action'])
+        user_id = request.args.get('user_id', type=int)
+        if user_id is not None:
+            query = query.filter(AuditLog.user_id == user_id)
+        # Filters on the indexed columns promoted out of `details`
+        if request.args.get('ip_address'):
+            query = query.filter(AuditLog.ip_address == request.args['ip_address'])
+        if request.args.get('success') in ('true', 'false'):
+            query = query.filter(AuditLog.success == (request.args['success'] == 'true'))
+        if request.args.get('final_label'):
+            query = query.filter(AuditLog.final_label == request.args['final_label'])
+        min_score = request.args.get('min_score', type=float)
+        if min_score is not None:
+            query = query.filter(AuditLog.final_score >= min_score)
+        since = parse_datetime_arg('since')
+        until = parse_datetime_arg('until')
+        if since:
+            query = query.filter(AuditLog.timestamp >= since)
+        if until:
+            query = query.filter(AuditLog.timestamp < until)
+
+        page, next_cursor = keyset_page(
+            query, [AuditLog.timestamp, AuditLog.id], [datetime.datetime, int], cursor, limit
+        )
+        return stream_rows(page, lambda log: {
             'id': log.id,
             'user_id': log.user_id,
             'action': log.action,
             'timestamp': log.timestamp.isoformat(),
             'details': log.details
-        } for log in logs])
+        }, output, next_cursor)
+
+    @app.route('/api/admin/audit-logs/<int:log_id>/proof', methods=['GET'])
+    @admin_required
+    def audit_log_proof(current_user, log_id):
+        if not anchorer:
+            return jsonify({"error": "Audit anchoring is not enabled (AUDIT_ANCHOR_SINK)"}), 404
+        try:
+            proof = anchorer.proof(log_id)
+        except AnchorRowsMissing as e:
+            return jsonify({"error": "Anchor batch partially archived", "message": str(e)}), 410
+        except AnchorError as e:
+            return jsonify({"error": "Anchor batch no longer matches its rows", "message": str(e)}), 409
+        if proof is None:
+            return jsonify({"error": f"Audit log {log_id} is not anchored yet"}), 404
+        return jsonify(proof)
+
+    @app.route('/api/admin/archive/<table_name>', methods=['GET'])
+    @admin_required
+    def search_archived_rows(current_user, table_name):
+        if table_name not in ARCHIVED_TABLES:
+            return jsonify({"error": f"Unknown archived table '{table_name}'"}), 404
+
+        try:
+            end = datetime.date.fromisoformat(request.args['end']) if 'end' in request.args else datetime.date.today()
+            start = datetime.date.fromisoformat(request.args['start']) if 'start' in request.args else end
+        except ValueError:
+            return jsonify({"error": "start and end must be ISO dates (YYYY-MM-DD)"}), 400
+        if (end - start).days > 366:
+            return jsonify({"error": "Archive searches are limited to one year"}), 400
+
+        records = search_archive(
+            app.config['ARCHIVE_DIR'],
+            table_name,
+            start,
+            end,
+            user_id=request.args.get('user_id', type=int),
+            action=request.args.get('action'),
+            limit=min(request.args.get('limit', 100, type=int), 1000)
+        )
+        return jsonify(records)
+
+    @app.route('/api/admin/export/<table_name>', methods=['GET'])
+    @admin_required
+    def export_rows(current_user, table_name):
+        if table_name not in EXPORTABLE_TABLES:
+            return jsonify({"error": f"Unknown export table '{table_name}'"}), 404
+
+        output = request.args.get('format', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+        if 'start' not in request.args:
+            return jsonify({"error": "start is required"}), 400
+        start = parse_datetime_arg('start')
+        end = parse_datetime_arg('end') or datetime.datetime.utcnow()
+        compress = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+
+        stream = export_stream(
+            db.engine,
+            table_name,
+            start,
+            end,
+            output=output,
+            compress=compress,
+            batch_size=app.config['EXPORT_BATCH_SIZE'],
+            dumps=app.json.dumps
+        )
+        filename = f"{table_name}_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.{output}" + ('.gz' if compress else '')
+        response = Response(stream, mimetype='text/csv' if output == 'csv' else 'application/x-ndjson')
+        if compress:
+            response.mimetype = 'application/gzip'
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @app.route('/api/ingest/stats', methods=['GET'])
+    @admin_required
+    def ingest_stats(current_user):
+        if not ingest:
+            return jsonify({'mode': app.config['INGEST_MODE']})
+        return jsonify({'mode': app.config['INGEST_MODE'], **ingest.stats()})
+
+    @app.route('/api/broadcast/stats', methods=['GET'])
+    @admin_required
+    def broadcast_stats_route(current_user):
+        return jsonify({**broadcast_stats(), 'risk_events': risk_events.stats()})
+
+    @app.route('/api/admin/profiles', methods=['GET'])
+    @admin_required
+    def list_profiles(current_user):
+        return jsonify({**profiler.status(), 'profiles': profiler.summaries()})
+
+    @app.route('/api/admin/profiles/merged', methods=['GET'])
+    @admin_required
+    def merged_profile(current_user):
+        """All kept traces (optionally of one `route` and `method`) as one collapsed-stack file."""
+        route = request.args.get('route')
+        method = request.args.get('method')
+        folded, count = profiler.merged(route, method.upper() if method else None)
+        if not count:
+            return jsonify({'error': 'No profiles match'}), 404
+        response = Response(format_folded(folded), mimetype='text/plain')
+        response.headers['Content-Disposition'] = 'attachment; filename="profiles-merged.folded"'
+        response.headers['X-Profile-Count'] = str(count)
+        return response
+
+    @app.route('/api/admin/profiles/<int:profile_id>', methods=['GET'])
+    @admin_required
+    def download_profile(current_user, profile_id):
+        trace = profiler.get(profile_id)
+        if trace is None:
+            return jsonify({'error': 'Profile not found', 'message': 'It may have been evicted; see /api/admin/profiles'}), 404
+        output = request.args.get('format', 'folded')
+        if output == 'pstats':
+            if trace.mode != 'cprofile':
+                return jsonify({'error': 'pstats is only available for cProfile traces'}), 400
+            response = Response(pstats_bytes(trace), mimetype='application/octet-stream')
+            filename = f'profile-{profile_id}.prof'
+        elif output == 'folded':
+            response = Response(format_folded(trace.folded()), mimetype='text/plain')
+            filename = f'profile-{profile_id}.folded'
+        else:
+            return jsonify({'error': f"Unknown format '{output}', expected 'folded' or 'pstats'"}), 400
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
     # === Error Handlers ===
+    @app.errorhandler(IngestQueueFull)
+    def ingest_queue_full(error):
+        response = jsonify({'error': 'Ingest queue full', 'message': 'Too many pending events, retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+
+    @app.errorhandler(IngestUnavailable)
+    def ingest_unavailable(error):
+        return jsonify({'error': 'Ingest unavailable', 'message': 'Event ingestion is not running'}), 503
+
+    @app.errorhandler(DecodeError)
+    def invalid_payload(error):
+        return jsonify({'error': 'Invalid payload', 'message': str(error)}), 400
+
+    @app.errorhandler(PayloadError)
+    def bad_payload(error):
+        return jsonify({'error': 'Invalid request body', 'message': str(error)}), error.status
+
+    @app.errorhandler(PaginationError)
+    def bad_pagination(error):
+        return jsonify({'error': 'Invalid pagination parameters', 'message': str(error)}), 400
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({'error': 'Endpoint not found', 'message': 'The requested endpoint does not exist'}), 404
@@ -484,7 +717,7 @@ def create_app():
 
 if __name__ == '__main__':
     app = create_app()
-    socketio = init_socketio(app)
+    socketio = app.extensions.get('socketio')
     
     if socketio:
         # Run with SocketIO for real-time features
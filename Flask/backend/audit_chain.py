@@ -0,0 +1,436 @@
+"""
+Hash chain over AuditLog rows.
+
+Every AuditLog row stores
+
+    row_hash = SHA-256(prev_hash || audit_canonical_bytes(content))
+
+where prev_hash is the row_hash of the row before it in its chain, so editing,
+deleting or reordering a row breaks every link after it. The genesis
+prev_hash is 64 zeros.
+
+A single chain would make every writer wait for the previous one to commit.
+Instead rows are linked into AUDIT_CHAIN_STRIPES independent chains
+(`AuditLog.chain`). A transaction picks one stripe the first time it flushes
+audit rows and locks that stripe's `audit_chain_head` row with an UPDATE until
+it commits, so writers only queue behind writers on the same stripe, and rows
+of one stripe are always linked in id order.
+
+Links are maintained at insert time by a before_flush hook for ORM inserts,
+by `link_rows` for the Core bulk inserts in ingestion.py, and by `link_values`
+for loaders that write on a bare connection (synthetic_data.py).
+
+Verification splits an id range into segments verified in parallel by worker
+processes. Each segment recomputes its rows' hashes and checks the links inside
+it, and reports the first and last hash per stripe, which the parent stitches
+together in id order. Clean prefixes are recorded as checkpoints every few
+segments, so `--resume` only reads rows added since the last clean audit.
+The oldest surviving row of a stripe is accepted as its start when older rows
+have been archived by retention.py; its prev_hash can be matched against the
+archive.
+
+Usage (from the Flask directory):
+    python -m backend.audit_chain verify --workers 8
+    python -m backend.audit_chain verify --start 1000000 --end 2000000
+    python -m backend.audit_chain verify --resume
+    python -m backend.audit_chain status
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import hashlib
+import logging
+import os
+import random
+
+import sqlalchemy as sa
+
+# Use relative imports for local modules
+from .database import db
+from .models import AuditLog, AuditChainHead, AuditChainCheckpoint, audit_canonical_bytes
+
+logger = logging.getLogger(__name__)
+
+GENESIS = '0' * 64
+
+# Problems kept in a verification report; the total is always counted
+MAX_REPORTED_PROBLEMS = 1000
+
+_stripes = 16
+
+
+def chain_hash(prev_hash, user_id, action, details, timestamp):
+    """row_hash of an AuditLog row linked after `prev_hash`."""
+    # The id is assigned after linking, and the chain already fixes each row's position
+    content = audit_canonical_bytes(None, user_id, action, details, timestamp)
+    return hashlib.sha256(bytes.fromhex(prev_hash) + content).hexdigest()
+
+
+def _stored_user_id(user_id):
+    """`user_id` as the Integer column stores it, so it hashes the same once read back."""
+    if isinstance(user_id, bool):
+        return int(user_id)
+    if isinstance(user_id, float) and user_id.is_integer():
+        return int(user_id)
+    if isinstance(user_id, str) and user_id.isascii() and user_id.isdigit():
+        return int(user_id)
+    return user_id
+
+
+def _normalize(values):
+    """Make values hash the way they will read back from the database."""
+    if values.get('timestamp') is None:
+        values['timestamp'] = datetime.datetime.utcnow()
+    if values.get('user_id') is not None:
+        values['user_id'] = _stored_user_id(values['user_id'])
+
+
+# === Linking at insert time ===
+
+def ensure_heads(conn, stripes):
+    """Create the head rows of stripes 0..stripes-1 that don't exist yet."""
+    table = AuditChainHead.__table__
+    existing = set(conn.scalars(sa.select(table.c.stripe)))
+    missing = [{'stripe': stripe, 'head_hash': GENESIS, 'length': 0, 'updated_at': datetime.datetime.utcnow()}
+               for stripe in range(stripes) if stripe not in existing]
+    if missing:
+        conn.execute(table.insert(), missing)
+
+
+def _session_stripe(session):
+    """The stripe this session's transaction links into; fixed for the whole transaction."""
+    # Called after session.connection(), so the transaction has begun
+    transaction = session.get_transaction()
+    current = session.info.get('audit_chain_stripe')
+    if current is None or current[0] is not transaction:
+        # One stripe per transaction, so two transactions can never hold head locks in opposite orders
+        current = (transaction, random.randrange(_stripes))
+        session.info['audit_chain_stripe'] = current
+    return current[1]
+
+
+def _link(conn, stripe, items):
+    """
+    Link `items` (dicts of AuditLog values, in insert order) after the head
+    of `stripe`, filling in chain/prev_hash/row_hash, and move the head.
+    """
+    table = AuditChainHead.__table__
+    now = datetime.datetime.utcnow()
+    # Write first: the UPDATE takes the stripe's lock before its hash is read
+    result = conn.execute(
+        table.update().where(table.c.stripe == stripe)
+        .values(length=table.c.length + len(items), updated_at=now)
+    )
+    if result.rowcount == 0:
+        # Heads are created at startup; this only covers a stripe count raised since
+        conn.execute(table.insert().values(stripe=stripe, head_hash=GENESIS, length=len(items), updated_at=now))
+    prev_hash = conn.scalar(sa.select(table.c.head_hash).where(table.c.stripe == stripe))
+
+    for values in items:
+        _normalize(values)
+        values['chain'] = stripe
+        values['prev_hash'] = prev_hash
+        values['row_hash'] = prev_hash = chain_hash(
+            prev_hash, values.get('user_id'), values['action'], values.get('details'), values['timestamp']
+        )
+    conn.execute(table.update().where(table.c.stripe == stripe).values(head_hash=prev_hash))
+
+
+def link_rows(session, rows):
+    """Link AuditLog value dicts about to be bulk inserted, in order, on the session's transaction."""
+    if rows:
+        if isinstance(session, sa.orm.scoped_session):
+            session = session()
+        conn = session.connection()
+        _link(conn, _session_stripe(session), rows)
+
+
+def link_values(conn, stripe, rows):
+    """Link AuditLog value dicts about to be bulk inserted on a Core connection into `stripe`."""
+    if rows:
+        _link(conn, stripe, rows)
+
+
+def _before_flush(session, flush_context, instances):
+    pending = [obj for obj in session.new if type(obj) is AuditLog and obj.row_hash is None]
+    if not pending:
+        return
+    # Link in the order the flush will insert them, which is the order ids are assigned
+    pending.sort(key=lambda obj: sa.inspect(obj).insert_order)
+    items = [{'user_id': obj.user_id, 'action': obj.action, 'details': obj.details, 'timestamp': obj.timestamp}
+             for obj in pending]
+    conn = session.connection()
+    _link(conn, _session_stripe(session), items)
+    for obj, values in zip(pending, items):
+        for key in ('user_id', 'timestamp', 'chain', 'prev_hash', 'row_hash'):
+            setattr(obj, key, values[key])
+
+
+def install_chain_hooks(app):
+    """Link AuditLog rows inserted through any ORM session, and create the stripe heads."""
+    global _stripes
+    _stripes = max(1, app.config['AUDIT_CHAIN_STRIPES'])
+    with app.app_context():
+        with db.engine.begin() as conn:
+            ensure_heads(conn, _stripes)
+    if not sa.event.contains(sa.orm.Session, 'before_flush', _before_flush):
+        sa.event.listen(sa.orm.Session, 'before_flush', _before_flush)
+
+
+def backfill(conn, batch_size=5000):
+    """Link rows that have no hash yet into stripe 0, in id order, committing per batch."""
+    table = AuditLog.__table__
+    heads = AuditChainHead.__table__
+    ensure_heads(conn, 1)
+    conn.commit()
+    update = (table.update()
+              .where(table.c.id == sa.bindparam('row_id'))
+              .values(chain=sa.bindparam('link_chain'), prev_hash=sa.bindparam('link_prev'),
+                      row_hash=sa.bindparam('link_hash')))
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, table.c.user_id, table.c.action, table.c.details, table.c.timestamp)
+            .where(table.c.row_hash.is_(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        items = [{'user_id': row.user_id, 'action': row.action, 'details': row.details, 'timestamp': row.timestamp}
+                 for row in rows]
+        _link(conn, 0, items)
+        conn.execute(update, [{'row_id': row.id, 'link_chain': values['chain'], 'link_prev': values['prev_hash'],
+                               'link_hash': values['row_hash']} for row, values in zip(rows, items)])
+        # Rows written before the hook existed may lack a timestamp; store the one that was hashed
+        missing = [{'row_id': row.id, 'ts': values['timestamp']}
+                   for row, values in zip(rows, items) if row.timestamp is None]
+        if missing:
+            conn.execute(table.update().where(table.c.id == sa.bindparam('row_id'))
+                         .values(timestamp=sa.bindparam('ts')), missing)
+        conn.commit()
+        logger.info(f"Linked AuditLog rows into the hash chain up to id {rows[-1].id}")
+    return conn.scalar(sa.select(heads.c.length).where(heads.c.stripe == 0))
+
+
+# === Verification ===
+
+_worker_engine = None
+
+
+def _init_worker(database_url):
+    global _worker_engine
+    _worker_engine = sa.create_engine(database_url)
+
+
+def verify_segment(bounds):
+    """
+    Verify rows first_id..last_id (inclusive). Returns the row count, the
+    problems found, and per stripe [first_id, first prev_hash, last_id,
+    last row_hash] for stitching.
+    """
+    first_id, last_id = bounds
+    table = AuditLog.__table__
+    stripes, problems, count = {}, [], 0
+    query = (sa.select(table.c.id, table.c.chain, table.c.prev_hash, table.c.row_hash,
+                       table.c.user_id, table.c.action, table.c.details, table.c.timestamp)
+             .where(table.c.id >= first_id, table.c.id <= last_id)
+             .order_by(table.c.id))
+    with _worker_engine.connect() as conn:
+        for row_id, stripe, prev_hash, row_hash, user_id, action, details, timestamp in \
+                conn.execution_options(stream_results=True, yield_per=10000).execute(query):
+            count += 1
+            if row_hash is None or prev_hash is None or stripe is None:
+                problems.append((row_id, 'unlinked', 'row has no hash'))
+                continue
+            if chain_hash(prev_hash, user_id, action, details, timestamp) != row_hash:
+                problems.append((row_id, 'content', 'row_hash does not match the row content'))
+            state = stripes.get(stripe)
+            if state is None:
+                stripes[stripe] = [row_id, prev_hash, row_id, row_hash]
+                continue
+            if prev_hash != state[3]:
+                problems.append((row_id, 'link', f'prev_hash does not match row {state[2]} of chain {stripe}'))
+            state[2], state[3] = row_id, row_hash
+    return {'first_id': first_id, 'last_id': last_id, 'rows': count, 'problems': problems, 'stripes': stripes}
+
+
+def _predecessors(start_id):
+    """{stripe: [id, row_hash]} of the last row of each stripe before start_id."""
+    table = AuditLog.__table__
+    heads = {}
+    for stripe in db.session.scalars(sa.select(AuditChainHead.stripe)):
+        row = db.session.execute(
+            sa.select(table.c.id, table.c.row_hash)
+            .where(table.c.chain == stripe, table.c.id < start_id)
+            .order_by(table.c.id.desc()).limit(1)
+        ).first()
+        if row is not None:
+            heads[stripe] = [row.id, row.row_hash]
+    return heads
+
+
+def _check_checkpoint(checkpoint):
+    """Problems with rows a checkpoint vouched for that no longer hold their hash."""
+    problems = []
+    for stripe, (row_id, row_hash) in checkpoint.heads.items():
+        current = db.session.scalar(sa.select(AuditLog.row_hash).where(AuditLog.id == row_id))
+        if current != row_hash:
+            problems.append((row_id, 'checkpoint', f'chain {stripe} head changed since checkpoint {checkpoint.id}'))
+    return problems
+
+
+def _segments(first_id, last_id, segment_size):
+    return [(start, min(last_id, start + segment_size - 1)) for start in range(first_id, last_id + 1, segment_size)]
+
+
+def _save_checkpoint(upto_id, heads, rows):
+    checkpoint = AuditChainCheckpoint(
+        upto_id=upto_id, heads={str(stripe): head for stripe, head in heads.items()}, rows_verified=rows
+    )
+    db.session.add(checkpoint)
+    db.session.commit()
+    return checkpoint
+
+
+def verify_range(start_id=None, end_id=None, workers=None, segment_size=200000, checkpoint_every=10,
+                 resume=False, record=True):
+    """
+    Verify the chains over AuditLog ids start_id..end_id (default: all rows).
+    Must run in an app context. With `record`, clean prefixes are saved as
+    checkpoints every `checkpoint_every` segments and at the end, when the
+    range starts at the oldest row or at a checkpoint.
+    """
+    table = AuditLog.__table__
+    problems, starts = [], {}
+    expected = None
+    # A checkpoint vouches for every row up to it, so only a range without holes before it can record one
+    record = record and start_id is None
+    if resume:
+        checkpoint = db.session.scalars(
+            sa.select(AuditChainCheckpoint).order_by(AuditChainCheckpoint.upto_id.desc()).limit(1)
+        ).first()
+        if checkpoint is not None:
+            problems += _check_checkpoint(checkpoint)
+            start_id = checkpoint.upto_id + 1
+            record = record and not problems
+            expected = {int(stripe): head for stripe, head in checkpoint.heads.items()}
+
+    bounds = sa.select(sa.func.min(table.c.id), sa.func.max(table.c.id))
+    if start_id is not None:
+        bounds = bounds.where(table.c.id >= start_id)
+    if end_id is not None:
+        bounds = bounds.where(table.c.id <= end_id)
+    first_id, last_id = db.session.execute(bounds).one()
+    report = {'first_id': first_id, 'last_id': last_id, 'rows': 0, 'segments': 0, 'problems': problems,
+              'problem_count': len(problems), 'chain_starts': starts, 'checkpoint': None}
+    if first_id is None:
+        return report
+    if expected is None:
+        expected = _predecessors(first_id)
+
+    segments = _segments(first_id, last_id, segment_size)
+    workers = workers or os.cpu_count() or 1
+    database_url = db.engine.url.render_as_string(hide_password=False)
+    if workers > 1 and len(segments) > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(workers, len(segments)), initializer=_init_worker, initargs=(database_url,)
+        )
+        futures = [pool.submit(verify_segment, segment) for segment in segments]
+        results = (future.result() for future in futures)
+    else:
+        pool = futures = None
+        _init_worker(database_url)
+        results = map(verify_segment, segments)
+
+    try:
+        for number, result in enumerate(results, 1):
+            found = list(result['problems'])
+            for stripe, (seg_first_id, first_prev, seg_last_id, last_hash) in sorted(result['stripes'].items()):
+                if stripe in expected:
+                    if first_prev != expected[stripe][1]:
+                        found.append((seg_first_id, 'link',
+                                      f'prev_hash does not match row {expected[stripe][0]} of chain {stripe}'))
+                else:
+                    # Oldest surviving row of the stripe: earlier rows never existed or were archived
+                    starts[stripe] = {'id': seg_first_id, 'prev_hash': first_prev}
+                expected[stripe] = [seg_last_id, last_hash]
+
+            report['rows'] += result['rows']
+            report['segments'] = number
+            report['problem_count'] += len(found)
+            problems.extend(found[:MAX_REPORTED_PROBLEMS - len(problems)])
+            clean = report['problem_count'] == 0
+            if record and clean and (number % checkpoint_every == 0 or number == len(segments)):
+                report['checkpoint'] = _save_checkpoint(result['last_id'], expected, report['rows']).id
+                logger.info(f"Audit chain verified up to id {result['last_id']} ({report['rows']} rows)")
+    finally:
+        if pool is not None:
+            # Don't start segments nobody will read after a failure or ^C
+            for future in futures:
+                future.cancel()
+            pool.shutdown()
+    return report
+
+
+def chain_status():
+    heads = db.session.scalars(sa.select(AuditChainHead).order_by(AuditChainHead.stripe)).all()
+    checkpoint = db.session.scalars(
+        sa.select(AuditChainCheckpoint).order_by(AuditChainCheckpoint.upto_id.desc()).limit(1)
+    ).first()
+    return {
+        'stripes': [{'stripe': head.stripe, 'length': head.length, 'head_hash': head.head_hash} for head in heads],
+        'rows': sum(head.length for head in heads),
+        'last_checkpoint': None if checkpoint is None else {
+            'id': checkpoint.id, 'upto_id': checkpoint.upto_id, 'rows_verified': checkpoint.rows_verified,
+            'created_at': checkpoint.created_at.isoformat(),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AuditLog hash chain')
+    sub = parser.add_subparsers(dest='command', required=True)
+    verify = sub.add_parser('verify', help='verify a range of rows in parallel')
+    verify.add_argument('--start', type=int, help='first AuditLog id (default: oldest)')
+    verify.add_argument('--end', type=int, help='last AuditLog id (default: newest)')
+    verify.add_argument('--resume', action='store_true', help='start after the last checkpoint')
+    verify.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    verify.add_argument('--segment-size', type=int, default=200000, help='ids per segment')
+    verify.add_argument('--checkpoint-every', type=int, default=10, help='segments between checkpoints')
+    verify.add_argument('--no-checkpoint', action='store_true', help="don't record checkpoints")
+    sub.add_parser('status', help='show stripe heads and the last checkpoint')
+    args = parser.parse_args()
+
+    from .app import create_app
+    app = create_app()
+    with app.app_context():
+        if args.command == 'status':
+            status = chain_status()
+            print(f"{status['rows']} rows in {len(status['stripes'])} stripes")
+            for head in status['stripes']:
+                print(f"  stripe {head['stripe']:>3}: {head['length']:>10} rows, head {head['head_hash'][:16]}")
+            print(f"Last checkpoint: {status['last_checkpoint'] or 'none'}")
+            return
+
+        started = datetime.datetime.utcnow()
+        report = verify_range(args.start, args.end, workers=args.workers, segment_size=args.segment_size,
+                              checkpoint_every=args.checkpoint_every, resume=args.resume,
+                              record=not args.no_checkpoint)
+        elapsed = (datetime.datetime.utcnow() - started).total_seconds()
+        print(f"Verified {report['rows']} rows (ids {report['first_id']}..{report['last_id']}) "
+              f"in {report['segments']} segments, {elapsed:.1f}s")
+        for stripe, start in sorted(report['chain_starts'].items()):
+            if start['prev_hash'] != GENESIS:
+                print(f"  chain {stripe} starts at row {start['id']} after archived rows "
+                      f"(prev_hash {start['prev_hash'][:16]})")
+        for row_id, kind, message in report['problems']:
+            print(f"  row {row_id}: {kind}: {message}")
+        if report['problem_count']:
+            print(f"FAILED: {report['problem_count']} problems")
+            raise SystemExit(1)
+        print(f"OK{'' if report['checkpoint'] is None else ', checkpoint ' + str(report['checkpoint'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Coalesced, throttled Socket.IO broadcasting.
+
+Instead of one Socket.IO message per event, `RoomBroadcaster.publish` merges
+events for the same room and event name into a pending delta, and a
+background task flushes one message per room and event every
+BROADCAST_WINDOW_MS:
+
+- keyless events (aggregate stats) are merged field by field, latest value
+  wins, into `data`;
+- keyed events (e.g. risk updates keyed by user_id) keep the latest event per
+  key in `updates`, with the most recent one also in `data`.
+
+Keyed and keyless events for the same event name are pending separately and
+go out as separate messages. Each flushed message keeps the {type, data, timestamp} shape clients already
+read, plus `coalesced`, the number of events it stands for.
+
+Slow consumers: before a flush the broadcaster looks at each local client's
+Engine.IO send queue. A client with more than BROADCAST_MAX_BACKLOG packets
+still waiting is skipped for this window. Messages only carry their window's
+deltas, so while any client of a room and event is behind, the broadcaster
+also merges every window into a catch-up state (latest `data` fields, latest
+update per key). The first window the client is under the limit again it
+gets that merged state instead of the window's delta, so nothing it skipped
+is lost. The catch-up state is dropped once no client is behind.
+"""
+
+import collections
+import logging
+import threading
+from datetime import datetime
+
+# Use relative imports for local modules
+from .socket_codec import MSGPACK, emit_encoded, encode, encoding_of, room_for
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = '/'
+
+
+class _Pending:
+    __slots__ = ('type', 'data', 'updates', 'count')
+
+    def __init__(self, type_):
+        self.type = type_
+        self.data = {}
+        self.updates = collections.OrderedDict()
+        self.count = 0
+
+    def add(self, data, key=None):
+        self.count += 1
+        if key is None:
+            self.data.update(data)
+        else:
+            self.updates.pop(key, None)
+            self.updates[key] = data
+            self.data = data
+
+    def merge(self, other, keyed):
+        self.type = other.type
+        self.count += other.count
+        if not keyed:
+            self.data.update(other.data)
+            return
+        for key, data in other.updates.items():
+            self.updates.pop(key, None)
+            self.updates[key] = data
+        self.data = other.data
+
+    def message(self):
+        message = {'type': self.type, 'data': self.data, 'coalesced': self.count}
+        if self.updates:
+            message['updates'] = list(self.updates.values())
+        return message
+
+
+class _CatchUp:
+    """Everything published to one room and event since its `sids` were first skipped."""
+    __slots__ = ('state', 'sids')
+
+    def __init__(self, state, sids):
+        self.state = state
+        self.sids = sids
+
+
+class RoomBroadcaster:
+    def __init__(self, socketio, window_ms=250, max_backlog=100):
+        self.socketio = socketio
+        self.window = window_ms / 1000.0
+        self.max_backlog = max_backlog
+        self._pending = {}
+        # (room, event, keyed) -> _CatchUp, while some client of that slot is behind
+        self._behind = {}
+        self._lock = threading.Lock()
+        self._task = None
+        self.counters = {'published': 0, 'emitted': 0, 'coalesced': 0, 'skipped_slow': 0, 'caught_up': 0}
+
+    def publish(self, room, event, type_, data, key=None):
+        """Queue `data` for `room`; it goes out, merged, at the end of the current window."""
+        # Keyed and keyless events for the same event name go out separately
+        slot = (room, event, key is not None)
+        if self.window <= 0:
+            entry = _Pending(type_)
+            entry.add(data, key)
+            with self._lock:
+                self.counters['published'] += 1
+            self._deliver(slot, entry)
+            return
+        with self._lock:
+            self.counters['published'] += 1
+            pending = self._pending.get(slot)
+            if pending is None:
+                pending = self._pending[slot] = _Pending(type_)
+            else:
+                self.counters['coalesced'] += 1
+            pending.add(data, key)
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.window)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Broadcast flush failed")
+
+    def flush(self):
+        """Send one merged message per room and event for everything published so far."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for slot, entry in pending.items():
+            self._deliver(slot, entry)
+
+    def _slow_clients(self, room):
+        """Local clients in `room`, in either encoding, whose outgoing queue is over the backlog limit."""
+        server = self.socketio.server
+        slow = []
+        for name in (room, room_for(room, MSGPACK)):
+            for sid, eio_sid in server.manager.get_participants(NAMESPACE, name):
+                socket = server.eio.sockets.get(eio_sid)
+                if socket is not None and socket.queue.qsize() > self.max_backlog:
+                    slow.append(sid)
+        return slow
+
+    def _deliver(self, slot, entry):
+        """Send `entry` to the room, and the catch-up state to clients that are no longer behind."""
+        room, event, keyed = slot
+        slow = set(self._slow_clients(room)) if self.max_backlog else set()
+        catch_up_message = None
+        with self._lock:
+            catch_up = self._behind.get(slot)
+            if catch_up is not None:
+                catch_up.state.merge(entry, keyed)
+                recovered = catch_up.sids - slow
+                if recovered:
+                    catch_up_message = catch_up.state.message()
+                    catch_up_message['data'] = dict(catch_up_message['data'])
+            else:
+                recovered = set()
+            if slow:
+                if catch_up is None:
+                    state = _Pending(entry.type)
+                    state.merge(entry, keyed)
+                    self._behind[slot] = _CatchUp(state, slow)
+                else:
+                    catch_up.sids = slow
+            elif catch_up is not None:
+                del self._behind[slot]
+            self.counters['emitted'] += 1
+            self.counters['skipped_slow'] += len(slow)
+            self.counters['caught_up'] += len(recovered)
+
+        message = entry.message()
+        message['timestamp'] = datetime.now()
+        skip = slow | recovered
+        emit_encoded(self.socketio, event, message, room=room, skip_sid=list(skip) or None)
+        if catch_up_message is not None:
+            catch_up_message['timestamp'] = message['timestamp']
+            for sid in recovered:
+                self.socketio.emit(event, encode(catch_up_message, encoding_of(sid)), to=sid)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending), behind=len(self._behind),
+                        window_ms=int(self.window * 1000))
@@ -2,9 +2,118 @@ import os
 import secrets
 
 class Config:
-    SECRET_KEY = secrets.token_hex(32)
+    # Signs the JWTs; set it so that every node accepts the tokens any of them issued
+    SECRET_KEY = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(os.path.dirname(__file__), 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Storage profile: 'auto', 'sqlite', 'server' or 'default' (see storage.py)
+    STORAGE_PROFILE = os.environ.get('STORAGE_PROFILE', 'auto')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 10000))
+
+    # Retention: rows older than RETENTION_DAYS move to day-partitioned archives
+    RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 90))
+    RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', 5000))
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR') or os.path.join(os.path.dirname(__file__), 'archive')
+
+    # Admin listings: default and maximum rows per streamed page
+    ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 100))
+    ADMIN_PAGE_SIZE_MAX = int(os.environ.get('ADMIN_PAGE_SIZE_MAX', 50000))
+
+    # Bulk export: rows per short read transaction
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 10000))
+
+    # UserAnalytics payload storage: 'full' (JSON copy) or 'compact' (compressed residual)
+    ANALYTICS_STORAGE_MODE = os.environ.get('ANALYTICS_STORAGE_MODE', 'full')
+    # Largest accepted /api/analytics/batch request (snapshots + events)
+    ANALYTICS_BATCH_MAX_ITEMS = int(os.environ.get('ANALYTICS_BATCH_MAX_ITEMS', 1000))
+
+    # Ingest pipeline for tracker endpoints: 'sync' (commit per request) or
+    # 'async' (queue, answer 202, write in batches; see ingest_queue.py)
+    INGEST_MODE = os.environ.get('INGEST_MODE', 'sync')
+    INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE', 10000))
+    INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 500))
+    INGEST_BATCH_WAIT = float(os.environ.get('INGEST_BATCH_WAIT', 0.05))
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 1))
+    INGEST_JOURNAL_DIR = os.environ.get('INGEST_JOURNAL_DIR')
+    # fsync every journal append, so accepted events also survive a power loss
+    INGEST_JOURNAL_FSYNC = os.environ.get('INGEST_JOURNAL_FSYNC', 'false').lower() in ('1', 'true', 'yes')
+    # Largest ingestion request body, on the wire and after decompression
+    INGEST_MAX_BODY_BYTES = int(os.environ.get('INGEST_MAX_BODY_BYTES', 4 * 1024 * 1024))
+
+    # Response JSON encoder: 'auto' (orjson if installed), 'orjson', 'stdlib' or 'flask'
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
+    # Socket.IO server: async worker ('threading', 'eventlet' or 'gevent'; run
+    # eventlet/gevent through backend.server), and a message queue URL
+    # (redis://, amqp://, ... or local:// in-process) to broadcast across nodes
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    # Concurrent connections one eventlet process accepts (eventlet's own default is 1024)
+    SOCKETIO_MAX_CONNECTIONS = int(os.environ.get('SOCKETIO_MAX_CONNECTIONS', 20000))
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'walmart-secure-socketio')
+    SOCKETIO_LOGGER = os.environ.get('SOCKETIO_LOGGER', 'false').lower() in ('1', 'true', 'yes')
+    SOCKETIO_ENGINEIO_LOGGER = os.environ.get('SOCKETIO_ENGINEIO_LOGGER', 'false').lower() in ('1', 'true', 'yes')
+    # Let clients ask for msgpack-encoded dashboard streams (see backend/socket_codec.py)
+    SOCKETIO_BINARY_STREAMS = os.environ.get('SOCKETIO_BINARY_STREAMS', 'true').lower() in ('1', 'true', 'yes')
+
+    # Admin broadcasts: events published within one window go out as a single
+    # merged message per room (0 sends each event at once); clients with more
+    # than BROADCAST_MAX_BACKLOG packets still unsent skip a window (0 disables
+    # the check)
+    BROADCAST_WINDOW_MS = int(os.environ.get('BROADCAST_WINDOW_MS', 250))
+    BROADCAST_MAX_BACKLOG = int(os.environ.get('BROADCAST_MAX_BACKLOG', 100))
+
+    # Live admin metrics kept in memory over a sliding window, pushed to
+    # admin_room when they change (checked every LIVE_METRICS_PUSH_INTERVAL seconds)
+    LIVE_METRICS_WINDOW_SECONDS = int(os.environ.get('LIVE_METRICS_WINDOW_SECONDS', 300))
+    LIVE_METRICS_PUSH_INTERVAL = float(os.environ.get('LIVE_METRICS_PUSH_INTERVAL', 1.0))
+    LIVE_METRICS_MAX_USERS = int(os.environ.get('LIVE_METRICS_MAX_USERS', 10000))
+
+    # Assessments scoring above RISK_ALERT_THRESHOLD are streamed to admin_room and
+    # the user's room through a bounded queue that drops the oldest when full
+    RISK_ALERT_THRESHOLD = float(os.environ.get('RISK_ALERT_THRESHOLD', 70))
+    RISK_EVENT_QUEUE_SIZE = int(os.environ.get('RISK_EVENT_QUEUE_SIZE', 1000))
+
+    # Merkle anchoring of AuditLog rows (see backend/anchoring.py): sink URL
+    # (file:///path/anchors.jsonl, memory://name; unset disables), seconds between
+    # anchors, rows per tree, and how long a gap in ids (a transaction still
+    # committing, or a rollback) is waited for before anchoring past it
+    AUDIT_ANCHOR_SINK = os.environ.get('AUDIT_ANCHOR_SINK')
+    AUDIT_ANCHOR_INTERVAL = float(os.environ.get('AUDIT_ANCHOR_INTERVAL', 60))
+    AUDIT_ANCHOR_MAX_BATCH = int(os.environ.get('AUDIT_ANCHOR_MAX_BATCH', 100000))
+    AUDIT_ANCHOR_SETTLE_SECONDS = float(os.environ.get('AUDIT_ANCHOR_SETTLE_SECONDS', 5))
+
+    # AuditLog hash chain: independent chains that concurrent writers spread
+    # over, so they only wait for writers on the same stripe
+    AUDIT_CHAIN_STRIPES = int(os.environ.get('AUDIT_CHAIN_STRIPES', 16))
+
+    # Prometheus metrics (see backend/metrics.py): request, SQL, model and Socket.IO
+    # emit timings served at METRICS_PATH; with METRICS_TOKEN set, scrapes must send
+    # "Authorization: Bearer <token>"
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_PATH = os.environ.get('METRICS_PATH', '/metrics')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Request profiler (see backend/profiling.py), off unless a sample rate or a
+    # slow threshold is set: trace PROFILE_SAMPLE_RATE of requests and/or keep any
+    # slower than PROFILE_SLOW_MS, by stack sampling every PROFILE_INTERVAL_MS or
+    # with cProfile; the last PROFILE_KEEP traces are downloadable by admins.
+    # PROFILE_ROUTES limits it to some URL rules (comma-separated)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 0))
+    PROFILE_MODE = os.environ.get('PROFILE_MODE', 'stack')
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+    PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+    PROFILE_ROUTES = [route.strip() for route in os.environ.get('PROFILE_ROUTES', '').split(',') if route.strip()]
+
     BACKEND_BASE_URL = os.environ.get('BACKEND_URL', 'http://localhost:8000')
     MODEL_API_URL = os.environ.get('MODEL_API_URL', 'http://localhost:5000')
     
@@ -1,8 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
 
+try:
+    from .storage import configure_app, install_connection_hooks
+except ImportError:
+    from storage import configure_app, install_connection_hooks
+
 db = SQLAlchemy()
 
 def init_app(app):
+    configure_app(app)
     db.init_app(app)
     with app.app_context():
-        db.create_all() 
\ No newline at end of file
+        install_connection_hooks(app, db.engine)
+        db.create_all()
+        # Bring databases created by older releases up to the current schema
+        from .migrations import upgrade
+        upgrade()
+
+    from .rollups import install_rollup_hooks
+    install_rollup_hooks()
+    from .audit_chain import install_chain_hooks
+    install_chain_hooks(app)
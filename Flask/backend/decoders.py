@@ -0,0 +1,211 @@
+"""
+Compiled request payload decoders.
+
+A decoder is declared as a list of `Field`s - record attribute, path into the
+JSON payload, expected kind - and compiled once, at import, into a straight-
+line Python function plus a record class with `__slots__`. Decoding a request
+is then a single pass over the payload: each nested section is looked up
+once, every value is type-checked, defaults are filled in, and the result is
+a flat record instead of a dict that callers have to re-walk with chains of
+`.get(..., {})`.
+
+Anything malformed raises DecodeError with the offending path, e.g.
+"'focus.focusEvents' must be a number", which the app turns into a 400.
+'id' fields also take the forms clients send ids in, a digit string ("5")
+or an integral float (5.0), and decode them to int.
+
+    record = ANALYTICS.decode(request_json)
+    record.typing_wpm, record.focus_events, ...
+"""
+
+# Python classes accepted for each field kind. Booleans are deliberately not
+# numbers here, although bool subclasses int
+KINDS = {
+    'number': ({int, float}, 'a number'),
+    'int': ({int}, 'an integer'),
+    'id': ({int}, 'an integer id'),
+    'string': ({str}, 'a string'),
+    'object': ({dict}, 'an object'),
+    'timestamp': ({int, float, str}, 'a number or string'),
+}
+
+
+class DecodeError(ValueError):
+    """A payload that does not match its decoder."""
+
+
+def _as_id(value, label):
+    """An id sent as a digit string or an integral float, as an int."""
+    if value.__class__ is str and value.isascii() and value.isdigit():
+        return int(value)
+    if value.__class__ is float and value.is_integer():
+        return int(value)
+    raise DecodeError(f"'{label}' must be an integer id")
+
+
+def decode_id(value, label='user_id'):
+    """An optional id from a payload as an int (None stays None). Raises DecodeError otherwise."""
+    if value is None or value.__class__ is int:
+        return value
+    return _as_id(value, label)
+
+
+class Field:
+    __slots__ = ('attr', 'path', 'kind', 'required', 'default')
+
+    def __init__(self, attr, path, kind='number', required=False, default=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown field kind '{kind}'")
+        self.attr = attr
+        self.path = tuple(path.split('.'))
+        self.kind = kind
+        self.required = required
+        self.default = default
+
+
+class Decoder:
+    """A compiled decoder; `decode(payload)` returns an instance of `record_class`."""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = list(fields)
+        self.record_class = _record_class(name, [field.attr for field in self.fields])
+        self.decode = _compile(name, self.fields, self.record_class)
+
+
+def _record_class(name, attrs):
+    namespace = {}
+    body = ''.join(f'\n    self.{attr} = {attr}' for attr in attrs) or '\n    pass'
+    exec(f"def __init__(self, {', '.join(attrs)}):{body}", namespace)
+
+    def as_dict(self):
+        return {attr: getattr(self, attr) for attr in attrs}
+
+    def __repr__(self):
+        return f"{name}({', '.join(f'{attr}={getattr(self, attr)!r}' for attr in attrs)})"
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.as_dict() == other.as_dict()
+
+    return type(name, (), {
+        '__slots__': tuple(attrs),
+        '__init__': namespace['__init__'],
+        'as_dict': as_dict,
+        '__repr__': __repr__,
+        '__eq__': __eq__,
+    })
+
+
+def _compile(name, fields, record_class):
+    """Generate and compile the decode function for `fields`."""
+    namespace = {'DecodeError': DecodeError, '_Record': record_class, '_EMPTY': {}, '_as_id': _as_id}
+    lines = [
+        'def decode(data):',
+        '    if data.__class__ is not dict:',
+        "        raise DecodeError('Payload must be an object')",
+    ]
+
+    # Each nested section ('typing', 'focus', ...) is fetched and checked once
+    sections = {(): 'data'}
+    for field in fields:
+        for depth in range(1, len(field.path)):
+            prefix = field.path[:depth]
+            if prefix in sections:
+                continue
+            var = sections[prefix] = f's{len(sections)}'
+            label = '.'.join(prefix)
+            lines += [
+                f'    {var} = {sections[prefix[:-1]]}.get({prefix[-1]!r})',
+                f'    if {var} is None:',
+                f'        {var} = _EMPTY',
+                f'    elif {var}.__class__ is not dict:',
+                f'        raise DecodeError("\'{label}\' must be an object")',
+            ]
+
+    values = []
+    for index, field in enumerate(fields):
+        var = f'v{index}'
+        values.append(var)
+        classes, description = KINDS[field.kind]
+        namespace[f'_default{index}'] = field.default
+        label = '.'.join(field.path)
+        lines.append(f'    {var} = {sections[field.path[:-1]]}.get({field.path[-1]!r})')
+        if field.required:
+            missing = f'raise DecodeError("\'{label}\' is required")'
+        elif isinstance(field.default, (dict, list)):
+            # Every record gets its own copy of a mutable default
+            missing = f'{var} = _default{index}.copy()'
+        else:
+            missing = f'{var} = _default{index}'
+        # Identity checks against each accepted class beat a set lookup
+        mismatch = ' and '.join(f'{var}.__class__ is not {cls.__name__}' for cls in sorted(classes, key=str))
+        if field.kind == 'id':
+            invalid = f'{var} = _as_id({var}, {label!r})'
+        else:
+            invalid = f'raise DecodeError("\'{label}\' must be {description}")'
+        lines += [
+            f'    if {var} is None:',
+            f'        {missing}',
+            f'    elif {mismatch}:',
+            f'        {invalid}',
+        ]
+    lines.append(f"    return _Record({', '.join(values)})")
+
+    source = '\n'.join(lines)
+    exec(compile(source, f'<decoder {name}>', 'exec'), namespace)
+    return namespace['decode']
+
+
+# === Payload schemas ===
+
+# Tracker snapshot (frontend useUserAnalytics) for /api/analytics/store
+ANALYTICS = Decoder('AnalyticsRecord', [
+    Field('session_id', 'sessionId', 'string', default=''),
+    Field('page_url', 'pageUrl', 'string'),
+    Field('user_agent', 'userAgent', 'string'),
+    Field('typing_wpm', 'typing.wpm'),
+    Field('typing_keystrokes', 'typing.keystrokes'),
+    Field('typing_backspaces', 'typing.backspaces'),
+    Field('mouse_clicks', 'mouse.clicks'),
+    Field('mouse_distance', 'mouse.totalDistance'),
+    Field('mouse_speed', 'mouse.averageSpeed'),
+    Field('mouse_idle_time', 'mouse.idleTime'),
+    Field('scroll_depth', 'scroll.maxDepth'),
+    Field('scroll_speed', 'scroll.scrollSpeed'),
+    Field('scroll_distance', 'scroll.totalScrollDistance'),
+    Field('focus_events', 'focus.focusEvents', required=True),
+    Field('blur_events', 'focus.blurEvents', default=0),
+    Field('focus_time', 'focus.totalFocusTime'),
+    Field('tab_switches', 'focus.tabSwitches'),
+    Field('session_duration', 'sessionDuration'),
+])
+
+# Behavioural features the risk model is trained on (see ml_integration.py)
+MODEL_FEATURES = [
+    Field('typing_speed', 'typing_speed'),
+    Field('mouse_distance', 'mouse_distance'),
+    Field('click_count', 'click_count'),
+    Field('session_duration', 'session_duration'),
+    Field('scroll_depth', 'scroll_depth'),
+    Field('ip_location_score', 'ip_location_score'),
+    Field('device_type_score', 'device_type_score'),
+]
+
+# Fingerprint submitted to /api/fingerprint/update and /api/fingerprint/analyze
+FINGERPRINT = Decoder('FingerprintRecord', MODEL_FEATURES)
+
+# Risk assessment request for /api/risk/assess and /risk-score
+RISK = Decoder('RiskRecord', MODEL_FEATURES + [
+    Field('user_id', 'user_id', 'id'),
+    Field('timestamp', 'timestamp', 'timestamp'),
+    Field('fingerprint', 'fingerprint', 'object', default={}),
+])
+
+
+def model_input(record):
+    """The part of a risk request the ML model reads: its features and timestamp."""
+    features = {field.attr: getattr(record, field.attr) for field in MODEL_FEATURES
+                if getattr(record, field.attr) is not None}
+    if record.timestamp is not None:
+        features['timestamp'] = record.timestamp
+    return features
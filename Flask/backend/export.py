@@ -0,0 +1,177 @@
+"""
+Bulk export of audit, risk and analytics rows for offline analysis.
+
+Rows in a time range are read in keyset windows of EXPORT_BATCH_SIZE, each
+window in its own short read transaction on a fresh connection, so an export
+of tens of millions of rows never pins one long-lived snapshot (which on
+SQLite would stall WAL checkpoints, and elsewhere would hold back vacuum).
+Output is NDJSON or CSV, optionally gzip-compressed, produced one window at a
+time so nothing is buffered beyond the current batch.
+
+Usage (from the Flask directory):
+    python -m backend.export audit_log --start 2025-01-01 --end 2025-02-01 --format csv --gzip -o audit.csv.gz
+"""
+
+import argparse
+import contextlib
+import csv
+import datetime
+import io
+import json
+import sys
+import zlib
+
+import sqlalchemy as sa
+
+# Use relative imports for local modules
+from .analytics_storage import plain_row
+from .models import RiskAssessment, AuditLog, UserAnalytics
+
+# Exportable tables and the column the time range applies to
+EXPORTABLE_TABLES = {
+    'audit_log': (AuditLog, 'timestamp'),
+    'risk_assessment': (RiskAssessment, 'created_at'),
+    'user_analytics': (UserAnalytics, 'created_at'),
+}
+
+FORMATS = ('ndjson', 'csv')
+
+# Rewrites applied to exported rows, and the stored columns they remove
+ROW_TRANSFORMS = {
+    'user_analytics': (plain_row, ('analytics_payload',)),
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_batches(engine, table_name, start, end, batch_size):
+    """Yield lists of row dicts with start <= time < end, ordered by (time, id)."""
+    model, time_attr = EXPORTABLE_TABLES[table_name]
+    table = model.__table__
+    time_column, id_column = table.c[time_attr], table.c.id
+    base = (sa.select(table)
+            .where(time_column >= start, time_column < end)
+            .order_by(time_column, id_column)
+            .limit(batch_size))
+
+    last = None
+    while True:
+        query = base
+        if last is not None:
+            last_time, last_id = last
+            query = query.where(sa.or_(time_column > last_time,
+                                       sa.and_(time_column == last_time, id_column > last_id)))
+        with engine.connect() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(query)]
+        if not rows:
+            return
+        yield rows
+        last = (rows[-1][time_attr], rows[-1]['id'])
+        if len(rows) < batch_size:
+            return
+
+
+def columns_for(table_name):
+    model, _ = EXPORTABLE_TABLES[table_name]
+    _, dropped = ROW_TRANSFORMS.get(table_name, (None, ()))
+    return [column.name for column in model.__table__.columns if column.name not in dropped]
+
+
+def transform_batches(batches, table_name):
+    if table_name not in ROW_TRANSFORMS:
+        return batches
+    transform, _ = ROW_TRANSFORMS[table_name]
+    return ([transform(row) for row in rows] for rows in batches)
+
+
+def encode_ndjson(batches, dumps=json.dumps):
+    for rows in batches:
+        yield ''.join(dumps({key: _plain(value) for key, value in row.items()}) + '\n' for row in rows)
+
+
+def encode_csv(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([
+                json.dumps(value) if isinstance(value, (dict, list)) else _plain(value)
+                for value in (row[column] for column in columns)
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(engine, table_name, start, end, output='ndjson', compress=False, batch_size=10000, dumps=json.dumps):
+    """Encoded export of one table as an iterator of str (or bytes when compressed)."""
+    if table_name not in EXPORTABLE_TABLES:
+        raise ValueError(f"Unknown export table '{table_name}'")
+    if output not in FORMATS:
+        raise ValueError(f"Unknown export format '{output}'")
+
+    batches = transform_batches(iter_batches(engine, table_name, start, end, batch_size), table_name)
+    chunks = encode_csv(batches, columns_for(table_name)) if output == 'csv' else encode_ndjson(batches, dumps)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def _parse_when(value):
+    return datetime.datetime.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export audit, risk and analytics rows for a time range')
+    parser.add_argument('table', choices=list(EXPORTABLE_TABLES))
+    parser.add_argument('--start', type=_parse_when, required=True, help='ISO date/datetime (inclusive)')
+    parser.add_argument('--end', type=_parse_when, default=None, help='ISO date/datetime (exclusive), default now')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('-o', '--output', help='Output file (default stdout)')
+    args = parser.parse_args()
+
+    from .database import db
+    # Keep start-up chatter (model loading) out of an export written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        from .app import create_app
+        app = create_app()
+    with app.app_context():
+        stream = export_stream(
+            db.engine,
+            args.table,
+            args.start,
+            args.end or datetime.datetime.utcnow(),
+            output=args.format,
+            compress=args.gzip,
+            batch_size=args.batch_size or app.config['EXPORT_BATCH_SIZE']
+        )
+        if args.output:
+            f = open(args.output, 'wb') if args.gzip else open(args.output, 'w', newline='')
+            with f:
+                for chunk in stream:
+                    f.write(chunk)
+        else:
+            out = sys.stdout.buffer if args.gzip else sys.stdout
+            for chunk in stream:
+                out.write(chunk)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Asynchronous ingest pipeline for the tracker endpoints.
+
+With INGEST_MODE=async, /api/analytics/store, /user_analytics POST and
+/api/fingerprint/update validate the payload, put it on a bounded in-process
+queue and answer 202 Accepted straight away. Background workers drain the
+queue and write each batch (up to INGEST_BATCH_SIZE events, or whatever
+arrived within INGEST_BATCH_WAIT seconds) in a single transaction.
+
+When the queue is full, `submit` raises IngestQueueFull (served as 429 with
+Retry-After); when the workers are not running it raises IngestUnavailable
+(503). Queue depth and lag are reported by `stats()`.
+
+If INGEST_JOURNAL_DIR is set, every accepted event is first appended (and
+flushed) to a local journal file, so it survives a process crash, and
+workers record the highest sequence number below
+which everything is committed in a checkpoint file. Events journaled but not
+committed when the process stopped are replayed on the next start. Flushing
+only hands the line to the OS, so an event accepted just before a power loss
+or kernel crash can still be lost; INGEST_JOURNAL_FSYNC=true fsyncs every
+append as well, at the cost of one disk sync per accepted event.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+# Use relative imports for local modules
+from .database import db
+from .decoders import FINGERPRINT, DecodeError
+from .ingestion import analytics_values, validate_snapshot
+from .live_metrics import live_metrics
+from .models import AuditLog, BehavioralData, UserAnalytics
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = 'ingest.journal'
+CHECKPOINT_FILE = 'ingest.checkpoint'
+
+
+class IngestQueueFull(Exception):
+    """The queue is at capacity; the client should retry later."""
+
+
+class IngestUnavailable(Exception):
+    """The ingest workers are not running."""
+
+
+def _build_row(app, kind, user_id, payload, received_at):
+    """ORM object for one queued event. The ORM flush runs the usual insert hooks."""
+    if kind == 'analytics':
+        values = analytics_values(user_id, payload, app.config['ANALYTICS_STORAGE_MODE'])
+        return UserAnalytics(created_at=received_at, **values)
+    if kind == 'event':
+        return AuditLog(user_id=user_id, action='analytics_event', details=payload, timestamp=received_at)
+    if kind == 'fingerprint':
+        return BehavioralData(user_id=user_id, fingerprint_data=payload, created_at=received_at)
+    raise ValueError(f"Unknown ingest kind '{kind}'")
+
+
+def validate(kind, payload):
+    """Return an error message for a payload that could never be written, or None."""
+    if kind == 'analytics':
+        return validate_snapshot(payload)
+    if kind == 'fingerprint':
+        try:
+            FINGERPRINT.decode(payload)
+        except DecodeError as e:
+            return str(e)
+    if not isinstance(payload, dict) or not payload:
+        return 'Payload must be a non-empty object'
+    return None
+
+
+class _Journal:
+    """Append-only spill file plus a low-watermark checkpoint of committed events."""
+
+    def __init__(self, directory, fsync=False):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, JOURNAL_FILE)
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+        self.fsync = fsync
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, entry):
+        self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def write_checkpoint(self, seq):
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(seq))
+        os.replace(tmp, self.checkpoint_path)
+
+    def unreplayed(self):
+        """Entries after the checkpoint. A torn final line from a crash is skipped."""
+        checkpoint = self.read_checkpoint()
+        entries = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry['seq'] > checkpoint:
+                    entries.append(entry)
+        return entries
+
+    def truncate(self):
+        self.file.close()
+        self.file = open(self.path, 'w', encoding='utf-8')
+
+    def close(self):
+        self.file.close()
+
+
+class IngestQueue:
+    def __init__(self, app):
+        self.app = app
+        # Capacity bounds every unwritten event (queued or in a batch being
+        # written), so the queue itself never blocks, not even on replay
+        self.capacity = app.config['INGEST_QUEUE_SIZE']
+        self.queue = queue.Queue()
+        self.batch_size = app.config['INGEST_BATCH_SIZE']
+        self.batch_wait = app.config['INGEST_BATCH_WAIT']
+        self.worker_count = app.config['INGEST_WORKERS']
+        self.journal = (_Journal(app.config['INGEST_JOURNAL_DIR'], app.config.get('INGEST_JOURNAL_FSYNC', False))
+                        if app.config.get('INGEST_JOURNAL_DIR') else None)
+
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._pending = set()
+        self._workers = []
+        self._running = False
+        self.counters = {'accepted': 0, 'rejected_full': 0, 'written': 0, 'failed': 0, 'batches': 0}
+
+    # === Producer side ===
+
+    def submit(self, kind, user_id, payload):
+        """Queue one validated event. Raises IngestQueueFull / IngestUnavailable."""
+        if not self.running:
+            raise IngestUnavailable()
+        with self._lock:
+            if len(self._pending) >= self.capacity:
+                self.counters['rejected_full'] += 1
+                raise IngestQueueFull()
+            self._seq += 1
+            entry = {
+                'seq': self._seq,
+                'kind': kind,
+                'user_id': user_id,
+                'payload': payload,
+                'received_at': datetime.datetime.utcnow().isoformat(),
+            }
+            if self.journal:
+                self.journal.append(entry)
+            self._pending.add(entry['seq'])
+            self.queue.put_nowait((time.monotonic(), entry))
+            self.counters['accepted'] += 1
+        return entry['seq']
+
+    # === Consumer side ===
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, entries):
+        rows = [_build_row(self.app, e['kind'], e['user_id'], e['payload'],
+                           datetime.datetime.fromisoformat(e['received_at'])) for e in entries]
+        # Read before the commit expires the rows
+        sessions = [(row.user_id, row.session_duration) for row in rows if isinstance(row, UserAnalytics)]
+        db.session.add_all(rows)
+        db.session.commit()
+        for user_id, session_duration in sessions:
+            live_metrics.record_analytics(user_id, session_duration)
+
+    def _process(self, batch):
+        entries = [entry for _, entry in batch]
+        with self.app.app_context():
+            try:
+                self._write(entries)
+                written, failed = len(entries), 0
+            except Exception:
+                db.session.rollback()
+                logger.exception("Ingest batch failed; retrying events one by one")
+                written = failed = 0
+                for entry in entries:
+                    try:
+                        self._write([entry])
+                        written += 1
+                    except Exception:
+                        db.session.rollback()
+                        failed += 1
+                        logger.exception(f"Dropping ingest event {entry['seq']} ({entry['kind']})")
+            finally:
+                db.session.remove()
+
+        with self._lock:
+            self.counters['written'] += written
+            self.counters['failed'] += failed
+            self.counters['batches'] += 1
+            self._pending.difference_update(entry['seq'] for entry in entries)
+            if self.journal:
+                low_watermark = min(self._pending) - 1 if self._pending else self._seq
+                self.journal.write_checkpoint(low_watermark)
+                if not self._pending:
+                    self.journal.truncate()
+        for _ in batch:
+            self.queue.task_done()
+
+    def _run(self):
+        while self._running or not self.queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+
+    # === Lifecycle ===
+
+    def start(self):
+        self._running = True
+        if self.journal:
+            replay = self.journal.unreplayed()
+            if replay:
+                logger.info(f"Replaying {len(replay)} journaled ingest events")
+            with self._lock:
+                # The journal is emptied after a full drain but the checkpoint keeps its
+                # high mark; numbering must continue above it, or events journaled after
+                # this start would count as committed if the process died before a write
+                self._seq = max(self._seq, self.journal.read_checkpoint())
+                for entry in replay:
+                    self._seq = max(self._seq, entry['seq'])
+                    self._pending.add(entry['seq'])
+                    self.queue.put((time.monotonic(), entry))
+        for n in range(self.worker_count):
+            worker = threading.Thread(target=self._run, name=f'ingest-worker-{n}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout=10):
+        """Stop accepting events and let the workers drain what is queued."""
+        self._running = False
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+        if self.journal:
+            self.journal.close()
+
+    @property
+    def running(self):
+        return self._running and any(worker.is_alive() for worker in self._workers)
+
+    def stats(self):
+        with self.queue.mutex:
+            oldest = self.queue.queue[0][0] if self.queue.queue else None
+        with self._lock:
+            return dict(
+                self.counters,
+                depth=len(self._pending),
+                capacity=self.capacity,
+                lag_seconds=round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+                workers_alive=sum(worker.is_alive() for worker in self._workers),
+            )
+
+
+def init_ingest_queue(app):
+    """Start the ingest workers for `app` if INGEST_MODE is 'async'."""
+    if app.config['INGEST_MODE'] != 'async':
+        return None
+    ingest = IngestQueue(app)
+    ingest.start()
+    atexit.register(ingest.stop)
+    app.extensions['ingest_queue'] = ingest
+    return ingest
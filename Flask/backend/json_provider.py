@@ -0,0 +1,130 @@
+"""
+JSON providers for the Flask app.
+
+Flask's default provider serializes datetimes as HTTP dates, escapes all
+non-ASCII text and always goes through the stdlib encoder. The providers here
+share one output format instead:
+
+- keys sorted, no whitespace (indent=2 when Flask asks for pretty output)
+- UTF-8 text, not \\uXXXX escapes
+- datetimes, dates and times as ISO 8601 (`datetime.isoformat()`)
+- Decimal and UUID as strings, dataclasses as objects
+
+`OrjsonProvider` produces it with orjson, several times faster on large
+admin listings and analytics payloads. `StdlibProvider` produces the same
+bytes with the stdlib encoder and is used when orjson is not installed. The
+only differences are in values the app does not emit: floats that need an
+exponent (orjson writes 1e16, the stdlib 1e+16) and NaN/Infinity (orjson
+writes null). Anything orjson refuses, such as integers over 64 bits, falls
+back to the stdlib encoder.
+
+Selected with JSON_PROVIDER: 'auto' (orjson if installed), 'orjson',
+'stdlib', or 'flask' for Flask's own provider.
+"""
+
+import dataclasses
+import datetime
+import decimal
+import logging
+import uuid
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ('auto', 'orjson', 'stdlib', 'flask')
+
+
+def _default(o):
+    """Values the encoders do not handle themselves."""
+    if isinstance(o, (datetime.date, datetime.time)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class StdlibProvider(DefaultJSONProvider):
+    """The shared output format, written by the stdlib json module."""
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = True
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    class OrjsonProvider(StdlibProvider):
+        """The shared output format, written by orjson."""
+
+        def _options(self, kwargs):
+            """orjson options for the dumps() arguments Flask passes, or None if unsupported."""
+            indent = kwargs.get('indent')
+            if set(kwargs) - {'indent', 'separators'} or indent not in (None, 2):
+                return None
+            if indent is None and kwargs.get('separators', (',', ':')) != (',', ':'):
+                return None
+            return _OPTIONS | orjson.OPT_INDENT_2 if indent else _OPTIONS
+
+        def dumps_bytes(self, obj, **kwargs):
+            option = self._options(kwargs)
+            if option is not None:
+                try:
+                    return orjson.dumps(obj, default=_default, option=option)
+                except TypeError:
+                    pass
+            return super().dumps(obj, **kwargs).encode('utf-8')
+
+        def dumps(self, obj, **kwargs):
+            return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            if not kwargs:
+                try:
+                    return orjson.loads(s)
+                except orjson.JSONDecodeError:
+                    # NaN literals and huge integers are fine for the stdlib
+                    # parser, which also raises the usual error otherwise
+                    pass
+            return super().loads(s, **kwargs)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            if (self.compact is None and self._app.debug) or self.compact is False:
+                body = self.dumps_bytes(obj, indent=2)
+            else:
+                body = self.dumps_bytes(obj)
+            return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+else:
+    OrjsonProvider = None
+
+
+def init_json(app):
+    """Install the provider selected by JSON_PROVIDER on `app`."""
+    choice = app.config.get('JSON_PROVIDER', 'auto')
+    if choice not in PROVIDERS:
+        raise ValueError(f"Unknown JSON_PROVIDER '{choice}', expected one of {PROVIDERS}")
+    if choice == 'flask':
+        return app.json
+    if choice == 'orjson' and OrjsonProvider is None:
+        raise RuntimeError("JSON_PROVIDER=orjson but orjson is not installed")
+
+    provider_class = OrjsonProvider if choice in ('auto', 'orjson') and OrjsonProvider else StdlibProvider
+    app.json = provider_class(app)
+    logger.info(f"JSON provider: {provider_class.__name__}")
+    return app.json
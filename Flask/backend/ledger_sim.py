@@ -0,0 +1,338 @@
+"""
+In-process simulator of the CyberIdentity contract.
+
+Mirrors blockchain/contracts/CyberIdentity.sol closely enough to size
+session logging before wiring a real chain:
+
+- `registerDID(sender, did_document)` reverts with "DID already registered";
+- `verifyDID(address)` and `getSessionCount(address)` are free views;
+- `logSession(sender, session_hash)` reverts with "DID not registered" and
+  appends (hash, block timestamp) to the sender's sessions;
+- `logSessionBatch(sender, hashes)` is the batched form a contract upgrade
+  would add (one transaction, one length update, one event per hash).
+
+Transactions go to a FIFO mempool and are executed when a block is mined.
+Blocks are limited by `block_gas_limit`; a transaction that needs more than
+a whole block is included alone with status 0 ("out of gas"). Every
+transaction is charged gas from an approximation of post-Berlin EVM costs
+(intrinsic cost, calldata, cold SLOAD/SSTORE, event logs). That is good
+enough to compare submission strategies, not to predict fees.
+
+Time is passed in explicitly (`now=`), so a load generator can drive the
+ledger as a discrete-event simulation much faster than real time. With
+`automine=True` each transaction is mined in its own block at once, like a
+development chain, which is what the `cyberidentity://` anchoring sink uses.
+
+`SessionBatcher` is the client side: it buffers session hashes per sender
+and submits them as single transactions, as one logSessionBatch, or as one
+logSession of their Merkle root (sessions then need an inclusion proof, see
+anchoring.py).
+
+Usage: see benchmarks/ledger_throughput.py.
+"""
+
+import collections
+import hashlib
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+# Use relative imports for local modules
+from .anchoring import leaf_hash, merkle_levels
+
+# Gas costs (approximate EVM schedule after EIP-2929)
+GAS = {
+    'tx': 21000,                 # intrinsic cost of a transaction
+    'calldata_zero': 4,          # per zero calldata byte
+    'calldata_nonzero': 16,      # per non-zero calldata byte
+    'sload_cold': 2100,
+    'sstore_set': 22100,         # zero -> non-zero, cold slot
+    'sstore_reset': 5000,        # non-zero -> non-zero, cold slot
+    'log': 375,
+    'log_topic': 375,
+    'log_byte': 8,
+    'call_overhead': 700,        # dispatch, memory expansion, ABI decoding
+    'loop_overhead': 300,        # per element of a batch
+}
+
+
+class ContractRevert(Exception):
+    """A transaction's `require` failed; the transaction is included with status 0."""
+
+
+def address_for(identity):
+    """Deterministic 20-byte address for a user id or account name."""
+    return '0x' + hashlib.sha256(str(identity).encode()).hexdigest()[-40:]
+
+
+def session_hash(*parts):
+    """bytes32 session hash, as the app would log it."""
+    return hashlib.sha256('-'.join(str(part) for part in parts).encode()).digest()
+
+
+def _calldata_gas(data):
+    zeros = data.count(0)
+    return zeros * GAS['calldata_zero'] + (len(data) - zeros) * GAS['calldata_nonzero']
+
+
+def _session_gas(batched):
+    """Execution gas per logged session: two new slots and a SessionLogged event."""
+    gas = 2 * GAS['sstore_set'] + GAS['log'] + 2 * GAS['log_topic'] + GAS['log_byte'] * 64
+    return gas + GAS['loop_overhead'] if batched else gas
+
+
+def _words(length):
+    return (length + 31) // 32
+
+
+class CyberIdentityLedger:
+    def __init__(self, block_time=12.0, block_gas_limit=30_000_000, automine=False):
+        self.block_time = block_time
+        self.block_gas_limit = block_gas_limit
+        self.automine = automine
+        # Contract storage
+        self.did_doc = {}
+        self.sessions = collections.defaultdict(list)
+        # Chain
+        self.mempool = collections.deque()
+        self.blocks = []
+        self.transactions = {}
+        self._nonces = collections.Counter()
+        self._lock = threading.Lock()
+
+    # === Views ===
+
+    def verifyDID(self, address):
+        return address in self.did_doc
+
+    def getSessionCount(self, address):
+        return len(self.sessions.get(address, ()))
+
+    # === Transactions ===
+
+    def registerDID(self, sender, did_document, now=None):
+        document = did_document.encode()
+        # selector, string offset and length, padded contents
+        calldata = b'\x01' * 4 + b'\x00' * 63 + b'\x01' + document + b'\x00' * (-len(document) % 32)
+        return self._submit(sender, 'registerDID', (did_document,), calldata, now)
+
+    def logSession(self, sender, session_hash, now=None):
+        return self._submit(sender, 'logSession', (session_hash,), b'\x01' * 4 + session_hash, now)
+
+    def logSessionBatch(self, sender, session_hashes, now=None):
+        session_hashes = list(session_hashes)
+        calldata = b'\x01' * 4 + b'\x00' * 63 + bytes([len(session_hashes) % 256 or 1]) + b''.join(session_hashes)
+        return self._submit(sender, 'logSessionBatch', (session_hashes,), calldata, now)
+
+    def _submit(self, sender, method, args, calldata, now):
+        now = time.time() if now is None else now
+        with self._lock:
+            nonce = self._nonces[sender]
+            self._nonces[sender] += 1
+            tx_hash = hashlib.sha256(f'{sender}:{nonce}:{method}'.encode() + calldata).hexdigest()
+            tx = {'hash': tx_hash, 'sender': sender, 'method': method, 'args': args,
+                  'intrinsic_gas': GAS['tx'] + _calldata_gas(calldata), 'submitted_at': now,
+                  'status': None, 'block': None, 'gas_used': None}
+            self.transactions[tx_hash] = tx
+            self.mempool.append(tx)
+        if self.automine:
+            self.mine_block(now)
+        return tx
+
+    # === Execution ===
+
+    def _execute(self, tx, timestamp):
+        """Apply `tx` to contract storage; returns (gas used, events). Raises ContractRevert."""
+        sender = tx['sender']
+        gas = tx['intrinsic_gas'] + GAS['call_overhead'] + GAS['sload_cold']   # reads registered[sender]
+        if tx['method'] == 'registerDID':
+            if sender in self.did_doc:
+                raise ContractRevert('DID already registered')
+            document = tx['args'][0]
+            length = len(document.encode())
+            # registered flag, then the string: short strings share the length slot
+            gas += GAS['sstore_set'] + GAS['sstore_set'] * (1 if length < 32 else 1 + _words(length))
+            gas += GAS['log'] + 2 * GAS['log_topic'] + GAS['log_byte'] * (64 + 32 * _words(length))
+            self.did_doc[sender] = document
+            return gas, [('DIDRegistered', sender, document)]
+
+        if sender not in self.did_doc:
+            raise ContractRevert('DID not registered')
+        hashes = tx['args'][0] if tx['method'] == 'logSessionBatch' else [tx['args'][0]]
+        sessions = self.sessions[sender]
+        # Array length once per call, then two new slots (hash, timestamp) and an event per session
+        gas += GAS['sstore_reset'] if sessions else GAS['sstore_set']
+        gas += _session_gas(tx['method'] == 'logSessionBatch') * len(hashes)
+        events = []
+        for value in hashes:
+            sessions.append((value, timestamp))
+            events.append(('SessionLogged', sender, value, timestamp))
+        return gas, events
+
+    def mine_block(self, now=None):
+        """Mine one block from the head of the mempool; returns it."""
+        now = time.time() if now is None else now
+        with self._lock:
+            included, gas_used = [], 0
+            while self.mempool:
+                tx = self.mempool[0]
+                try:
+                    gas, events = self._execute(tx, int(now))
+                    status = 1
+                except ContractRevert as e:
+                    gas, events, status = tx['intrinsic_gas'] + GAS['sload_cold'], [], 0
+                    tx['revert_reason'] = str(e)
+                if gas > self.block_gas_limit:
+                    # Runs out of gas in any block: included on its own, burning the whole limit
+                    if status:
+                        self._rollback(tx)
+                    gas, events, status = self.block_gas_limit, [], 0
+                    tx['revert_reason'] = 'out of gas'
+                if gas_used + gas > self.block_gas_limit:
+                    # Undo the state change; the transaction waits for the next block
+                    if status:
+                        self._rollback(tx)
+                    break
+                self.mempool.popleft()
+                tx.update(status=status, gas_used=gas, events=events, block=len(self.blocks), included_at=now)
+                included.append(tx['hash'])
+                gas_used += gas
+
+            parent = self.blocks[-1]['hash'] if self.blocks else '0' * 64
+            block = {'number': len(self.blocks), 'timestamp': now, 'parent': parent,
+                     'transactions': included, 'gas_used': gas_used}
+            block['hash'] = hashlib.sha256(json.dumps(block, sort_keys=True).encode()).hexdigest()
+            self.blocks.append(block)
+            return block
+
+    def _rollback(self, tx):
+        if tx['method'] == 'registerDID':
+            self.did_doc.pop(tx['sender'], None)
+        else:
+            count = len(tx['args'][0]) if tx['method'] == 'logSessionBatch' else 1
+            del self.sessions[tx['sender']][-count:]
+
+    def max_session_batch(self):
+        """Most hashes a logSessionBatch can carry and still fit in a block, in the worst case."""
+        fixed = (GAS['tx'] + _calldata_gas(b'\x01' * 5 + b'\x00' * 63) + GAS['call_overhead']
+                 + GAS['sload_cold'] + GAS['sstore_set'])
+        per_session = _session_gas(True) + 32 * GAS['calldata_nonzero']
+        return max(1, (self.block_gas_limit - fixed) // per_session)
+
+    def receipt(self, tx_hash):
+        tx = self.transactions.get(tx_hash)
+        if tx is None or tx['block'] is None:
+            return None
+        return {key: tx[key] for key in ('hash', 'block', 'status', 'gas_used', 'events')}
+
+    def stats(self):
+        with self._lock:
+            blocks = self.blocks
+            gas = sum(block['gas_used'] for block in blocks)
+            return {
+                'blocks': len(blocks),
+                'transactions': sum(len(block['transactions']) for block in blocks),
+                'pending': len(self.mempool),
+                'gas_used': gas,
+                'block_fullness': gas / (len(blocks) * self.block_gas_limit) if blocks else 0.0,
+                'sessions': sum(len(entries) for entries in self.sessions.values()),
+            }
+
+
+# === Client-side batching ===
+
+class SessionBatcher:
+    """
+    Buffers session hashes per sender and submits them when `max_batch` are
+    waiting or the oldest has waited `max_wait` seconds. Modes:
+
+    - 'single': one logSession per hash (no buffering);
+    - 'batch': one logSessionBatch per flush, at most what fits in a block;
+    - 'merkle': one logSession of the Merkle root of the flushed hashes.
+    """
+
+    MODES = ('single', 'batch', 'merkle')
+
+    def __init__(self, ledger, mode='batch', max_batch=100, max_wait=2.0):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown batching mode '{mode}'")
+        self.ledger = ledger
+        self.mode = mode
+        self.max_batch = 1 if mode == 'single' else max_batch
+        if mode == 'batch':
+            # A batch over the block gas limit could only fail out of gas
+            self.max_batch = min(max_batch, ledger.max_session_batch())
+        self.max_wait = max_wait
+        self._pending = collections.OrderedDict()   # sender -> [(hash, queued_at)]
+        # tx hash -> queue times of the sessions it carries, for latency accounting
+        self.carried = {}
+
+    def add(self, sender, value, now):
+        pending = self._pending.setdefault(sender, [])
+        pending.append((value, now))
+        if len(pending) >= self.max_batch:
+            self._flush_sender(sender, now)
+
+    def poll(self, now):
+        """Flush senders whose oldest session has waited max_wait."""
+        # Same expression as next_deadline, so polling at the deadline always flushes
+        for sender in [s for s, pending in self._pending.items() if pending[0][1] + self.max_wait <= now]:
+            self._flush_sender(sender, now)
+
+    def next_deadline(self):
+        return min((pending[0][1] + self.max_wait for pending in self._pending.values()), default=None)
+
+    def flush(self, now):
+        for sender in list(self._pending):
+            self._flush_sender(sender, now)
+
+    def _flush_sender(self, sender, now):
+        pending = self._pending.pop(sender, None)
+        if not pending:
+            return
+        hashes = [value for value, _ in pending]
+        if self.mode == 'batch':
+            tx = self.ledger.logSessionBatch(sender, hashes, now=now)
+        elif self.mode == 'merkle':
+            root = merkle_levels([leaf_hash(value) for value in hashes])[-1][0]
+            tx = self.ledger.logSession(sender, root, now=now)
+        else:
+            tx = self.ledger.logSession(sender, hashes[0], now=now)
+        self.carried[tx['hash']] = [queued_at for _, queued_at in pending]
+
+
+# === Anchoring sink ===
+
+class CyberIdentitySink:
+    """
+    Anchoring sink (`cyberidentity://name`) that logs each Merkle root with
+    logSession on an auto-mined simulated ledger, shared per name.
+    """
+
+    name = 'cyberidentity'
+
+    _ledgers = {}
+    _lock = threading.Lock()
+
+    def __init__(self, url='cyberidentity://default'):
+        name = urlparse(url).netloc or 'default'
+        with self._lock:
+            if name not in self._ledgers:
+                self._ledgers[name] = CyberIdentityLedger(automine=True)
+            self.ledger = self._ledgers[name]
+        self.address = address_for('audit-anchorer')
+        if not self.ledger.verifyDID(self.address):
+            self.ledger.registerDID(self.address, 'did:walmart-secure:audit-anchorer')
+
+    def commit(self, root, first_id, last_id, leaf_count):
+        tx = self.ledger.logSession(self.address, bytes.fromhex(root))
+        if tx['status'] != 1:
+            raise ContractRevert(tx.get('revert_reason', 'logSession failed'))
+        return f"block:{tx['block']}:{tx['hash']}"
+
+    def lookup(self, receipt):
+        tx = self.ledger.transactions.get(receipt.rsplit(':', 1)[-1])
+        if tx is None or tx['status'] != 1:
+            return None
+        return tx['args'][0].hex()
@@ -0,0 +1,185 @@
+"""
+In-memory live metrics for the admin real-time streams.
+
+The write paths (signup, login, OTP, risk assessment, analytics storage)
+call the `record_*` methods of `live_metrics` after their commit. Each call
+bumps counters in the current one-second bucket of a sliding window of
+LIVE_METRICS_WINDOW_SECONDS, so reading the metrics never touches the
+database and costs one pass over the buckets.
+
+Socket.IO clients subscribe once by joining admin_room; websocket.py then
+checks `changes()` every LIVE_METRICS_PUSH_INTERVAL and broadcasts only the
+streams whose numbers moved (new events or events sliding out of the
+window). Metrics are per process: with several nodes each reports what it
+served itself.
+
+Streams, keyed by the `type` the dashboard already switches on:
+
+- login_attempts / otp_attempts: total, successful, failed, success rate;
+- risk_data: low/medium/high counts, average score and a 10-point score
+  histogram;
+- user_analytics: active users, signups, stored snapshots, average session
+  duration and the login success rate.
+"""
+
+import collections
+import threading
+import time
+
+RISK_LABELS = ('low', 'medium', 'high')
+HISTOGRAM_BINS = 10
+
+
+class SlidingWindow:
+    """Counters over the last `seconds`, kept in `resolution`-second buckets."""
+
+    def __init__(self, seconds, resolution=1.0):
+        self.seconds = seconds
+        self.resolution = resolution
+        self._buckets = collections.deque()
+
+    def add(self, counts, now):
+        index = int(now // self.resolution)
+        if not self._buckets or self._buckets[-1][0] != index:
+            self._buckets.append((index, collections.Counter()))
+        self._buckets[-1][1].update(counts)
+
+    def totals(self, now):
+        oldest = int(now // self.resolution) - int(self.seconds / self.resolution)
+        while self._buckets and self._buckets[0][0] <= oldest:
+            self._buckets.popleft()
+        total = collections.Counter()
+        for _, counts in self._buckets:
+            total.update(counts)
+        return total
+
+
+def _rate(part, whole):
+    return round(100.0 * part / whole, 1) if whole else 0.0
+
+
+class LiveMetrics:
+    def __init__(self, window_seconds=300, max_users=10000):
+        self.configure(window_seconds, max_users)
+
+    def configure(self, window_seconds, max_users):
+        """(Re)start with an empty window of `window_seconds`."""
+        self._lock = threading.Lock()
+        self.window_seconds = window_seconds
+        self.max_users = max_users
+        self._window = SlidingWindow(window_seconds)
+        # user_id -> last activity (monotonic), oldest first
+        self._active = collections.OrderedDict()
+        # user_id -> latest per-user figures, least recently updated first
+        self._users = collections.OrderedDict()
+        self._pushed = {}
+
+    # === Write side ===
+
+    def _add(self, counts, user_id=None, **latest):
+        now = time.monotonic()
+        with self._lock:
+            self._window.add(counts, now)
+            if user_id is not None:
+                self._active.pop(user_id, None)
+                self._active[user_id] = now
+                figures = self._users.pop(user_id, {})
+                figures.update(latest)
+                self._users[user_id] = figures
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+
+    def record_signup(self):
+        self._add({'signup': 1})
+
+    def record_login(self, success, user_id=None):
+        self._add({'login_success' if success else 'login_failed': 1}, user_id)
+
+    def record_otp(self, success, user_id=None):
+        self._add({'otp_success' if success else 'otp_failed': 1}, user_id)
+
+    def record_risk(self, user_id, risk_score, risk_label):
+        bin_index = min(HISTOGRAM_BINS - 1, max(0, int(risk_score // (100 / HISTOGRAM_BINS))))
+        self._add({f'risk_{risk_label}': 1, 'risk_score_sum': risk_score, f'risk_bin_{bin_index}': 1},
+                  user_id, risk_score=risk_score, risk_label=risk_label)
+
+    def record_analytics(self, user_id, session_duration=None, count=1):
+        counts = {'analytics': count}
+        latest = {}
+        if session_duration is not None:
+            counts.update(session_count=1, session_sum=session_duration)
+            latest['session_duration'] = session_duration
+        self._add(counts, user_id, **latest)
+
+    # === Read side ===
+
+    def snapshots(self):
+        """Current value of every stream, keyed by stream type."""
+        now = time.monotonic()
+        with self._lock:
+            totals = self._window.totals(now)
+            cutoff = now - self.window_seconds
+            while self._active and next(iter(self._active.values())) <= cutoff:
+                self._active.popitem(last=False)
+            active_users = len(self._active)
+
+        window = {'window_seconds': self.window_seconds}
+        logins = totals['login_success'] + totals['login_failed']
+        otps = totals['otp_success'] + totals['otp_failed']
+        assessments = sum(totals[f'risk_{label}'] for label in RISK_LABELS)
+        return {
+            'login_attempts': {
+                'total_attempts': logins,
+                'successful_attempts': totals['login_success'],
+                'failed_attempts': totals['login_failed'],
+                'success_rate': _rate(totals['login_success'], logins),
+                **window
+            },
+            'otp_attempts': {
+                'total_attempts': otps,
+                'successful_attempts': totals['otp_success'],
+                'failed_attempts': totals['otp_failed'],
+                'success_rate': _rate(totals['otp_success'], otps),
+                **window
+            },
+            'risk_data': {
+                **{f'{label}_risk': totals[f'risk_{label}'] for label in RISK_LABELS},
+                'total_assessments': assessments,
+                'average_score': round(totals['risk_score_sum'] / assessments, 2) if assessments else 0.0,
+                'score_histogram': [totals[f'risk_bin_{i}'] for i in range(HISTOGRAM_BINS)],
+                **window
+            },
+            'user_analytics': {
+                'active_users': active_users,
+                'new_users': totals['signup'],
+                'analytics_snapshots': totals['analytics'],
+                'average_session_duration': (
+                    round(totals['session_sum'] / totals['session_count'], 1) if totals['session_count'] else 0.0
+                ),
+                'login_success_rate': _rate(totals['login_success'], logins),
+                **window
+            },
+        }
+
+    def user_snapshot(self, user_id):
+        """Latest figures recorded for one user ({} if none in memory)."""
+        with self._lock:
+            figures = dict(self._users.get(user_id, {}))
+        return {'user_id': user_id, **figures}
+
+    def changes(self):
+        """Streams whose value differs from the last call, for push-on-change."""
+        changed = {}
+        for stream, value in self.snapshots().items():
+            if self._pushed.get(stream) != value:
+                self._pushed[stream] = value
+                changed[stream] = value
+        return changed
+
+
+live_metrics = LiveMetrics()
+
+
+def init_live_metrics(app):
+    live_metrics.configure(app.config['LIVE_METRICS_WINDOW_SECONDS'], app.config['LIVE_METRICS_MAX_USERS'])
+    return live_metrics
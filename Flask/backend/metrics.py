@@ -0,0 +1,232 @@
+"""
+Prometheus metrics, served in the text exposition format at METRICS_PATH.
+
+- http_request_duration_seconds{method, route, status}: histogram of every
+  request, from the first before_request hook until the response is closed,
+  so streamed admin listings count their whole stream. `route` is the URL
+  rule (`/api/analytics/user/<int:user_id>`), never the raw path, which keeps
+  the number of series bounded.
+- http_request_db_queries{route} / http_request_db_seconds{route}: SQL
+  statements per request and the time the database driver spent executing
+  them, on the app's engine.
+- db_queries_total{context} / db_query_seconds_total{context}: all
+  statements, split into 'request' and 'background' (ingest writers,
+  anchoring, broadcasts, ...).
+- model_inference_seconds{model}: RiskModel.predict.
+- socketio_emit_seconds{event}: emit_encoded, both encodings.
+
+Everything is kept in memory per process, like live_metrics; scrape every
+process (or node). Recording is a couple of perf_counter calls plus a locked
+list increment per observation, cheap enough to leave on in production (see
+benchmarks/metrics_overhead.py). METRICS_ENABLED=false skips the request and
+query timing and the endpoint; set METRICS_TOKEN to require
+`Authorization: Bearer <token>` on scrapes.
+"""
+
+import bisect
+import hmac
+import threading
+import time
+
+from flask import Response, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds (seconds) of the latency buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            lines.append(f'{self.name}{_format_labels(self.labels, labels)} {_format_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label values -> per-bucket counts (last one +Inf), then the sum
+        self._series = {}
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        for labels, values in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                le = f'le="{_format_number(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, labels)} {_format_number(values[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, labels)} {cumulative}')
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = Histogram('http_request_duration_seconds', 'HTTP request latency by route.',
+                                  ('method', 'route', 'status'))
+        self.request_queries = Histogram('http_request_db_queries', 'SQL statements executed per request.',
+                                         ('route',), QUERY_COUNT_BUCKETS)
+        self.request_db_time = Histogram('http_request_db_seconds', 'Time spent executing SQL per request.',
+                                         ('route',))
+        self.queries = Counter('db_queries_total', 'SQL statements executed.', ('context',))
+        self.query_time = Counter('db_query_seconds_total', 'Time spent executing SQL.', ('context',))
+        self.inference = Histogram('model_inference_seconds', 'Risk model inference latency.', ('model',))
+        self.emits = Histogram('socketio_emit_seconds', 'Socket.IO emit latency by event.', ('event',))
+        self.families = [self.requests, self.request_queries, self.request_db_time, self.queries,
+                         self.query_time, self.inference, self.emits]
+
+    def observe_inference(self, model, seconds):
+        self.inference.observe(seconds, model)
+
+    def observe_emit(self, event, seconds):
+        self.emits.observe(seconds, event)
+
+    def render(self):
+        lines = []
+        for family in self.families:
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+# [statement count, seconds] of the request the current thread is serving
+_current = threading.local()
+
+
+# === SQL timing ===
+
+def _record_query(elapsed):
+    stats = getattr(_current, 'db', None)
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+    else:
+        metrics.queries.inc(1, 'background')
+        metrics.query_time.inc(elapsed, 'background')
+
+
+def _timed(execute):
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return execute(*args, **kwargs)
+        finally:
+            _record_query(time.perf_counter() - started)
+    return timed
+
+
+def install_query_timing(engine):
+    """
+    Time every statement `engine` sends to the database driver. The dialect's
+    execute methods are wrapped rather than listening to before/after_cursor_execute:
+    any engine event listener moves every statement onto SQLAlchemy's slower
+    event-dispatch path, which cost more than the timing itself.
+    """
+    dialect = engine.dialect
+    if getattr(dialect, '_metrics_timed', False):
+        return
+    for name in ('do_execute', 'do_executemany', 'do_execute_no_params'):
+        setattr(dialect, name, _timed(getattr(dialect, name)))
+    dialect._metrics_timed = True
+
+
+# === Request hooks ===
+
+def _start_request():
+    _current.db = [0, 0.0]
+    _current.started = time.perf_counter()
+
+
+def _finish_request(response):
+    stats = getattr(_current, 'db', None)
+    if stats is None:
+        return response
+    started = _current.started
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    method, status = request.method, str(response.status_code)
+
+    def record():
+        metrics.requests.observe(time.perf_counter() - started, method, route, status)
+        metrics.request_queries.observe(stats[0], route)
+        metrics.request_db_time.observe(stats[1], route)
+        metrics.queries.inc(stats[0], 'request')
+        metrics.query_time.inc(stats[1], 'request')
+        # A streamed body runs on this thread until it is closed; stop attributing queries after that
+        if getattr(_current, 'db', None) is stats:
+            _current.db = None
+
+    response.call_on_close(record)
+    return response
+
+
+def init_metrics(app):
+    """Install the request and query hooks and the scrape endpoint (unless METRICS_ENABLED is off)."""
+    if not app.config['METRICS_ENABLED']:
+        return None
+    from .database import db
+    with app.app_context():
+        install_query_timing(db.engine)
+    # First in line, so the timing covers the other hooks too
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_finish_request)
+    token = app.config.get('METRICS_TOKEN')
+
+    def scrape():
+        if token:
+            supplied = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+                return Response('Unauthorized\n', status=401, content_type=CONTENT_TYPE)
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule(app.config['METRICS_PATH'], 'metrics', scrape, methods=['GET'])
+    return metrics
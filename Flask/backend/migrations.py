@@ -0,0 +1,215 @@
+"""
+Lightweight schema migrations.
+
+`db.create_all()` only creates missing tables, so databases created by an
+older release never pick up new indexes or columns. Each migration below is a
+numbered, idempotent step; `upgrade()` runs the ones not yet recorded in the
+`schema_migrations` table. Fresh databases run them too, as no-ops against the
+schema `create_all()` just built, so both paths end at the same version.
+
+Usage (from the Flask directory):
+    python -m backend.migrations status
+    python -m backend.migrations upgrade
+"""
+
+import argparse
+import datetime
+import logging
+
+import sqlalchemy as sa
+
+# Use relative imports for local modules
+from .database import db
+from .models import (BehavioralData, RiskAssessment, AuditLog, UserAnalytics, MetricRollup, AuditAnchor,
+                     AuditChainHead, AuditChainCheckpoint, promoted_audit_fields)
+from . import audit_chain, rollups
+
+logger = logging.getLogger(__name__)
+
+schema_migrations = sa.Table(
+    'schema_migrations',
+    sa.MetaData(),
+    sa.Column('version', sa.Integer, primary_key=True),
+    sa.Column('description', sa.String(255), nullable=False),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+# Registered migrations, ordered by version: (version, description, function)
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration step. Steps must be safe to re-run."""
+    def decorator(fn):
+        if any(existing[0] == version for existing in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return fn
+    return decorator
+
+
+# === Helpers for migration steps ===
+
+def has_column(conn, table_name, column_name):
+    return any(col['name'] == column_name for col in sa.inspect(conn).get_columns(table_name))
+
+
+def add_column(conn, table_name, column):
+    """Add a column to an existing table unless it is already there."""
+    if has_column(conn, table_name, column.name):
+        return False
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(sa.text(f'ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}'))
+    return True
+
+
+def create_indexes(conn, model, names=None):
+    """
+    Create the named indexes declared on a model, unless already there. A
+    migration names only the indexes it introduces, since the model also
+    declares later ones over columns a later migration adds; all of them
+    (`names=None`) only for a table the same migration created.
+    """
+    indexes = {index.name: index for index in model.__table__.indexes}
+    for name in indexes if names is None else names:
+        indexes[name].create(conn, checkfirst=True)
+
+
+# === Migrations ===
+
+@migration(1, 'Hot-path indexes for time-ordered queries')
+def _hot_path_indexes(conn):
+    create_indexes(conn, BehavioralData, ['ix_behavioral_data_user_created'])
+    create_indexes(conn, UserAnalytics, ['ix_user_analytics_user_created'])
+    create_indexes(conn, AuditLog, ['ix_audit_log_timestamp', 'ix_audit_log_action_timestamp'])
+    create_indexes(conn, RiskAssessment, ['ix_risk_assessment_label_created'])
+
+
+@migration(2, 'Dashboard rollups backfilled from existing events')
+def _metric_rollups(conn):
+    MetricRollup.__table__.create(conn, checkfirst=True)
+    rollups.backfill(conn)
+
+
+@migration(3, 'AuditLog (user_id, timestamp) index for filtered admin listings')
+def _audit_log_user_index(conn):
+    create_indexes(conn, AuditLog, ['ix_audit_log_user_timestamp'])
+
+
+@migration(4, 'Promote AuditLog.details hot fields into typed, indexed columns')
+def _audit_log_promoted_fields(conn, batch_size=5000):
+    table = AuditLog.__table__
+    promoted = ('success', 'final_label', 'final_score', 'ip_address')
+    for name in promoted:
+        add_column(conn, 'audit_log', table.c[name])
+    create_indexes(conn, AuditLog, ['ix_audit_log_action_success_timestamp', 'ix_audit_log_ip_timestamp',
+                                    'ix_audit_log_final_label_timestamp', 'ix_audit_log_final_score'])
+
+    # Backfill in id order, one batch per round trip
+    update = (table.update()
+              .where(table.c.id == sa.bindparam('row_id'))
+              .values({name: sa.bindparam(name) for name in promoted}))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(table.c.id, table.c.details)
+            .where(table.c.id > last_id, table.c.details.isnot(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        params = [dict(row_id=row_id, **promoted_audit_fields(details)) for row_id, details in rows]
+        conn.execute(update, params)
+        conn.commit()
+        last_id = rows[-1][0]
+        logger.info(f"Backfilled promoted AuditLog fields up to id {last_id}")
+
+
+@migration(5, 'UserAnalytics compact payload column')
+def _user_analytics_payload(conn):
+    add_column(conn, 'user_analytics', UserAnalytics.__table__.c.analytics_payload)
+
+
+@migration(6, 'AuditAnchor table for Merkle-anchored audit batches')
+def _audit_anchor(conn):
+    AuditAnchor.__table__.create(conn, checkfirst=True)
+
+
+@migration(7, 'AuditLog hash chain columns, stripe heads and checkpoints')
+def _audit_chain(conn):
+    table = AuditLog.__table__
+    for name in ('chain', 'prev_hash', 'row_hash'):
+        add_column(conn, 'audit_log', table.c[name])
+    create_indexes(conn, AuditLog, ['ix_audit_log_chain_id'])
+    AuditChainHead.__table__.create(conn, checkfirst=True)
+    AuditChainCheckpoint.__table__.create(conn, checkfirst=True)
+    create_indexes(conn, AuditChainCheckpoint)
+    conn.commit()
+    # Existing rows are linked into stripe 0 in id order
+    audit_chain.backfill(conn)
+
+
+# === Runner ===
+
+def applied_versions(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return {row[0] for row in conn.execute(sa.select(schema_migrations.c.version))}
+
+
+def pending_migrations(conn):
+    applied = applied_versions(conn)
+    return [item for item in MIGRATIONS if item[0] not in applied]
+
+
+def upgrade(engine=None):
+    """
+    Apply all pending migrations. Each step is committed together with its
+    version row; long backfills may also commit between batches, which is why
+    every step has to be safe to re-run after an interruption.
+    """
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        pending = pending_migrations(conn)
+
+    for version, description, fn in pending:
+        with engine.connect() as conn:
+            logger.info(f"Applying migration {version}: {description}")
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.datetime.utcnow()
+            ))
+            conn.commit()
+    return [item[0] for item in pending]
+
+
+def current_version(engine=None):
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+    return max(applied) if applied else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage database schema migrations')
+    parser.add_argument('command', choices=['status', 'upgrade'])
+    args = parser.parse_args()
+
+    from .app import create_app
+    app = create_app()
+    with app.app_context():
+        if args.command == 'upgrade':
+            applied = upgrade()
+            print(f"Applied migrations: {applied or 'none'}")
+        with db.engine.begin() as conn:
+            pending = pending_migrations(conn)
+        print(f"Current version: {current_version()}")
+        for version, description, _ in pending:
+            print(f"Pending: {version} - {description}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,14 @@
 import joblib
 import os
+import time
 import pandas as pd
 import warnings
 
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
 # Suppress scikit-learn version warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="sklearn")
 
@@ -34,6 +40,13 @@ class RiskModel:
             self.encoder = None
 
     def predict(self, data):
+        started = time.perf_counter()
+        try:
+            return self._predict(data)
+        finally:
+            metrics.observe_inference('risk_model', time.perf_counter() - started)
+
+    def _predict(self, data):
         if not all([self.model, self.scaler, self.encoder]):
             # Return a default/mock prediction if models are not loaded
             print("Models not loaded, returning mock prediction")
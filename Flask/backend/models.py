@@ -28,6 +28,10 @@ class BehavioralData(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     fingerprint_data = db.Column(MutableDict.as_mutable(JSON), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_behavioral_data_user_created', 'user_id', 'created_at'),
+    )
     
     def __repr__(self):
         return f'<BehavioralData {self.id} for User {self.user_id}>'
@@ -39,6 +43,10 @@ class RiskAssessment(db.Model):
     risk_label = db.Column(db.String(20), nullable=False)  # 'low', 'medium', 'high'
     component_scores = db.Column(MutableDict.as_mutable(JSON), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_risk_assessment_label_created', 'risk_label', 'created_at'),
+    )
     
     def __repr__(self):
         return f'<RiskAssessment {self.id} for User {self.user_id}: {self.risk_label}>'
@@ -49,10 +57,65 @@ class AuditLog(db.Model):
     action = db.Column(db.String(50), nullable=False)
     details = db.Column(MutableDict.as_mutable(JSON), nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    # Hot fields promoted out of `details` so they can be indexed; kept in sync
+    # with `details` by the before_insert/before_update hooks below
+    success = db.Column(db.Boolean, nullable=True)
+    final_label = db.Column(db.String(20), nullable=True)
+    final_score = db.Column(db.Float, nullable=True)
+    ip_address = db.Column(db.String(45), nullable=True)
+
+    # Hash chain maintained by audit_chain.py: each row is linked into one of
+    # AUDIT_CHAIN_STRIPES independent chains (hex SHA-256 values)
+    chain = db.Column(db.SmallInteger, nullable=True)
+    prev_hash = db.Column(db.String(64), nullable=True)
+    row_hash = db.Column(db.String(64), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_audit_log_timestamp', 'timestamp'),
+        db.Index('ix_audit_log_action_timestamp', 'action', 'timestamp'),
+        db.Index('ix_audit_log_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_audit_log_action_success_timestamp', 'action', 'success', 'timestamp'),
+        db.Index('ix_audit_log_ip_timestamp', 'ip_address', 'timestamp'),
+        db.Index('ix_audit_log_final_label_timestamp', 'final_label', 'timestamp'),
+        db.Index('ix_audit_log_final_score', 'final_score'),
+        db.Index('ix_audit_log_chain_id', 'chain', 'id'),
+    )
     
     def __repr__(self):
         return f'<AuditLog {self.id}: {self.action}>'
 
+def promoted_audit_fields(details):
+    """Typed values of the AuditLog columns derived from a details dict."""
+    details = details or {}
+    success = details.get('success')
+    final_label = details.get('final_label')
+    final_score = details.get('final_score')
+    ip_address = details.get('ip_address')
+    return {
+        'success': success if isinstance(success, bool) else None,
+        'final_label': str(final_label)[:20] if final_label is not None else None,
+        'final_score': float(final_score) if isinstance(final_score, (int, float)) and not isinstance(final_score, bool) else None,
+        'ip_address': str(ip_address)[:45] if ip_address is not None else None,
+    }
+
+def audit_canonical_bytes(row_id, user_id, action, details, timestamp):
+    """
+    Canonical serialization of an AuditLog row's content, the input of its
+    integrity hashes. The promoted columns are derived from `details`, so
+    they are covered without being listed.
+    """
+    return json.dumps(
+        [row_id, user_id, action, details, timestamp.isoformat() if timestamp else None],
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+    ).encode('utf-8')
+
+@db.event.listens_for(AuditLog, 'before_insert')
+@db.event.listens_for(AuditLog, 'before_update')
+def _sync_promoted_audit_fields(mapper, connection, target):
+    for key, value in promoted_audit_fields(target.details).items():
+        setattr(target, key, value)
+
 # New model for storing detailed user analytics
 class UserAnalytics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -89,8 +152,77 @@ class UserAnalytics(db.Model):
     
     # Additional data - renamed from 'metadata' to 'analytics_metadata'
     analytics_metadata = db.Column(MutableDict.as_mutable(JSON), nullable=True)
+    # Compact mode: compressed residual of the payload instead of analytics_metadata
+    # (see analytics_storage.py)
+    analytics_payload = db.Column(db.LargeBinary, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     # Removing updated_at as it's not in the database schema
+
+    __table_args__ = (
+        db.Index('ix_user_analytics_user_created', 'user_id', 'created_at'),
+    )
     
     def __repr__(self):
-        return f'<UserAnalytics {self.id} for User {self.user_id}, Session {self.session_id}>' 
\ No newline at end of file
+        return f'<UserAnalytics {self.id} for User {self.user_id}, Session {self.session_id}>' 
+# Pre-aggregated event counts, maintained by rollups.py in the same transaction
+# as the rows they count
+class MetricRollup(db.Model):
+    metric = db.Column(db.String(30), primary_key=True)     # 'audit_action', 'risk_label', 'user_signup'
+    dimension = db.Column(db.String(50), primary_key=True)  # e.g. the action name or risk label
+    hour = db.Column(db.DateTime, primary_key=True)         # start of the hour bucket (UTC)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_metric_rollup_metric_hour', 'metric', 'hour'),
+    )
+
+    def __repr__(self):
+        return f'<MetricRollup {self.metric}:{self.dimension} @ {self.hour}: {self.count}>'
+
+# Merkle roots of consecutive AuditLog id ranges, committed to an external
+# sink by anchoring.py
+class AuditAnchor(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    first_id = db.Column(db.Integer, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False)
+    leaf_count = db.Column(db.Integer, nullable=False)
+    root = db.Column(db.String(64), nullable=False)           # hex SHA-256
+    sink = db.Column(db.String(20), nullable=False)           # e.g. 'file', 'memory'
+    receipt = db.Column(db.String(255), nullable=True)        # sink's reference to the commitment
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Unique so two nodes anchoring at once can't both record the same batch
+        db.Index('ix_audit_anchor_first_id', 'first_id', unique=True),
+        db.Index('ix_audit_anchor_last_id', 'last_id'),
+    )
+
+    def __repr__(self):
+        return f'<AuditAnchor {self.id}: {self.first_id}-{self.last_id} {self.root[:12]}>'
+
+# Current end of each AuditLog hash chain stripe. Writers lock their stripe's
+# row for the rest of the transaction, so rows of one stripe are linked in id order
+class AuditChainHead(db.Model):
+    stripe = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    head_hash = db.Column(db.String(64), nullable=False)     # row_hash of the last linked row
+    length = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AuditChainHead {self.stripe}: {self.length} rows, {self.head_hash[:12]}>'
+
+# Verified prefixes of the AuditLog hash chains, written by the verification
+# tool so later audits can start where the last clean one stopped
+class AuditChainCheckpoint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    upto_id = db.Column(db.Integer, nullable=False)          # every row with id <= upto_id was verified
+    heads = db.Column(JSON, nullable=False)                  # {stripe: [last_id, row_hash]} at upto_id
+    rows_verified = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_audit_chain_checkpoint_upto_id', 'upto_id'),
+    )
+
+    def __repr__(self):
+        return f'<AuditChainCheckpoint {self.id}: upto {self.upto_id}>'
@@ -0,0 +1,138 @@
+"""
+Keyset pagination and streamed responses for admin listings.
+
+Pages are addressed by an opaque cursor holding the sort key of the last row
+on the previous page, so fetching page N costs the same as page 1 no matter
+how deep it is. The body is generated from a server-side cursor (`yield_per`)
+and streamed as either a JSON array or NDJSON, so memory stays flat for any
+page size. The cursor for the next page is computed up front from the index
+alone and returned in the `X-Next-Cursor` header.
+"""
+
+import base64
+import datetime
+import json
+
+import sqlalchemy as sa
+from flask import Response, current_app, request, stream_with_context
+
+STREAM_BATCH_SIZE = 1000
+
+
+class PaginationError(ValueError):
+    """Raised for malformed pagination parameters; reported as a 400."""
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime.datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, key_types):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if len(values) != len(key_types):
+            raise ValueError('wrong number of key values')
+        return [datetime.datetime.fromisoformat(v) if t is datetime.datetime else t(v)
+                for v, t in zip(values, key_types)]
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise PaginationError(f'Invalid cursor: {e}')
+
+
+def parse_datetime_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f'{name} must be an ISO 8601 datetime')
+
+
+def page_params():
+    """Read `limit`, `cursor` and `format` from the query string."""
+    limit = request.args.get('limit', current_app.config['ADMIN_PAGE_SIZE'], type=int)
+    if limit < 1 or limit > current_app.config['ADMIN_PAGE_SIZE_MAX']:
+        raise PaginationError(f"limit must be between 1 and {current_app.config['ADMIN_PAGE_SIZE_MAX']}")
+    output = request.args.get('format', 'json')
+    if output not in ('json', 'ndjson'):
+        raise PaginationError("format must be 'json' or 'ndjson'")
+    return limit, request.args.get('cursor'), output
+
+
+def keyset_filter(key_columns, cursor_values, descending):
+    """
+    Rows strictly after the cursor in (key) or (key, tiebreaker) order. The
+    leading key is also bounded with a plain range so the planner can seek on
+    its index.
+    """
+    def after(col, val):
+        return col < val if descending else col > val
+
+    if len(key_columns) == 1:
+        return after(key_columns[0], cursor_values[0])
+
+    (lead, tiebreak), (lead_value, tiebreak_value) = key_columns, cursor_values
+    lead_bound = lead <= lead_value if descending else lead >= lead_value
+    return sa.and_(
+        lead_bound,
+        sa.or_(after(lead, lead_value), sa.and_(lead == lead_value, after(tiebreak, tiebreak_value)))
+    )
+
+
+def keyset_page(query, key_columns, key_types, cursor, limit, descending=True):
+    """
+    Apply cursor, ordering and limit to `query`. `key_types` gives the Python type
+    of each key column for decoding the cursor. Returns (page_query, next_cursor);
+    next_cursor is None on the last page.
+    """
+    if cursor:
+        query = query.filter(keyset_filter(key_columns, decode_cursor(cursor, key_types), descending))
+    query = query.order_by(*[col.desc() if descending else col.asc() for col in key_columns])
+
+    # Keys of the last row on this page and the first row of the next one, read
+    # from the index without loading any rows
+    boundary = query.with_entities(*key_columns).offset(limit - 1).limit(2).all()
+    next_cursor = encode_cursor(list(boundary[0])) if len(boundary) == 2 else None
+    return query.limit(limit), next_cursor
+
+
+def stream_rows(query, serialize, output, next_cursor=None):
+    """Stream `query` as a JSON array or NDJSON without materializing the result."""
+    dumps = current_app.json.dumps
+    rows = query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+
+    def encoded():
+        if output == 'ndjson':
+            for row in rows:
+                yield dumps(serialize(row)) + '\n'
+            return
+        yield '['
+        first = True
+        for row in rows:
+            yield ('' if first else ',') + dumps(serialize(row))
+            first = False
+        yield ']'
+
+    def generate():
+        # One chunk per fetched batch rather than per row
+        chunk = []
+        try:
+            for piece in encoded():
+                chunk.append(piece)
+                if len(chunk) >= STREAM_BATCH_SIZE:
+                    yield ''.join(chunk)
+                    chunk = []
+            if chunk:
+                yield ''.join(chunk)
+        finally:
+            # The session may already have been removed by the request teardown,
+            # and iterating checks a connection out again; hand it back here
+            query.session.close()
+
+    mimetype = 'application/x-ndjson' if output == 'ndjson' else 'application/json'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -0,0 +1,376 @@
+"""
+Opt-in request profiler for chasing latency spikes.
+
+Off by default, and then nothing is installed: no request hooks, no thread.
+It turns on when PROFILE_SAMPLE_RATE (a fraction of requests, chosen when
+they start) or PROFILE_SLOW_MS (keep any request that took longer) is set,
+optionally only for the URL rules in PROFILE_ROUTES.
+
+- PROFILE_MODE=stack (default): a background thread wakes every
+  PROFILE_INTERVAL_MS and records the Python stack of each request in flight
+  (sys._current_frames), so the overhead is bounded by the interval and only
+  paid while a tracked request is running. With PROFILE_SLOW_MS every request
+  is tracked, since slowness is only known at the end; traces of requests
+  that were neither sampled nor slow are dropped.
+- PROFILE_MODE=cprofile: deterministic cProfile of the sampled fraction only
+  (it slows a request down too much to run on all of them), so it needs
+  PROFILE_SAMPLE_RATE. With PROFILE_SLOW_MS as well, only sampled requests
+  over the threshold are kept. From Python 3.12 a cProfile trace is
+  process-wide, so one request is traced at a time: a sampled request that
+  starts while another is traced (or while any other cProfile is on) is not
+  profiled, and is counted in `skipped_busy`.
+
+Requests are tracked until their response is closed, so streamed bodies are
+included. Samples are attributed by OS thread, so stack mode needs threaded
+workers; under eventlet/gevent, requests sharing a thread get mixed samples.
+
+The last PROFILE_KEEP traces stay in memory (per process). Admins list them
+at /api/admin/profiles and download one, or all traces of a route merged, as
+collapsed stacks ("frame;frame;frame count" lines, root first), which
+flamegraph.pl, inferno and speedscope read. For cProfile traces the counts
+are microseconds of self time, apportioned along call paths from the
+caller/callee graph; `format=pstats` gives the raw stats for snakeviz or
+pstats.
+"""
+
+import collections
+import cProfile
+import datetime
+import itertools
+import logging
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+MODES = ('stack', 'cprofile')
+
+# Deepest call path followed when turning cProfile stats into stacks
+MAX_DEPTH = 64
+
+# cProfile runs on sys.monitoring from 3.12: one profiler per process, not per thread
+CPROFILE_EXCLUSIVE = sys.version_info >= (3, 12)
+
+# code object -> frame label, shared by every trace
+_labels = {}
+_path_prefixes = sorted({os.path.abspath(path) + os.sep for path in sys.path if path}, key=len, reverse=True)
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for prefix in _path_prefixes:
+            if filename.startswith(prefix):
+                filename = filename[len(prefix):]
+                break
+        label = _labels[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'
+    return label
+
+
+def collapse(frame):
+    """The stack ending at `frame` as one collapsed line, outermost frame first."""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        # Built-ins, e.g. "<method 'execute' of 'sqlite3.Cursor' objects>"
+        return name
+    for prefix in _path_prefixes:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):]
+            break
+    return f'{name} ({filename}:{line})'
+
+
+def pstats_folded(stats):
+    """
+    Collapsed stacks from cProfile stats ({func: (cc, nc, tt, ct, callers)}),
+    counted in microseconds of self time. cProfile only records caller/callee
+    pairs, so a function's time is split over its callers in proportion to
+    the time each call edge accounted for.
+    """
+    callees = collections.defaultdict(list)
+    roots = []
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        known = [caller for caller in callers if caller in stats]
+        if not known:
+            roots.append(func)
+        for caller in known:
+            callees[caller].append((func, callers[caller][3]))
+
+    folded = collections.Counter()
+
+    def walk(func, path, seen, inclusive):
+        cc, nc, tt, ct, callers = stats[func]
+        share = inclusive / ct if ct else 0.0
+        self_us = int(tt * share * 1e6)
+        if self_us:
+            folded[path] += self_us
+        if len(seen) >= MAX_DEPTH:
+            return
+        for callee, edge_time in callees[func]:
+            if callee in seen or not edge_time:
+                continue
+            seen.add(callee)
+            walk(callee, f'{path};{_function_label(callee)}', seen, edge_time * share)
+            seen.discard(callee)
+
+    for root in roots:
+        walk(root, _function_label(root), {root}, stats[root][3])
+    return folded
+
+
+def format_folded(folded):
+    """Collapsed-stack text, heaviest stacks first."""
+    return ''.join(f'{stack} {count}\n' for stack, count in folded.most_common())
+
+
+class Trace:
+    def __init__(self, trace_id, method, route, path, sampled, mode):
+        self.id = trace_id
+        self.method = method
+        self.route = route
+        self.path = path
+        self.sampled = sampled
+        self.mode = mode
+        self.started_at = datetime.datetime.utcnow()
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.status = None
+        self.reason = None
+        self.samples = collections.Counter()
+        self.sample_count = 0
+        self.profiler = None
+        self.holds_cprofile = False
+        self.stats = None
+
+    @property
+    def name(self):
+        return f'{self.method} {self.route}'
+
+    def folded(self):
+        if self.mode == 'cprofile':
+            return pstats_folded(self.stats)
+        return self.samples
+
+    def summary(self):
+        return {
+            'id': self.id, 'method': self.method, 'route': self.route, 'path': self.path,
+            'status': self.status, 'duration_ms': round(self.duration_ms, 2), 'reason': self.reason,
+            'mode': self.mode, 'samples': self.sample_count if self.mode == 'stack' else None,
+            'started_at': self.started_at.isoformat(),
+        }
+
+
+class StackSampler:
+    """Records the stack of every registered thread every `interval` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, trace):
+        with self._lock:
+            self._active[threading.get_ident()] = trace
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+
+    def unregister(self, trace):
+        with self._lock:
+            ident = threading.get_ident()
+            if self._active.get(ident) is trace:
+                del self._active[ident]
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                active = list(self._active.items())
+            for ident, trace in active:
+                frame = frames.get(ident)
+                if frame is not None:
+                    trace.samples[collapse(frame)] += 1
+                    trace.sample_count += 1
+            # Don't keep the frames (and their locals) alive until the next wake-up
+            del frames
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.configure(0.0, 0.0, 'stack', 0.005, 50)
+
+    def configure(self, sample_rate, slow_ms, mode, interval, keep, routes=()):
+        if mode not in MODES:
+            raise ValueError(f"Unknown PROFILE_MODE '{mode}', expected one of {MODES}")
+        if mode == 'cprofile' and slow_ms > 0 and sample_rate <= 0:
+            # cProfile only runs on sampled requests, so this would never trace anything
+            raise ValueError("PROFILE_MODE=cprofile needs PROFILE_SAMPLE_RATE; "
+                             "PROFILE_SLOW_MS only filters the sampled requests")
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000.0
+        self.mode = mode
+        self.routes = set(routes)
+        self.keep = keep
+        self._traces = collections.deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._cprofile_slot = threading.Lock()
+        self.skipped_busy = 0
+        self.sampler = StackSampler(interval) if mode == 'stack' else None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.slow_seconds > 0
+
+    # === Request hooks ===
+
+    def start_request(self):
+        route = request.url_rule.rule if request.url_rule is not None else None
+        if route is None or (self.routes and route not in self.routes):
+            return
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if self.mode == 'cprofile':
+            if not sampled:
+                return
+        elif not sampled and not self.slow_seconds:
+            return
+        trace = Trace(None, request.method, route, request.full_path.rstrip('?'), sampled, self.mode)
+        if self.mode == 'cprofile':
+            if not self._start_cprofile(trace):
+                return
+        else:
+            self.sampler.register(trace)
+        g.profile_trace = trace
+
+    def _start_cprofile(self, trace):
+        """Enable cProfile for `trace`; False if another trace holds the process-wide profiler."""
+        if CPROFILE_EXCLUSIVE:
+            if not self._cprofile_slot.acquire(blocking=False):
+                self._skip_busy()
+                return False
+            trace.holds_cprofile = True
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # "Another profiling tool is already active", e.g. a cProfile run outside the app
+            self._release_cprofile(trace)
+            self._skip_busy()
+            return False
+        trace.profiler = profiler
+        return True
+
+    def _release_cprofile(self, trace):
+        if trace.holds_cprofile:
+            trace.holds_cprofile = False
+            self._cprofile_slot.release()
+
+    def _skip_busy(self):
+        with self._lock:
+            self.skipped_busy += 1
+
+    def finish_request(self, response):
+        trace = g.pop('profile_trace', None)
+        if trace is not None:
+            trace.status = response.status_code
+            response.call_on_close(lambda: self._finish(trace))
+        return response
+
+    def _finish(self, trace):
+        elapsed = time.perf_counter() - trace.started
+        if trace.profiler is not None:
+            trace.profiler.disable()
+            self._release_cprofile(trace)
+        else:
+            self.sampler.unregister(trace)
+        slow = self.slow_seconds > 0 and elapsed >= self.slow_seconds
+        if self.mode == 'cprofile' and self.slow_seconds > 0:
+            keep = slow
+        else:
+            keep = trace.sampled or slow
+        if not keep:
+            return
+        trace.duration_ms = elapsed * 1000
+        trace.reason = 'slow' if slow else 'sampled'
+        if trace.profiler is not None:
+            trace.profiler.create_stats()
+            trace.stats, trace.profiler = trace.profiler.stats, None
+        with self._lock:
+            trace.id = next(self._ids)
+            self._traces.append(trace)
+        logger.info(f"Profiled {trace.name} ({trace.reason}, {trace.duration_ms:.0f} ms) as trace {trace.id}")
+
+    # === Reads ===
+
+    def summaries(self):
+        with self._lock:
+            traces = list(self._traces)
+        return [trace.summary() for trace in reversed(traces)]
+
+    def get(self, trace_id):
+        with self._lock:
+            for trace in self._traces:
+                if trace.id == trace_id:
+                    return trace
+        return None
+
+    def merged(self, route=None, method=None):
+        """Collapsed stacks of every kept trace (of `route`), each under a METHOD route root frame."""
+        with self._lock:
+            traces = [trace for trace in self._traces
+                      if (route is None or trace.route == route) and (method is None or trace.method == method)]
+        folded = collections.Counter()
+        for trace in traces:
+            for stack, count in trace.folded().items():
+                folded[f'{trace.name};{stack}'] += count
+        return folded, len(traces)
+
+    def status(self):
+        return {
+            'enabled': self.enabled, 'mode': self.mode, 'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_seconds * 1000, 'routes': sorted(self.routes), 'keep': self.keep,
+            'interval_ms': self.sampler.interval * 1000 if self.sampler else None,
+            'skipped_busy': self.skipped_busy,
+        }
+
+
+profiler = RequestProfiler()
+
+
+def pstats_bytes(trace):
+    """cProfile stats in the file format pstats.Stats and snakeviz load."""
+    return marshal.dumps(trace.stats)
+
+
+def init_profiling(app):
+    profiler.configure(
+        app.config['PROFILE_SAMPLE_RATE'], app.config['PROFILE_SLOW_MS'], app.config['PROFILE_MODE'],
+        app.config['PROFILE_INTERVAL_MS'] / 1000.0, app.config['PROFILE_KEEP'], app.config['PROFILE_ROUTES'],
+    )
+    if not profiler.enabled:
+        return profiler
+    # First in line, so the trace covers the other hooks (auth, metrics) too
+    app.before_request_funcs.setdefault(None, []).insert(0, profiler.start_request)
+    app.after_request(profiler.finish_request)
+    logger.info(f"Request profiler on: {profiler.status()}")
+    return profiler
@@ -0,0 +1,108 @@
+"""
+Request body decoding for the ingestion endpoints.
+
+Trackers may send their payloads as
+
+- plain JSON (`Content-Type: application/json`), as before;
+- compressed JSON or msgpack (`Content-Encoding: gzip` or `deflate`);
+- msgpack (`Content-Type: application/msgpack`), which is smaller than JSON
+  and cheaper to parse.
+
+INGEST_MAX_BODY_BYTES limits both the bytes on the wire and the decoded size.
+Compressed bodies are inflated with a bounded output buffer, so a small
+"zip bomb" is rejected as soon as it would exceed the limit instead of being
+inflated in full first.
+"""
+
+import zlib
+
+from flask import current_app, request
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# zlib wbits per Content-Encoding; 'deflate' is zlib-wrapped per RFC 9110, but
+# some clients send a raw deflate stream, which is tried as a fallback
+_WBITS = {
+    'gzip': (16 + zlib.MAX_WBITS,),
+    'x-gzip': (16 + zlib.MAX_WBITS,),
+    'deflate': (zlib.MAX_WBITS, -zlib.MAX_WBITS),
+}
+
+
+class PayloadError(ValueError):
+    """A request body that cannot be decoded. `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def inflate(body, encoding, limit):
+    """Decompress `body`, failing once the output would exceed `limit` bytes."""
+    if encoding not in _WBITS:
+        raise PayloadError(f"Unsupported Content-Encoding '{encoding}'", 415)
+    for wbits in _WBITS[encoding]:
+        inflater = zlib.decompressobj(wbits)
+        try:
+            data = inflater.decompress(body, limit + 1)
+        except zlib.error:
+            continue
+        if len(data) > limit:
+            raise PayloadError(f"Decompressed body exceeds {limit} bytes", 413)
+        if not inflater.eof:
+            raise PayloadError("Truncated compressed body")
+        return data
+    raise PayloadError(f"Body is not valid {encoding} data")
+
+
+def decode(body, mimetype):
+    """Parse a decompressed body according to its content type."""
+    if mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            raise PayloadError("msgpack bodies are not supported by this server", 415)
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception:
+            raise PayloadError("Body is not valid msgpack")
+    if mimetype != 'application/json' and not mimetype.endswith('+json'):
+        raise PayloadError(f"Unsupported Content-Type '{mimetype}'", 415)
+    try:
+        return current_app.json.loads(body)
+    except ValueError:
+        raise PayloadError("Body is not valid JSON")
+
+
+def read_payload():
+    """
+    Decoded body of the current request. Plain JSON bodies go through
+    request.get_json() exactly as before; anything else is decoded here.
+    Raises PayloadError for bodies that are too large, malformed or of an
+    unsupported type.
+    """
+    limit = current_app.config['INGEST_MAX_BODY_BYTES']
+    if request.content_length is not None and request.content_length > limit:
+        raise PayloadError(f"Body exceeds {limit} bytes", 413)
+
+    encoding = request.headers.get('Content-Encoding', 'identity').strip().lower()
+    mimetype = request.mimetype
+    if encoding == 'identity' and mimetype not in MSGPACK_MIMETYPES:
+        return request.get_json()
+
+    # Chunked requests carry no Content-Length; read at most one byte past the limit
+    body = bytearray()
+    while len(body) <= limit:
+        chunk = request.stream.read(limit + 1 - len(body))
+        if not chunk:
+            break
+        body += chunk
+    if len(body) > limit:
+        raise PayloadError(f"Body exceeds {limit} bytes", 413)
+    body = bytes(body)
+    if encoding != 'identity':
+        body = inflate(body, encoding, limit)
+    return decode(body, mimetype)
@@ -0,0 +1,176 @@
+"""
+Retention and archival for the high-volume append-only tables.
+
+Rows older than RETENTION_DAYS are copied into gzip-compressed JSONL files,
+one file per table per day:
+
+    ARCHIVE_DIR/audit_log/2025-01-31.jsonl.gz
+    ARCHIVE_DIR/user_analytics/2025-01-31.jsonl.gz
+
+and then deleted from the hot table in batches of RETENTION_BATCH_SIZE, each
+batch in its own short transaction. Archive files are only ever appended to
+(every batch adds a new gzip member), and a batch is flushed to disk before
+its rows are deleted, so a crash can at worst archive a batch twice;
+`search_archive` drops the duplicates by id.
+
+Usage (from the Flask directory):
+    python -m backend.retention run
+    python -m backend.retention search --table audit_log --start 2025-01-01 --end 2025-01-31 --action otp_attempt
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import logging
+import os
+
+# Use relative imports for local modules
+from .analytics_storage import plain_row
+from .database import db
+from .models import AuditLog, UserAnalytics
+
+logger = logging.getLogger(__name__)
+
+# Archived tables and the column their age is measured by
+ARCHIVED_TABLES = {
+    'audit_log': (AuditLog, 'timestamp'),
+    'user_analytics': (UserAnalytics, 'created_at'),
+}
+
+
+def _row_to_dict(model, row):
+    record = {}
+    for column in model.__table__.columns:
+        value = getattr(row, column.key)
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        elif isinstance(value, dict):
+            value = dict(value)
+        record[column.name] = value
+    if model is UserAnalytics:
+        # Archive the readable payload, not the compressed residual
+        record = plain_row(record)
+    return record
+
+
+def _partition_path(archive_dir, table_name, day):
+    return os.path.join(archive_dir, table_name, f'{day.isoformat()}.jsonl.gz')
+
+
+def _append_partition(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+            for record in records:
+                gz.write(json.dumps(record, separators=(',', ':'), default=str).encode('utf-8'))
+                gz.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_table(table_name, cutoff, archive_dir, batch_size):
+    """Move rows older than `cutoff` from one table into its archive. Returns rows moved."""
+    model, time_attr = ARCHIVED_TABLES[table_name]
+    time_column = getattr(model, time_attr)
+    moved = 0
+
+    while True:
+        batch = (model.query
+                 .filter(time_column < cutoff)
+                 .order_by(time_column, model.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+
+        by_day = {}
+        for row in batch:
+            by_day.setdefault(getattr(row, time_attr).date(), []).append(_row_to_dict(model, row))
+        for day, records in by_day.items():
+            _append_partition(_partition_path(archive_dir, table_name, day), records)
+
+        ids = [row.id for row in batch]
+        for row in batch:
+            db.session.expunge(row)
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        moved += len(ids)
+        logger.info(f"Archived {len(ids)} rows from {table_name} ({moved} so far)")
+
+    return moved
+
+
+def run_retention(app, now=None):
+    """Archive every retained table. Must be called inside an app context."""
+    now = now or datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(days=app.config['RETENTION_DAYS'])
+    return {
+        table_name: archive_table(
+            table_name,
+            cutoff,
+            app.config['ARCHIVE_DIR'],
+            app.config['RETENTION_BATCH_SIZE']
+        )
+        for table_name in ARCHIVED_TABLES
+    }
+
+
+def search_archive(archive_dir, table_name, start, end, user_id=None, action=None, limit=100):
+    """
+    Scan the day partitions between `start` and `end` (inclusive dates) for matching rows.
+    Only the partitions in range are opened, so lookups cost one file per day searched.
+    """
+    if table_name not in ARCHIVED_TABLES:
+        raise ValueError(f"Unknown archived table '{table_name}'")
+
+    results = []
+    seen_ids = set()
+    day = start
+    while day <= end and len(results) < limit:
+        path = _partition_path(archive_dir, table_name, day)
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record['id'] in seen_ids:
+                        continue
+                    if user_id is not None and record.get('user_id') != user_id:
+                        continue
+                    if action is not None and record.get('action') != action:
+                        continue
+                    seen_ids.add(record['id'])
+                    results.append(record)
+                    if len(results) >= limit:
+                        break
+        day += datetime.timedelta(days=1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive and search aged audit/analytics rows')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('run', help='Archive rows older than RETENTION_DAYS')
+    search = sub.add_parser('search', help='Search archived rows')
+    search.add_argument('--table', choices=list(ARCHIVED_TABLES), default='audit_log')
+    search.add_argument('--start', type=datetime.date.fromisoformat, required=True)
+    search.add_argument('--end', type=datetime.date.fromisoformat, required=True)
+    search.add_argument('--user-id', type=int)
+    search.add_argument('--action')
+    search.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    from .app import create_app
+    app = create_app()
+    with app.app_context():
+        if args.command == 'run':
+            for table_name, moved in run_retention(app).items():
+                print(f"{table_name}: archived {moved} rows")
+        else:
+            for record in search_archive(app.config['ARCHIVE_DIR'], args.table, args.start, args.end,
+                                         user_id=args.user_id, action=args.action, limit=args.limit):
+                print(json.dumps(record))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,23 @@ from .ml_integration import risk_model_instance
 from .biometrics import analyze_user_behavior
 from .models import RiskAssessment, AuditLog
 from .database import db
+from .decoders import model_input
+from .live_metrics import live_metrics
+from .risk_events import risk_events
 import random
 
-def assess_user_risk(user, request_data):
+def assess_user_risk(user, risk_request):
     """
     Assesses user risk based on ML model, behavior, and other factors.
+    `risk_request` is a record decoded with decoders.RISK.
     """
     # 1. Get ML Model's Risk Score
-    ml_result = risk_model_instance.predict(request_data)
+    ml_result = risk_model_instance.predict(model_input(risk_request))
     ml_score = ml_result.get("score", 0.0) * 100  # Scale to 0-100
     ml_risk_label = ml_result.get("risk_label", "low")
 
     # 2. Get Behavioral Anomaly Score
-    behavioral_analysis = analyze_user_behavior(user, request_data.get('fingerprint', {}))
+    behavioral_analysis = analyze_user_behavior(user, risk_request.fingerprint)
     fingerprint_diff = behavioral_analysis.get('anomaly_score', 0.0) * 100 # Scale to 0-100
 
     # 3. Get Intent Score (mocked for now)
@@ -63,6 +67,8 @@ def assess_user_risk(user, request_data):
     db.session.add(audit)
 
     db.session.commit()
+    live_metrics.record_risk(user.id, final_risk_score, final_risk_label)
+    risk_events.publish_assessment(user.id, final_risk_score, final_risk_label, component_scores)
 
     return {
         "risk_score": final_risk_score,
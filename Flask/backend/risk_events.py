@@ -0,0 +1,98 @@
+"""
+Internal event bus for high-risk assessments.
+
+`assess_user_risk` calls `risk_events.publish_assessment` after committing.
+Assessments scoring above RISK_ALERT_THRESHOLD are appended to a bounded
+in-memory queue, and a dispatcher task hands them to the subscribers.
+websocket.py subscribes to fan them out to admin_room and to the user's own
+room.
+
+Publishing never blocks the scoring request. It takes a short lock and
+appends. When the queue already holds RISK_EVENT_QUEUE_SIZE events, the
+oldest one is dropped and counted, because admins care about the newest
+flags.
+"""
+
+import collections
+import datetime
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RiskEventBus:
+    def __init__(self, threshold=70.0, capacity=1000):
+        self.threshold = threshold
+        self.capacity = capacity
+        self._queue = collections.deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._handlers = []
+        self.running = False
+        self.counters = {'published': 0, 'below_threshold': 0, 'dropped': 0, 'delivered': 0, 'handler_errors': 0}
+
+    def configure(self, threshold, capacity):
+        with self._cond:
+            self.threshold = threshold
+            self.capacity = capacity
+            self._queue = collections.deque(self._queue, maxlen=capacity)
+
+    def subscribe(self, handler):
+        """Call `handler(event)` from the dispatcher for every published event."""
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+
+    def publish(self, event):
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.counters['dropped'] += 1
+            self._queue.append(event)
+            self.counters['published'] += 1
+            self._cond.notify()
+
+    def publish_assessment(self, user_id, risk_score, risk_label, component_scores):
+        """Publish an assessment if it is over the threshold."""
+        if risk_score <= self.threshold:
+            with self._cond:
+                self.counters['below_threshold'] += 1
+            return False
+        self.publish({
+            'user_id': user_id,
+            'risk_score': risk_score,
+            'risk_label': risk_label,
+            'component_scores': component_scores,
+            'assessed_at': datetime.datetime.utcnow().isoformat(),
+        })
+        return True
+
+    def run(self):
+        """Dispatcher loop; start once per process as a Socket.IO background task."""
+        self.running = True
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                batch = list(self._queue)
+                self._queue.clear()
+            for event in batch:
+                for handler in self._handlers:
+                    try:
+                        handler(event)
+                    except Exception:
+                        self.counters['handler_errors'] += 1
+                        logger.exception(f"Risk event handler failed for user {event.get('user_id')}")
+            with self._cond:
+                self.counters['delivered'] += len(batch)
+
+    def stats(self):
+        with self._cond:
+            return dict(self.counters, depth=len(self._queue), capacity=self.capacity,
+                        threshold=self.threshold, running=self.running)
+
+
+risk_events = RiskEventBus()
+
+
+def init_risk_events(app):
+    risk_events.configure(app.config['RISK_ALERT_THRESHOLD'], app.config['RISK_EVENT_QUEUE_SIZE'])
+    return risk_events
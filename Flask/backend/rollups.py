@@ -0,0 +1,135 @@
+"""
+Incrementally maintained rollups for the analytics dashboards.
+
+Every flush that inserts an AuditLog, RiskAssessment or User row also bumps
+an hourly counter in `metric_rollup`, in the same transaction, so the
+dashboards read a handful of pre-aggregated rows instead of counting the
+event tables. Counters survive retention (see retention.py): once an event
+is counted it stays counted after the raw row is archived.
+"""
+
+import collections
+import datetime
+
+import sqlalchemy as sa
+
+# Use relative imports for local modules
+from .database import db
+from .models import User, RiskAssessment, AuditLog, MetricRollup
+
+# metric name -> (model, attribute holding the dimension, attribute holding the event time)
+ROLLUP_SOURCES = {
+    'audit_action': (AuditLog, 'action', 'timestamp'),
+    'risk_label': (RiskAssessment, 'risk_label', 'created_at'),
+    'user_signup': (User, None, 'created_at'),
+}
+
+
+def hour_bucket(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _increments_for(objects, amount=1, metrics=ROLLUP_SOURCES):
+    increments = collections.Counter()
+    for obj in objects:
+        for metric in metrics:
+            model, dimension_attr, time_attr = ROLLUP_SOURCES[metric]
+            if type(obj) is model:
+                dimension = getattr(obj, dimension_attr) if dimension_attr else 'all'
+                occurred_at = getattr(obj, time_attr) or datetime.datetime.utcnow()
+                increments[(metric, dimension, hour_bucket(occurred_at))] += amount
+    return increments
+
+
+def apply_increments(conn, increments):
+    """Add counts to rollup rows, creating them as needed, on the caller's connection."""
+    if not increments:
+        return
+    table = MetricRollup.__table__
+    dialect = conn.dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.metric, table.c.dimension, table.c.hour],
+            set_={'count': table.c.count + stmt.excluded.count}
+        )
+        # One executemany; sorted so concurrent writers lock rollup rows in the same order
+        conn.execute(stmt, [{'metric': metric, 'dimension': dimension, 'hour': hour, 'count': amount}
+                            for (metric, dimension, hour), amount in sorted(increments.items())])
+        return
+
+    for (metric, dimension, hour), amount in increments.items():
+        result = conn.execute(
+            table.update()
+            .where(table.c.metric == metric, table.c.dimension == dimension, table.c.hour == hour)
+            .values(count=table.c.count + amount)
+        )
+        if result.rowcount == 0:
+            conn.execute(table.insert().values(metric=metric, dimension=dimension, hour=hour, count=amount))
+
+
+def _after_flush(session, flush_context):
+    increments = _increments_for(session.new)
+    # Event rows are never un-counted, but deleted users leave the user total
+    increments.update(_increments_for(session.deleted, amount=-1, metrics=('user_signup',)))
+    apply_increments(session.connection(), {key: amount for key, amount in increments.items() if amount})
+
+
+def install_rollup_hooks():
+    """Keep rollups in step with inserts made through any ORM session."""
+    if not sa.event.contains(sa.orm.Session, 'after_flush', _after_flush):
+        sa.event.listen(sa.orm.Session, 'after_flush', _after_flush)
+
+
+def backfill(conn):
+    """Rebuild every rollup from the event tables currently in the database."""
+    conn.execute(MetricRollup.__table__.delete())
+    for metric, (model, dimension_attr, time_attr) in ROLLUP_SOURCES.items():
+        table = model.__table__
+        time_column = table.c[time_attr]
+        dimension_column = table.c[dimension_attr] if dimension_attr else sa.literal('all')
+        increments = collections.Counter()
+        result = conn.execution_options(stream_results=True, yield_per=10000).execute(
+            sa.select(dimension_column, time_column).where(time_column.isnot(None))
+        )
+        for dimension, occurred_at in result:
+            increments[(metric, dimension, hour_bucket(occurred_at))] += 1
+        apply_increments(conn, increments)
+
+
+# === Dashboard reads ===
+
+def total(metric, dimension=None, since=None):
+    """Sum a metric across hour buckets, optionally for one dimension and/or since a time."""
+    query = db.session.query(sa.func.coalesce(sa.func.sum(MetricRollup.count), 0)).filter(MetricRollup.metric == metric)
+    if dimension is not None:
+        query = query.filter(MetricRollup.dimension == dimension)
+    if since is not None:
+        query = query.filter(MetricRollup.hour >= hour_bucket(since))
+    return int(query.scalar())
+
+
+def totals_by_dimension(metric, since=None):
+    query = (db.session.query(MetricRollup.dimension, sa.func.sum(MetricRollup.count))
+             .filter(MetricRollup.metric == metric))
+    if since is not None:
+        query = query.filter(MetricRollup.hour >= hour_bucket(since))
+    return {dimension: int(count) for dimension, count in query.group_by(MetricRollup.dimension)}
+
+
+def hourly_counts(metric, hours=24, now=None):
+    """Counts for the last `hours` hour buckets, oldest first, as (hour_start, count) pairs."""
+    current = hour_bucket(now or datetime.datetime.utcnow())
+    start = current - datetime.timedelta(hours=hours - 1)
+    rows = (db.session.query(MetricRollup.hour, sa.func.sum(MetricRollup.count))
+            .filter(MetricRollup.metric == metric, MetricRollup.hour >= start)
+            .group_by(MetricRollup.hour)
+            .all())
+    counts = {hour: int(count) for hour, count in rows}
+    return [(start + datetime.timedelta(hours=i), counts.get(start + datetime.timedelta(hours=i), 0))
+            for i in range(hours)]
@@ -0,0 +1,52 @@
+"""
+Production entry point for the backend with Socket.IO.
+
+eventlet and gevent only work when the standard library is monkey-patched
+before anything else imports it, so this module patches first and imports
+the app afterwards. With SOCKETIO_ASYNC_MODE=eventlet one process serves
+thousands of mostly idle Socket.IO connections; run several behind a load
+balancer with sticky sessions and a shared SOCKETIO_MESSAGE_QUEUE to scale
+out.
+
+Usage (from the Flask directory):
+    SOCKETIO_ASYNC_MODE=eventlet python -m backend.server --port 8000
+    SOCKETIO_ASYNC_MODE=eventlet SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 \\
+        python -m backend.server --port 8001
+"""
+
+import os
+
+ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the backend with Socket.IO')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    args = parser.parse_args()
+
+    from .app import create_app
+    app = create_app()
+    socketio = app.extensions['socketio']
+    logger.info(f"Serving on {args.host}:{args.port} with async mode '{socketio.async_mode}'")
+    options = {}
+    if socketio.async_mode == 'eventlet':
+        options['max_size'] = app.config['SOCKETIO_MAX_CONNECTIONS']
+        options['log_output'] = False
+    # The Werkzeug server is only used in threading mode, for development
+    socketio.run(app, host=args.host, port=args.port, allow_unsafe_werkzeug=True, **options)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Per-client encoding of the Socket.IO dashboard streams.
+
+By default every stream message is a JSON object with an ISO timestamp
+string. A client can instead ask for msgpack when it connects, with
+`auth: {encoding: 'msgpack'}` or `?encoding=msgpack`. It then receives each
+message as a single binary argument: the same object packed with msgpack,
+with `timestamp` as integer epoch milliseconds. The connect `status` reply
+says which encoding was granted; JSON is the fallback when msgpack is not
+installed or SOCKETIO_BINARY_STREAMS is off.
+
+Clients are grouped by encoding through rooms: a msgpack client that joins
+`admin_room` is put in `admin_room#msgpack` instead, and every client is in
+`clients` or `clients#msgpack` for broadcasts to all. A room broadcast is
+then one emit per encoding, each encoded once, and it keeps working across
+nodes with a message queue. Without a queue, the msgpack emit is skipped when
+no local client in the room uses msgpack.
+
+Producers put a datetime in a message's `timestamp` and let `emit_encoded`
+and `reply` turn it into the client's format.
+"""
+
+import datetime
+import time
+
+from flask import request
+from flask_socketio import emit
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+BINARY_ROOM_SUFFIX = '#msgpack'
+NAMESPACE = '/'
+# Every client joins this room (or its msgpack variant) on connect
+ALL_CLIENTS_ROOM = 'clients'
+
+# sid -> encoding, for clients of this node
+client_encodings = {}
+
+
+def negotiate(auth, args, enabled=True):
+    """Encoding for a connecting client from its auth payload or query string."""
+    requested = (auth or {}).get('encoding') if isinstance(auth, dict) else None
+    requested = requested or args.get('encoding')
+    if requested == MSGPACK and enabled and msgpack is not None:
+        return MSGPACK
+    return JSON
+
+
+def encoding_of(sid):
+    return client_encodings.get(sid, JSON)
+
+
+def room_for(room, encoding):
+    return room + BINARY_ROOM_SUFFIX if encoding == MSGPACK else room
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode(message, encoding):
+    """`message` in the client's format: a JSON-ready dict, or msgpack bytes."""
+    timestamp = message.get('timestamp') if isinstance(message, dict) else None
+    if encoding == MSGPACK:
+        if isinstance(timestamp, datetime.datetime):
+            message = dict(message, timestamp=int(timestamp.timestamp() * 1000))
+        return msgpack.packb(message, default=_default)
+    if isinstance(timestamp, datetime.datetime):
+        message = dict(message, timestamp=timestamp.isoformat())
+    return message
+
+
+def _skip_binary_room(socketio, room):
+    """True if no client anywhere can be in `room`: only knowable without a message queue."""
+    manager = socketio.server.manager
+    if hasattr(manager, '_publish'):
+        # A message queue relays to other nodes' clients, which this node can't see
+        return False
+    return not manager.rooms.get(NAMESPACE, {}).get(room)
+
+
+def emit_encoded(socketio, event, message, room=ALL_CLIENTS_ROOM, skip_sid=None):
+    """Emit `message` to `room`, once per encoding."""
+    started = time.perf_counter()
+    try:
+        socketio.emit(event, encode(message, JSON), room=room, skip_sid=skip_sid)
+        binary_room = room_for(room, MSGPACK)
+        if msgpack is None or _skip_binary_room(socketio, binary_room):
+            return
+        socketio.emit(event, encode(message, MSGPACK), room=binary_room, skip_sid=skip_sid)
+    finally:
+        metrics.observe_emit(event, time.perf_counter() - started)
+
+
+def reply(event, message):
+    """Send `message` back to the client that sent the current event."""
+    emit(event, encode(message, encoding_of(request.sid)))
@@ -0,0 +1,74 @@
+"""
+Socket.IO client managers for running more than one backend node.
+
+Each node only holds the Socket.IO connections made to it. With
+SOCKETIO_MESSAGE_QUEUE set, every emit is also published on a message queue
+and replayed by the other nodes to their own clients, so `emit_to_admin`
+and the `broadcast_*` helpers reach every connected admin whichever node
+handled the request.
+
+- `redis://...`, `kafka://...`, `zmq+tcp://...` or any Kombu URL
+  (`amqp://...`): the python-socketio managers for those brokers (the broker
+  client library must be installed).
+- `local://`: `LocalQueueManager`, an in-process stand-in that connects all
+  Socket.IO servers created in the same process. Tests and the fan-out check
+  use it to run two nodes side by side without a broker.
+"""
+
+import collections
+import pickle
+import queue
+import threading
+
+import socketio
+
+LOCAL_SCHEME = 'local://'
+
+
+class LocalQueueManager(socketio.PubSubManager):
+    """A pub/sub manager whose "broker" is a set of in-process queues per channel."""
+
+    name = 'local'
+
+    _subscribers = collections.defaultdict(list)
+    _lock = threading.Lock()
+
+    def __init__(self, url=LOCAL_SCHEME, channel='socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+
+    def _publish(self, data):
+        # Pickled like the real brokers do, so no node shares objects with another
+        message = pickle.dumps(data)
+        with self._lock:
+            subscribers = list(self._subscribers[self.channel])
+        for inbox in subscribers:
+            inbox.put(message)
+
+    def _listen(self):
+        inbox = queue.Queue()
+        with self._lock:
+            self._subscribers[self.channel].append(inbox)
+        try:
+            while True:
+                yield pickle.loads(inbox.get())
+        finally:
+            with self._lock:
+                self._subscribers[self.channel].remove(inbox)
+
+
+def socketio_options(app):
+    """SocketIO() keyword arguments for the app's async mode, logging and message queue."""
+    options = {
+        'cors_allowed_origins': "*",
+        'async_mode': app.config['SOCKETIO_ASYNC_MODE'],
+        'logger': app.config['SOCKETIO_LOGGER'],
+        'engineio_logger': app.config['SOCKETIO_ENGINEIO_LOGGER'],
+    }
+    url = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = app.config['SOCKETIO_CHANNEL']
+    if url and url.startswith(LOCAL_SCHEME):
+        options['client_manager'] = LocalQueueManager(url, channel=channel)
+    elif url:
+        options['message_queue'] = url
+        options['channel'] = channel
+    return options
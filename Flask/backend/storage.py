@@ -0,0 +1,108 @@
+"""
+Storage engine profiles.
+
+A profile bundles the SQLAlchemy engine options and per-connection settings
+for one kind of database:
+
+- `sqlite`:  WAL journaling, relaxed fsync, busy timeout and memory-mapped I/O
+             so threaded writers wait on each other instead of failing with
+             "database is locked".
+- `server`:  connection pool sizing, pre-ping and a statement timeout for
+             PostgreSQL/MySQL.
+- `default`: no tuning at all (what the app did before profiles existed).
+
+`auto` picks `sqlite` or `server` from the database URI.
+"""
+
+import logging
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+PROFILES = ('auto', 'default', 'sqlite', 'server')
+
+
+def resolve_profile(app):
+    profile = app.config.get('STORAGE_PROFILE', 'auto')
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown STORAGE_PROFILE '{profile}', expected one of {PROFILES}")
+    if profile == 'auto':
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+        profile = 'sqlite' if uri.startswith('sqlite') else 'server'
+    return profile
+
+
+def engine_options(app, profile):
+    """Engine options for a profile, merged under any explicit SQLALCHEMY_ENGINE_OPTIONS."""
+    options = {}
+    if profile == 'sqlite':
+        options['connect_args'] = {
+            # Sessions are handed between SocketIO worker threads
+            'check_same_thread': False,
+            'timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000.0,
+        }
+    elif profile == 'server':
+        options.update({
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+            'pool_recycle': app.config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        })
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def _sqlite_pragmas(app):
+    return [
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+
+def _server_session_settings(app, dialect_name):
+    timeout_ms = int(app.config['DB_STATEMENT_TIMEOUT_MS'])
+    if dialect_name == 'postgresql':
+        return [f'SET statement_timeout = {timeout_ms}']
+    if dialect_name in ('mysql', 'mariadb'):
+        return [f'SET SESSION max_execution_time = {timeout_ms}']
+    logger.warning(f"No statement timeout support for dialect '{dialect_name}'")
+    return []
+
+
+def configure_app(app):
+    """Set engine options for the selected profile. Call before db.init_app."""
+    profile = resolve_profile(app)
+    app.config['STORAGE_PROFILE_ACTIVE'] = profile
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app, profile)
+    return profile
+
+
+def install_connection_hooks(app, engine):
+    """Apply per-connection settings for the active profile on every new DB-API connection."""
+    profile = app.config.get('STORAGE_PROFILE_ACTIVE', 'default')
+    if profile == 'sqlite':
+        statements = _sqlite_pragmas(app)
+    elif profile == 'server':
+        statements = _server_session_settings(app, engine.dialect.name)
+    else:
+        statements = []
+
+    if not statements:
+        return
+
+    @sa.event.listens_for(engine, 'connect')
+    def apply_settings(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    # Connections opened before the hook was installed never saw the settings
+    engine.dispose()
+    logger.info(f"Storage profile '{profile}' active for {engine.dialect.name}")
@@ -0,0 +1,519 @@
+"""
+Synthetic data for scale testing: users with their fingerprints, analytics
+snapshots, risk assessments and audit history.
+
+Every user gets latent traits drawn once - an activity level (lognormal, so a
+minority of users produce most of the traffic), a risk propensity (beta; a
+small share of fraudulent users sit near the top), and a personal typing
+speed, error rate, mouse speed, session length, scroll habit, device and
+location score, browser and home IP. Each row generated for the user is that
+trait plus per-event noise, so a user's fingerprints, snapshots and
+assessments agree with each other, and assessment counts, OTP failures,
+roaming IPs and high-risk labels all rise with propensity. Event times fall
+between signup and the end of the window and follow a daily cycle.
+
+Users are generated in chunks of `--chunk-size`, a whole column at a time
+with NumPy. Chunk k always draws from the seed sequence (seed, k) and owns user
+ids first_id + k * chunk_size onwards, so a seed reproduces the same rows
+whatever the number of workers or the order chunks finish in (only the ids of
+the event rows, which the database assigns, depend on that order). Pass
+`--end` as well to reproduce a run on another day.
+
+`--workers` processes each generate a chunk and write it in one transaction,
+with one executemany per table and `--batch-size` rows. Core inserts skip the
+ORM hooks, so the AuditLog rows get their promoted columns here and are linked
+into hash chain stripe k mod AUDIT_CHAIN_STRIPES, and the rollup counters are
+computed from the generated columns and added once every chunk is in (after
+an interrupted run, rebuild them with rollups.backfill). SQLite takes one
+writer at a time, so there the workers overlap generation with a single
+writer; PostgreSQL inserts in parallel as well.
+
+Usage (from the Flask directory):
+    python -m backend.synthetic_data --users 1000000 --seed 42 --workers 8
+    python -m backend.synthetic_data --users 50000 --activity 4 --fraud-rate 0.05 --end 2026-01-01
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import logging
+import os
+import time
+
+import numpy as np
+import sqlalchemy as sa
+
+# Use relative imports for local modules
+from .database import db
+from .ingestion import analytics_values
+from .models import User, BehavioralData, UserAnalytics, RiskAssessment, AuditLog
+from . import rollups
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Mean rows per user of average activity; each user's counts scale with their activity
+ROWS_PER_USER = {'fingerprints': 2.0, 'snapshots': 6.0, 'assessments': 2.0, 'events': 6.0, 'otp': 1.0}
+
+# Share of traffic per hour of the day (UTC), low overnight and peaking in the evening
+DIURNAL = np.array([2, 1, 1, 1, 1, 2, 3, 5, 6, 7, 7, 7, 8, 7, 7, 7, 7, 8, 9, 10, 10, 8, 5, 3], dtype=float)
+DIURNAL /= DIURNAL.sum()
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:127.0) Gecko/20100101 Firefox/127.0',
+]
+EVENT_TYPES = ['page_view', 'click', 'search', 'add_to_cart', 'checkout']
+EVENT_WEIGHTS = [0.55, 0.25, 0.1, 0.07, 0.03]
+RISK_LABELS = np.array(['low', 'medium', 'high'])
+
+# Audit row kinds, in the order their details are built
+OTP, EVENT, ASSESSMENT = 0, 1, 2
+AUDIT_ACTIONS = np.array(['otp_attempt', 'analytics_event', 'risk_assessment'])
+
+
+# === Generation ===
+
+def user_traits(rng, n, fraud_rate):
+    """Latent per-user traits that every generated row of the user derives from."""
+    fraud = rng.random(n) < fraud_rate
+    return {
+        'fraud': fraud,
+        # Mean 1 (mu = -sigma^2 / 2), heavy right tail
+        'activity': rng.lognormal(-0.405, 0.9, n),
+        'propensity': np.where(fraud, rng.beta(9, 1.5, n), rng.beta(1.5, 12, n)),
+        # Scripted sessions type fast, evenly and without mistakes
+        'wpm': np.where(fraud, rng.uniform(90, 160, n), rng.lognormal(np.log(40), 0.3, n)),
+        'error_rate': np.where(fraud, 0.005, rng.beta(2, 25, n)),
+        'mouse_speed': rng.lognormal(np.log(0.8), 0.4, n),
+        'clicks_per_min': rng.lognormal(np.log(6), 0.5, n),
+        'session_minutes': rng.lognormal(np.log(8), 0.8, n),
+        'scroll_depth': rng.beta(3, 2, n) * 100,
+        'device_score': np.where(fraud, rng.beta(2, 5, n), rng.beta(5, 2, n)),
+        'location_score': np.where(fraud, rng.beta(2, 5, n), rng.beta(8, 2, n)),
+        'agent': rng.integers(0, len(USER_AGENTS), n),
+        'category': rng.integers(1, 41, n),
+        # Home address in 10.0.0.0/8; roaming users show up from others
+        'ip': rng.integers(0, 2 ** 24, n),
+        'roaming': np.where(fraud, 0.6, 0.05),
+    }
+
+
+def _event_times(rng, created, end, owners):
+    """Seconds since the epoch of events by `owners`: after signup, following DIURNAL where possible."""
+    start = created[owners]
+    uniform = start + (end - start) * rng.random(len(owners))
+    shaped = ((uniform // 86400) * 86400 + rng.choice(24, len(owners), p=DIURNAL) * 3600
+              + rng.random(len(owners)) * 3600)
+    return np.where((shaped >= start) & (shaped <= end), shaped, uniform)
+
+
+def _by_time(columns):
+    """Reorder every column by event time, so ids grow with time within a chunk."""
+    order = np.argsort(columns['time'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
+
+
+def _ips(rng, traits, owners):
+    home = traits['ip'][owners]
+    roaming = rng.random(len(owners)) < traits['roaming'][owners]
+    return np.where(roaming, rng.integers(0, 2 ** 24, len(owners)), home)
+
+
+def _labels(scores):
+    return RISK_LABELS[(scores > 40).astype(np.int8) + (scores > 70)]
+
+
+def generate_chunk(seed, chunk, first_id, n, start, end, fraud_rate=0.02, rows_per_user=ROWS_PER_USER):
+    """
+    Columns (NumPy arrays) of every table for users first_id..first_id+n-1,
+    drawn from the seed sequence (seed, chunk). Times are seconds since the
+    epoch between `start` and `end`; `owner` columns index the chunk's users.
+    """
+    rng = np.random.default_rng([seed, chunk])
+    traits = user_traits(rng, n, fraud_rate)
+    activity, propensity = traits['activity'], traits['propensity']
+    # Signups grow over the window, and ids follow signup order
+    created = np.sort(start + (end - start) * rng.power(2.0, n))
+
+    def owners(kind, scale=1.0):
+        return np.repeat(np.arange(n), rng.poisson(activity * scale * rows_per_user[kind]))
+
+    tables = {'user': {'id': np.arange(first_id, first_id + n), 'time': created}}
+
+    u = owners('fingerprints')
+    m = len(u)
+    tables['behavioral_data'] = _by_time({
+        'owner': u,
+        'time': _event_times(rng, created, end, u),
+        'typing_speed': np.round(traits['wpm'][u] * 5 * rng.normal(1, 0.08, m), 1),
+        'mouse_distance': np.round(traits['mouse_speed'][u] * 1500 * rng.lognormal(0, 0.3, m), 1),
+        'click_count': rng.poisson(traits['clicks_per_min'][u] * np.minimum(traits['session_minutes'][u], 20)),
+        'session_duration': np.clip(traits['session_minutes'][u] * 60 * rng.lognormal(0, 0.4, m), 5, 3600)
+                              .astype(np.int64),
+        'scroll_depth': np.round(np.clip(traits['scroll_depth'][u] + rng.normal(0, 8, m), 0, 100), 1),
+        'ip_location_score': np.round(np.clip(traits['location_score'][u] + rng.normal(0, 0.05, m), 0, 1), 2),
+        'device_type_score': np.round(np.clip(traits['device_score'][u] + rng.normal(0, 0.02, m), 0, 1), 2),
+    })
+
+    u = owners('snapshots')
+    m = len(u)
+    duration = np.clip(traits['session_minutes'][u] * 60 * rng.lognormal(0, 0.5, m), 1, 3600)
+    minutes = duration / 60
+    wpm = np.maximum(traits['wpm'][u] * rng.normal(1, 0.1, m), 1)
+    # Typing fills a fraction of the session at five keystrokes a word
+    keystrokes = rng.poisson(wpm * 5 * minutes * 0.15)
+    backspaces = rng.binomial(keystrokes, traits['error_rate'][u])
+    tab_switches = rng.poisson(0.3 * minutes + 2 * traits['fraud'][u])
+    depth = np.clip(traits['scroll_depth'][u] + rng.normal(0, 10, m), 0, 100)
+    tables['user_analytics'] = _by_time({
+        'owner': u,
+        'time': _event_times(rng, created, end, u),
+        'wpm': np.round(wpm, 2),
+        'keystrokes': keystrokes,
+        'backspaces': backspaces,
+        'accuracy': np.round(1 - backspaces / np.maximum(keystrokes, 1), 3),
+        'max_depth': np.round(depth, 1),
+        'scroll_distance': rng.poisson(depth * 40 * np.sqrt(minutes)),
+        'scroll_speed': np.round(rng.lognormal(np.log(800), 0.5, m), 2),
+        'clicks': rng.poisson(traits['clicks_per_min'][u] * minutes),
+        'mouse_distance': rng.poisson(traits['mouse_speed'][u] * 1000 * duration * rng.uniform(0.1, 0.4, m)),
+        'mouse_speed': np.round(traits['mouse_speed'][u] * rng.lognormal(0, 0.2, m), 4),
+        'idle_time': (duration * 1000 * rng.uniform(0.05, 0.6, m)).astype(np.int64),
+        'focus_events': tab_switches + rng.poisson(1, m),
+        'blur_events': tab_switches,
+        'tab_switches': tab_switches,
+        'focus_time': (duration * 1000 * rng.uniform(0.6, 1.0, m)).astype(np.int64),
+        'category': np.where(rng.random(m) < 0.6, traits['category'][u], rng.integers(1, 41, m)),
+        'agent': traits['agent'][u],
+        'duration': np.round(duration, 3),
+    })
+
+    # Riskier users are assessed more often; scores follow assess_user_risk's weighting
+    u = owners('assessments', scale=0.5 + 2.5 * propensity)
+    m = len(u)
+    ml_score = 100 * np.clip(propensity[u] + rng.normal(0, 0.08, m), 0, 1)
+    fingerprint_diff = 100 * np.clip(np.abs(rng.normal(0, 0.1 + 0.4 * propensity[u], m)), 0, 1)
+    intent_score = np.round(rng.uniform(5, 30, m), 2)
+    final_score = ml_score * 0.6 + fingerprint_diff * 0.25 + intent_score * 0.15
+    tables['risk_assessment'] = _by_time({
+        'owner': u,
+        'time': _event_times(rng, created, end, u),
+        'score': final_score,
+        'label': _labels(final_score),
+        'ml_score': ml_score,
+        'ml_label': _labels(ml_score),
+        'fingerprint_diff': fingerprint_diff,
+        'intent_score': intent_score,
+    })
+
+    # Audit history: OTP attempts, tracker events, and one row per assessment
+    otp = owners('otp', scale=0.3 + 3 * propensity)
+    events = owners('events')
+    assessments = tables['risk_assessment']
+    kind = np.concatenate([np.full(len(otp), OTP), np.full(len(events), EVENT),
+                           np.full(len(assessments['owner']), ASSESSMENT)]).astype(np.int8)
+    u = np.concatenate([otp, events, assessments['owner']])
+    m = len(u)
+    tables['audit_log'] = _by_time({
+        'owner': u,
+        'kind': kind,
+        'time': np.concatenate([_event_times(rng, created, end, otp), _event_times(rng, created, end, events),
+                                assessments['time']]),
+        # Index of the assessment an ASSESSMENT row records
+        'ref': np.concatenate([np.zeros(len(otp) + len(events), dtype=np.int64),
+                               np.arange(len(assessments['owner']))]),
+        'success': rng.random(m) < 0.97 - 0.5 * propensity[u],
+        'otp_prefix': rng.integers(0, 100, m),
+        'event': rng.choice(len(EVENT_TYPES), m, p=EVENT_WEIGHTS),
+        'category': np.where(rng.random(m) < 0.6, traits['category'][u], rng.integers(1, 41, m)),
+        'ip': _ips(rng, traits, u),
+    })
+    return tables
+
+
+# === Rows ===
+
+def _datetimes(seconds):
+    return (seconds * 1e6).astype(np.int64).astype('datetime64[us]').tolist()
+
+
+def _ip_strings(addresses):
+    return [f'10.{a >> 16}.{(a >> 8) & 255}.{a & 255}' for a in addresses.tolist()]
+
+
+def _columns(columns, lo, hi, names):
+    return [columns[name][lo:hi].tolist() for name in names]
+
+
+def user_rows(tables, lo, hi, password_hash):
+    ids, created = tables['user']['id'][lo:hi].tolist(), _datetimes(tables['user']['time'][lo:hi])
+    return [{'id': user_id, 'email': f'synthetic{user_id}@example.com', 'password_hash': password_hash,
+             'role': 'user', 'created_at': created_at} for user_id, created_at in zip(ids, created)]
+
+
+def fingerprint_rows(tables, lo, hi):
+    ids = tables['user']['id']
+    columns = tables['behavioral_data']
+    names = ['typing_speed', 'mouse_distance', 'click_count', 'session_duration', 'scroll_depth',
+             'ip_location_score', 'device_type_score']
+    return [{'user_id': user_id, 'fingerprint_data': dict(zip(names, values)), 'created_at': created_at}
+            for user_id, created_at, *values in zip(ids[columns['owner'][lo:hi]].tolist(),
+                                                     _datetimes(columns['time'][lo:hi]),
+                                                     *_columns(columns, lo, hi, names))]
+
+
+def analytics_rows(tables, lo, hi, storage_mode):
+    ids = tables['user']['id']
+    columns = tables['user_analytics']
+    rows = []
+    for (number, user_id, seconds, created_at, wpm, keystrokes, backspaces, accuracy, max_depth, scroll_distance,
+         scroll_speed, clicks, mouse_distance, mouse_speed, idle_time, focus_events, blur_events, tab_switches,
+         focus_time, category, agent, duration) in zip(
+            range(lo, hi), ids[columns['owner'][lo:hi]].tolist(), columns['time'][lo:hi].tolist(),
+            _datetimes(columns['time'][lo:hi]),
+            *_columns(columns, lo, hi, ['wpm', 'keystrokes', 'backspaces', 'accuracy', 'max_depth',
+                                        'scroll_distance', 'scroll_speed', 'clicks', 'mouse_distance',
+                                        'mouse_speed', 'idle_time', 'focus_events', 'blur_events',
+                                        'tab_switches', 'focus_time', 'category', 'agent', 'duration'])):
+        # Shaped like the frontend useUserAnalytics tracker output, stored the way ingestion stores it
+        payload = {
+            'sessionId': f'synthetic-{user_id}-{number}',
+            'timestamp': int(seconds * 1000),
+            'typing': {'keystrokes': keystrokes, 'wpm': wpm, 'backspaces': backspaces, 'accuracy': accuracy},
+            'scroll': {'maxDepth': max_depth, 'totalScrollDistance': scroll_distance, 'scrollSpeed': scroll_speed},
+            'mouse': {'clicks': clicks, 'totalDistance': mouse_distance, 'averageSpeed': mouse_speed,
+                      'idleTime': idle_time},
+            'focus': {'focusEvents': focus_events, 'blurEvents': blur_events, 'tabSwitches': tab_switches,
+                      'totalFocusTime': focus_time},
+            'pageUrl': f'http://localhost:8080/shop?category={category}',
+            'userAgent': USER_AGENTS[agent],
+            'sessionDuration': duration,
+            'user_id': user_id,
+        }
+        values = analytics_values(user_id, payload, storage_mode)
+        values['created_at'] = created_at
+        rows.append(values)
+    return rows
+
+
+def _assessment_components(columns, index):
+    return {'ml_score': columns['ml_score'][index], 'ml_risk_label': columns['ml_label'][index],
+            'fingerprint_diff': columns['fingerprint_diff'][index], 'intent_score': columns['intent_score'][index]}
+
+
+def assessment_scores(tables):
+    """Score columns of the chunk's assessments as lists, shared by their RiskAssessment and AuditLog rows."""
+    columns = tables['risk_assessment']
+    return {name: columns[name].tolist()
+            for name in ('score', 'label', 'ml_score', 'ml_label', 'fingerprint_diff', 'intent_score')}
+
+
+def assessment_rows(tables, lo, hi, scores):
+    ids = tables['user']['id']
+    columns = tables['risk_assessment']
+    return [{'user_id': user_id, 'risk_score': scores['score'][index], 'risk_label': scores['label'][index],
+             'component_scores': _assessment_components(scores, index), 'created_at': created_at}
+            for index, user_id, created_at in zip(
+                range(lo, hi), ids[columns['owner'][lo:hi]].tolist(), _datetimes(columns['time'][lo:hi]))]
+
+
+def audit_rows(tables, lo, hi, scores):
+    """AuditLog values with their promoted columns, shaped like the rows the app writes."""
+    ids = tables['user']['id']
+    columns = tables['audit_log']
+    rows = []
+    for kind, user_id, timestamp, ref, success, prefix, event, category, ip_address in zip(
+            columns['kind'][lo:hi].tolist(), ids[columns['owner'][lo:hi]].tolist(),
+            _datetimes(columns['time'][lo:hi]), columns['ref'][lo:hi].tolist(), columns['success'][lo:hi].tolist(),
+            columns['otp_prefix'][lo:hi].tolist(), columns['event'][lo:hi].tolist(),
+            columns['category'][lo:hi].tolist(), _ip_strings(columns['ip'][lo:hi])):
+        if kind == OTP:
+            details = {'otp_code': f'{prefix:02d}****', 'success': success, 'ip_address': ip_address}
+            promoted = {'success': success, 'final_label': None, 'final_score': None, 'ip_address': ip_address}
+        elif kind == EVENT:
+            details = {'event': EVENT_TYPES[event], 'page': f'/shop?category={category}', 'user_id': user_id,
+                       'ip_address': ip_address}
+            promoted = {'success': None, 'final_label': None, 'final_score': None, 'ip_address': ip_address}
+        else:
+            score, label = scores['score'][ref], scores['label'][ref]
+            details = {'final_score': score, 'final_label': label,
+                       'components': _assessment_components(scores, ref)}
+            promoted = {'success': None, 'final_label': label, 'final_score': score, 'ip_address': None}
+        rows.append({'user_id': user_id, 'action': AUDIT_ACTIONS[kind].item(), 'details': details,
+                     'timestamp': timestamp, **promoted})
+    return rows
+
+
+def rollup_increments(tables):
+    """The rollup counts the ORM hooks would have added for these rows."""
+    increments = collections.Counter()
+    sources = [
+        ('user_signup', None, tables['user']['time']),
+        ('risk_label', tables['risk_assessment']['label'], tables['risk_assessment']['time']),
+        ('audit_action', AUDIT_ACTIONS[tables['audit_log']['kind']], tables['audit_log']['time']),
+    ]
+    for metric, dimensions, seconds in sources:
+        hours = (seconds // 3600).astype(np.int64)
+        if dimensions is None:
+            names, codes = np.array(['all']), np.zeros(len(hours), dtype=np.int64)
+        else:
+            names, codes = np.unique(dimensions, return_inverse=True)
+        keys, counts = np.unique(codes * (1 << 32) + hours, return_counts=True)
+        buckets = _datetimes((keys & 0xFFFFFFFF) * 3600.0)
+        for key, bucket, count in zip((keys >> 32).tolist(), buckets, counts.tolist()):
+            increments[(metric, names[key].item(), bucket)] += count
+    return increments
+
+
+# === Loading ===
+
+_worker = {}
+
+
+def _init_worker(database_url, options):
+    connect_args = {'timeout': 600} if database_url.startswith('sqlite') else {}
+    _worker.clear()
+    _worker.update(options, engine=sa.create_engine(database_url, connect_args=connect_args))
+
+
+def load_chunk(task):
+    """Generate chunk (index, first_id, users) and write it in one transaction."""
+    from . import audit_chain
+
+    chunk, first_id, n = task
+    options = _worker
+    started = time.perf_counter()
+    tables = generate_chunk(options['seed'], chunk, first_id, n, options['start'], options['end'],
+                            options['fraud_rate'], options['rows_per_user'])
+    generated = time.perf_counter() - started
+    scores = assessment_scores(tables)
+    writers = [
+        (User, len(tables['user']['id']), lambda lo, hi: user_rows(tables, lo, hi, options['password_hash'])),
+        (BehavioralData, len(tables['behavioral_data']['owner']), lambda lo, hi: fingerprint_rows(tables, lo, hi)),
+        (UserAnalytics, len(tables['user_analytics']['owner']),
+         lambda lo, hi: analytics_rows(tables, lo, hi, options['storage_mode'])),
+        (RiskAssessment, len(tables['risk_assessment']['owner']),
+         lambda lo, hi: assessment_rows(tables, lo, hi, scores)),
+        (AuditLog, len(tables['audit_log']['owner']), lambda lo, hi: audit_rows(tables, lo, hi, scores)),
+    ]
+    batch_size = options['batch_size']
+    counts = {}
+    with options['engine'].begin() as conn:
+        for model, total, build in writers:
+            for lo in range(0, total, batch_size):
+                rows = build(lo, min(total, lo + batch_size))
+                if model is AuditLog:
+                    audit_chain.link_values(conn, chunk % options['stripes'], rows)
+                conn.execute(model.__table__.insert(), rows)
+            counts[model.__tablename__] = total
+    return {'chunk': chunk, 'rows': counts, 'rollups': rollup_increments(tables),
+            'generate_seconds': generated, 'seconds': time.perf_counter() - started}
+
+
+def _advance_sequence(conn):
+    """User ids were given explicitly; move PostgreSQL's sequence past them."""
+    if conn.dialect.name == 'postgresql':
+        conn.execute(sa.text(
+            "SELECT setval(pg_get_serial_sequence('\"user\"', 'id'), (SELECT max(id) FROM \"user\"))"
+        ))
+
+
+def generate(app, users, seed=42, workers=None, chunk_size=20000, days=180, end=None, fraud_rate=0.02,
+             activity=1.0, password='SyntheticPassword123', batch_size=5000):
+    """
+    Generate `users` users and their history and load them into the app's
+    database. Returns row counts per table and timings.
+    """
+    from .auth import hash_password
+
+    end = end or datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    end_seconds = (end - EPOCH).total_seconds()
+    with app.app_context():
+        first_id = (db.session.scalar(sa.select(sa.func.max(User.id))) or 0) + 1
+        db.session.close()
+        database_url = db.engine.url.render_as_string(hide_password=False)
+    options = {
+        'seed': seed, 'start': end_seconds - days * 86400, 'end': end_seconds, 'fraud_rate': fraud_rate,
+        'rows_per_user': {kind: mean * activity for kind, mean in ROWS_PER_USER.items()},
+        'password_hash': hash_password(password), 'storage_mode': app.config['ANALYTICS_STORAGE_MODE'],
+        'stripes': max(1, app.config['AUDIT_CHAIN_STRIPES']), 'batch_size': batch_size,
+    }
+    tasks = [(chunk, first_id + start, min(chunk_size, users - start))
+             for chunk, start in enumerate(range(0, users, chunk_size))]
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    if workers > 1 and len(tasks) > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)), initializer=_init_worker, initargs=(database_url, options)
+        )
+        futures = [pool.submit(load_chunk, task) for task in tasks]
+        results = (future.result() for future in futures)
+    else:
+        pool = futures = None
+        _init_worker(database_url, options)
+        results = map(load_chunk, tasks)
+
+    counts, increments, generate_seconds = collections.Counter(), collections.Counter(), 0.0
+    try:
+        for number, result in enumerate(results, 1):
+            counts.update(result['rows'])
+            increments.update(result['rollups'])
+            generate_seconds += result['generate_seconds']
+            logger.info(f"Synthetic chunk {result['chunk']} loaded ({number}/{len(tasks)}, "
+                        f"{sum(result['rows'].values())} rows in {result['seconds']:.1f}s)")
+    finally:
+        if pool is not None:
+            # Don't start chunks nobody will count after a failure or ^C
+            # (shutdown(cancel_futures=True) needs Python 3.9)
+            for future in futures:
+                future.cancel()
+            pool.shutdown()
+        _worker.clear()
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            rollups.apply_increments(conn, increments)
+            _advance_sequence(conn)
+    return {'first_user_id': first_id, 'rows': dict(counts), 'seconds': time.perf_counter() - started,
+            'generate_seconds': generate_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load synthetic users and their history for scale testing')
+    parser.add_argument('--users', type=int, required=True)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=20000, help='users per chunk')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per INSERT')
+    parser.add_argument('--days', type=int, default=180, help='length of the history window')
+    parser.add_argument('--end', type=datetime.date.fromisoformat,
+                        help='end of the window, YYYY-MM-DD (default: today, UTC)')
+    parser.add_argument('--fraud-rate', type=float, default=0.02, help='share of fraudulent users')
+    parser.add_argument('--activity', type=float, default=1.0, help='multiplier of the rows per user')
+    parser.add_argument('--password', default='SyntheticPassword123', help='password of every synthetic user')
+    args = parser.parse_args()
+
+    from .app import create_app
+    app = create_app()
+    end = datetime.datetime.combine(args.end, datetime.time()) if args.end else None
+    report = generate(app, args.users, seed=args.seed, workers=args.workers, chunk_size=args.chunk_size,
+                      days=args.days, end=end, fraud_rate=args.fraud_rate, activity=args.activity,
+                      password=args.password, batch_size=args.batch_size)
+    total = sum(report['rows'].values())
+    for table, count in report['rows'].items():
+        print(f"  {table:<16}{count:>12}")
+    print(f"Loaded {total} rows for users {report['first_user_id']}.."
+          f"{report['first_user_id'] + args.users - 1} in {report['seconds']:.1f}s "
+          f"({total / report['seconds']:.0f} rows/s; NumPy generation {report['generate_seconds']:.1f}s "
+          f"across workers)")
+
+
+if __name__ == '__main__':
+    main()
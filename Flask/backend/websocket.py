@@ -3,55 +3,142 @@ from flask import request
 import logging
 from datetime import datetime
 import json
+import jwt
+
+try:
+    from .socket_manager import socketio_options
+    from .broadcast import RoomBroadcaster
+    from .live_metrics import live_metrics
+    from .risk_events import risk_events
+    from .decoders import DecodeError, decode_id
+    from .socket_codec import ALL_CLIENTS_ROOM, client_encodings, emit_encoded, encoding_of, negotiate, reply, room_for
+except ImportError:
+    from socket_manager import socketio_options
+    from broadcast import RoomBroadcaster
+    from live_metrics import live_metrics
+    from risk_events import risk_events
+    from decoders import DecodeError, decode_id
+    from socket_codec import ALL_CLIENTS_ROOM, client_encodings, emit_encoded, encoding_of, negotiate, reply, room_for
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Global socketio instance
 socketio = None
+# Coalesces the broadcast_* helpers into one message per room per window
+broadcaster = None
+# Background task pushing live metric changes to admin_room (one per process)
+metrics_task = None
+# Background task dispatching high-risk events (one per process)
+risk_events_task = None
+
+# sid -> user id and role proven by a valid JWT in the connect auth payload ({'token': ...})
+client_users = {}
+client_roles = {}
+
+# Live metric stream type -> Socket.IO event the dashboard listens to
+LIVE_EVENTS = {
+    'user_analytics': 'analytics_update',
+    'otp_attempts': 'otp_attempts_update',
+    'login_attempts': 'login_attempts_update',
+    'risk_data': 'risk_data_update',
+}
+
+def verified_claims(auth, secret_key):
+    """Claims of the JWT a client sent when connecting, or None without a valid one."""
+    token = auth.get('token') if isinstance(auth, dict) else None
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, secret_key, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+
+def is_admin(sid):
+    """True if the client proved an admin token at connect; the role in event payloads is never trusted."""
+    return client_roles.get(sid) == 'admin'
+
+def live_message(stream, data):
+    return {'type': stream, 'data': data, 'timestamp': datetime.now()}
+
+def push_live_metrics(interval):
+    """Broadcast the live metric streams that changed, every `interval` seconds."""
+    while True:
+        socketio.sleep(interval)
+        try:
+            for stream, data in live_metrics.changes().items():
+                publish_to_admin(LIVE_EVENTS[stream], stream, data)
+        except Exception:
+            logger.exception("Live metrics push failed")
+
+def forward_risk_event(event):
+    """Send a high-risk assessment to the admins and to the user it concerns."""
+    broadcast_risk_update(event)
+    emit_to_user(event['user_id'], 'risk_alert', {'type': 'risk_alert', 'data': event, 'timestamp': datetime.now()})
 
 def init_socketio(app):
     """Initialize SocketIO with the Flask app."""
-    global socketio
+    global socketio, broadcaster, metrics_task, risk_events_task
     
-    socketio = SocketIO(
-        app,
-        cors_allowed_origins="*",
-        async_mode='threading',
-        logger=True,
-        engineio_logger=True
+    socketio = SocketIO(app, **socketio_options(app))
+    broadcaster = RoomBroadcaster(
+        socketio,
+        window_ms=app.config['BROADCAST_WINDOW_MS'],
+        max_backlog=app.config['BROADCAST_MAX_BACKLOG']
     )
+    if metrics_task is None:
+        metrics_task = socketio.start_background_task(push_live_metrics, app.config['LIVE_METRICS_PUSH_INTERVAL'])
+    risk_events.subscribe(forward_risk_event)
+    if risk_events_task is None:
+        risk_events_task = socketio.start_background_task(risk_events.run)
     
     @socketio.on('connect')
-    def handle_connect():
+    def handle_connect(auth=None):
         """Handle client connection."""
         logger.info(f"Client connected: {request.sid}")
-        emit('status', {'message': 'Connected to server', 'timestamp': datetime.now().isoformat()})
+        encoding = negotiate(auth, request.args, app.config['SOCKETIO_BINARY_STREAMS'])
+        client_encodings[request.sid] = encoding
+        claims = verified_claims(auth, app.config['SECRET_KEY'])
+        if claims is not None:
+            client_users[request.sid] = claims.get('user_id')
+            client_roles[request.sid] = claims.get('role')
+        join_room(room_for(ALL_CLIENTS_ROOM, encoding))
+        emit('status', {'message': 'Connected to server', 'encoding': encoding, 'timestamp': datetime.now().isoformat()})
     
     @socketio.on('disconnect')
     def handle_disconnect():
         """Handle client disconnection."""
         logger.info(f"Client disconnected: {request.sid}")
+        client_encodings.pop(request.sid, None)
+        client_users.pop(request.sid, None)
+        client_roles.pop(request.sid, None)
     
     @socketio.on('join_admin_room')
     def handle_join_admin_room(data):
         """Join admin room for real-time updates."""
-        user_id = data.get('user_id')
-        user_role = data.get('role')
-        
-        if user_role == 'admin':
-            join_room('admin_room')
+        if is_admin(request.sid):
+            join_room(room_for('admin_room', encoding_of(request.sid)))
             emit('status', {'message': 'Joined admin room', 'timestamp': datetime.now().isoformat()})
-            logger.info(f"Admin user {user_id} joined admin room")
+            logger.info(f"Admin user {client_users.get(request.sid)} joined admin room")
+            # Current values once; changes are pushed to the room from then on
+            for stream, snapshot in live_metrics.snapshots().items():
+                reply(LIVE_EVENTS[stream], live_message(stream, snapshot))
         else:
             emit('error', {'message': 'Access denied to admin room'})
     
     @socketio.on('join_user_room')
     def handle_join_user_room(data):
         """Join user-specific room."""
-        user_id = data.get('user_id')
+        # The room carries the user's risk alerts: only the user its token names may join
+        try:
+            user_id = decode_id(data.get('user_id'))
+        except DecodeError:
+            user_id = None
+        if user_id is None or user_id != client_users.get(request.sid):
+            emit('error', {'message': 'Access denied to user room'})
+            return
         room_name = f'user_{user_id}'
-        join_room(room_name)
+        join_room(room_for(room_name, encoding_of(request.sid)))
         emit('status', {'message': f'Joined user room {room_name}', 'timestamp': datetime.now().isoformat()})
         logger.info(f"User {user_id} joined room {room_name}")
     
@@ -59,136 +146,82 @@ def init_socketio(app):
     def handle_leave_room(data):
         """Leave a specific room."""
         room_name = data.get('room')
-        leave_room(room_name)
+        leave_room(room_for(room_name, encoding_of(request.sid)))
         emit('status', {'message': f'Left room {room_name}', 'timestamp': datetime.now().isoformat()})
     
+    # The request_* events answer the sender from the in-memory live metrics
     @socketio.on('request_analytics')
     def handle_request_analytics(data):
         """Handle analytics data requests."""
         user_id = data.get('user_id')
-        user_role = data.get('role')
         
-        if user_role == 'admin':
-            # Emit analytics data to admin room
-            emit('analytics_update', {
-                'type': 'user_analytics',
-                'data': {
-                    'total_users': 150,
-                    'active_users': 89,
-                    'new_users_today': 12,
-                    'login_success_rate': 94.5,
-                    'timestamp': datetime.now().isoformat()
-                }
-            }, room='admin_room')
+        if is_admin(request.sid):
+            reply('analytics_update', live_message('user_analytics', live_metrics.snapshots()['user_analytics']))
+            return
+        # A user's own figures only go to a client that proved who it is at connect;
+        # the user_id in the request is the client's word and is never trusted
+        verified = client_users.get(request.sid)
+        if verified is not None:
+            reply('analytics_update', live_message('user_analytics', live_metrics.user_snapshot(verified)))
         else:
-            # Emit user-specific analytics
-            emit('analytics_update', {
-                'type': 'user_analytics',
-                'data': {
-                    'user_id': user_id,
-                    'session_duration': 1800,
-                    'risk_score': 0.15,
-                    'timestamp': datetime.now().isoformat()
-                }
-            }, room=f'user_{user_id}')
+            reply('analytics_update', live_message('user_analytics', {'user_id': user_id}))
     
     @socketio.on('request_otp_attempts')
     def handle_request_otp_attempts(data):
         """Handle OTP attempts data requests."""
-        user_role = data.get('role')
-        
-        if user_role == 'admin':
-            # Emit OTP attempts data to admin room
-            emit('otp_attempts_update', {
-                'type': 'otp_attempts',
-                'data': {
-                    'total_attempts': 156,
-                    'successful_attempts': 142,
-                    'failed_attempts': 14,
-                    'blocked_attempts': 2,
-                    'timestamp': datetime.now().isoformat()
-                }
-            }, room='admin_room')
+        if is_admin(request.sid):
+            reply('otp_attempts_update', live_message('otp_attempts', live_metrics.snapshots()['otp_attempts']))
     
     @socketio.on('request_login_attempts')
     def handle_request_login_attempts(data):
         """Handle login attempts data requests."""
-        user_role = data.get('role')
-        
-        if user_role == 'admin':
-            # Emit login attempts data to admin room
-            emit('login_attempts_update', {
-                'type': 'login_attempts',
-                'data': {
-                    'total_attempts': 89,
-                    'successful_attempts': 78,
-                    'failed_attempts': 11,
-                    'timestamp': datetime.now().isoformat()
-                }
-            }, room='admin_room')
+        if is_admin(request.sid):
+            reply('login_attempts_update', live_message('login_attempts', live_metrics.snapshots()['login_attempts']))
     
     @socketio.on('request_risk_data')
     def handle_request_risk_data(data):
         """Handle risk assessment data requests."""
-        user_role = data.get('role')
-        
-        if user_role == 'admin':
-            # Emit risk data to admin room
-            emit('risk_data_update', {
-                'type': 'risk_data',
-                'data': {
-                    'low_risk': 65,
-                    'medium_risk': 25,
-                    'high_risk': 10,
-                    'timestamp': datetime.now().isoformat()
-                }
-            }, room='admin_room')
+        if is_admin(request.sid):
+            reply('risk_data_update', live_message('risk_data', live_metrics.snapshots()['risk_data']))
     
     return socketio
 
 def emit_to_admin(event, data):
     """Emit data to admin room."""
     if socketio:
-        socketio.emit(event, data, room='admin_room')
+        emit_encoded(socketio, event, data, room='admin_room')
 
 def emit_to_user(user_id, event, data):
     """Emit data to specific user room."""
     if socketio:
-        socketio.emit(event, data, room=f'user_{user_id}')
+        emit_encoded(socketio, event, data, room=f'user_{user_id}')
 
 def emit_to_all(event, data):
     """Emit data to all connected clients."""
     if socketio:
-        socketio.emit(event, data)
+        emit_encoded(socketio, event, data)
+
+def publish_to_admin(event, type_, data, key=None):
+    """Queue data for the admin room; sent merged at the end of the broadcast window."""
+    if broadcaster:
+        broadcaster.publish('admin_room', event, type_, data, key=key)
 
 def broadcast_analytics_update(analytics_data):
     """Broadcast analytics update to admin room."""
-    emit_to_admin('analytics_update', {
-        'type': 'user_analytics',
-        'data': analytics_data,
-        'timestamp': datetime.now().isoformat()
-    })
+    publish_to_admin('analytics_update', 'user_analytics', analytics_data)
 
 def broadcast_otp_update(otp_data):
     """Broadcast OTP update to admin room."""
-    emit_to_admin('otp_attempts_update', {
-        'type': 'otp_attempts',
-        'data': otp_data,
-        'timestamp': datetime.now().isoformat()
-    })
+    publish_to_admin('otp_attempts_update', 'otp_attempts', otp_data)
 
 def broadcast_login_update(login_data):
     """Broadcast login update to admin room."""
-    emit_to_admin('login_attempts_update', {
-        'type': 'login_attempts',
-        'data': login_data,
-        'timestamp': datetime.now().isoformat()
-    })
+    publish_to_admin('login_attempts_update', 'login_attempts', login_data)
 
 def broadcast_risk_update(risk_data):
-    """Broadcast risk update to admin room."""
-    emit_to_admin('risk_data_update', {
-        'type': 'risk_data',
-        'data': risk_data,
-        'timestamp': datetime.now().isoformat()
-    }) 
\ No newline at end of file
+    """Broadcast risk update to admin room, keeping the latest update per user."""
+    publish_to_admin('risk_data_update', 'risk_data', risk_data, key=risk_data.get('user_id'))
+
+def broadcast_stats():
+    """Counters of the admin broadcast aggregator."""
+    return broadcaster.stats() if broadcaster else {}
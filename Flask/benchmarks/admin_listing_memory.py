@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Peak-memory check for the streamed admin listings.
+
+Seeds audit_log at several table sizes and streams the same large page
+through /api/admin/audit-logs each time; peak Python heap (tracemalloc)
+should stay roughly constant as the table grows.
+
+Usage (from the Flask directory):
+    python benchmarks/admin_listing_memory.py --sizes 1000 100000 1000000 --page 50000
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure peak memory of streamed admin listings')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 100000, 1000000])
+    parser.add_argument('--page', type=int, default=50000, help='Rows requested per page')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'listing.db')
+        from backend.app import create_app
+        from backend.auth import create_token
+        from backend.database import db
+        from backend.models import User
+
+        app = create_app()
+        with app.app_context():
+            admin = User(email='bench-admin@example.com', password_hash='x', role='admin')
+            db.session.add(admin)
+            db.session.commit()
+            token = create_token(admin.id, admin.email, admin.role)
+
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        seeded = 0
+        now = datetime.datetime.utcnow()
+
+        print(f"{'table rows':>12}{'page rows':>11}{'peak MiB':>10}{'seconds':>9}")
+        for size in sorted(args.sizes):
+            with app.app_context(), db.engine.begin() as conn:
+                conn.exec_driver_sql(
+                    "INSERT INTO audit_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
+                    [(admin.id, 'bench', '{"success": true, "ip_address": "10.0.0.1"}',
+                      now - datetime.timedelta(seconds=i)) for i in range(seeded, size)]
+                )
+            seeded = size
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = client.get(f'/api/admin/audit-logs?limit={args.page}&format=ndjson',
+                                  headers=headers, buffered=False)
+            rows = sum(chunk.count(b'\n') for chunk in response.response)
+            response.close()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{size:>12,}{rows:>11,}{peak / 2**20:>10.1f}{elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Storage and throughput benchmark for the UserAnalytics storage modes.
+
+Posts realistic tracker snapshots through /api/analytics/store in 'full' and
+'compact' mode, then reports database size, stored payload bytes per row,
+write throughput, and read throughput of /api/analytics/user/<id> (which
+rebuilds payloads in compact mode). Also checks every payload round-trips,
+read back from the database, from an NDJSON and a CSV export, and from the
+retention archive.
+
+Usage (from the Flask directory):
+    python benchmarks/analytics_storage.py --rows 5000
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def tracker_payload(rng, session_id):
+    """A snapshot shaped like the frontend useUserAnalytics tracker output."""
+    return {
+        'sessionId': session_id,
+        'timestamp': int(time.time() * 1000) + rng.randint(0, 10**6),
+        'typing': {
+            'keystrokes': rng.randint(0, 2000),
+            'wpm': round(rng.uniform(10, 120), 2),
+            'backspaces': rng.randint(0, 200),
+            'accuracy': round(rng.uniform(0.7, 1.0), 3),
+        },
+        'scroll': {
+            'maxDepth': round(rng.uniform(0, 100), 1),
+            'totalScrollDistance': rng.randint(0, 50000),
+            'scrollSpeed': round(rng.uniform(0, 3000), 2),
+        },
+        'mouse': {
+            'clicks': rng.randint(0, 300),
+            'totalDistance': rng.randint(0, 200000),
+            'averageSpeed': round(rng.uniform(0, 2.5), 4),
+            'idleTime': rng.randint(0, 600000),
+        },
+        'focus': {
+            'focusEvents': rng.randint(0, 40),
+            'blurEvents': rng.randint(0, 40),
+            'tabSwitches': rng.randint(0, 40),
+            'totalFocusTime': rng.randint(0, 3600000),
+        },
+        'pageUrl': f'http://localhost:8080/shop?category={rng.randint(1, 40)}',
+        'userAgent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                     '(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+        'sessionDuration': round(rng.uniform(1, 3600), 3),
+        'user_id': 1,
+    }
+
+
+def run_mode(mode, rows, reads):
+    from backend import app as app_module
+    from backend.auth import create_token
+    from backend.database import db
+    from backend.models import User, UserAnalytics
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app_module.Config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, f'{mode}.db')
+        app_module.Config.ANALYTICS_STORAGE_MODE = mode
+        app = app_module.create_app()
+        client = app.test_client()
+
+        with app.app_context():
+            user = User(email=f'bench-{mode}@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            headers = {'Authorization': f'Bearer {create_token(user.id, user.email, user.role)}'}
+            user_id = user.id
+
+        rng = random.Random(7)
+        payloads = [tracker_payload(rng, f'session_{i // 20}') for i in range(rows)]
+
+        started = time.perf_counter()
+        for payload in payloads:
+            client.post('/api/analytics/store', json=payload, headers=headers)
+        write_rate = rows / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(reads):
+            records = client.get(f'/api/analytics/user/{user_id}', headers=headers).get_json()
+        read_rate = reads * len(records) / (time.perf_counter() - started)
+
+        with app.app_context():
+            from backend.analytics_storage import rebuild_payload
+            stored = UserAnalytics.query.order_by(UserAnalytics.id).all()
+            mismatches = sum(rebuild_payload(record) != payload for record, payload in zip(stored, payloads))
+            payload_bytes = sum(
+                len(record.analytics_payload) if record.analytics_payload is not None
+                else len(app.json.dumps(record.analytics_metadata))
+                for record in stored
+            ) / len(stored)
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('VACUUM')
+                page_size = conn.exec_driver_sql('PRAGMA page_size').scalar()
+                page_count = conn.exec_driver_sql('PRAGMA page_count').scalar()
+            # Last, since archiving deletes the rows
+            export_mismatches = export_round_trip(db.engine, payloads)
+            archive_mismatches = archive_round_trip(os.path.join(tmp, 'archive'), payloads)
+            db.engine.dispose()
+
+    return {
+        'db_bytes_per_row': page_size * page_count / rows,
+        'payload_bytes_per_row': payload_bytes,
+        'writes_per_s': write_rate,
+        'rows_read_per_s': read_rate,
+        'mismatches': mismatches,
+        'export_mismatches': export_mismatches,
+        'archive_mismatches': archive_mismatches,
+    }
+
+
+def export_round_trip(engine, payloads):
+    """Rows whose payload differs in the NDJSON or CSV export (each counted once per format)."""
+    from backend.export import export_stream
+
+    start, end = datetime.datetime(2000, 1, 1), datetime.datetime.utcnow() + datetime.timedelta(days=1)
+    ndjson = ''.join(export_stream(engine, 'user_analytics', start, end, output='ndjson', batch_size=1000))
+    exported = [json.loads(line) for line in ndjson.splitlines()]
+    text = ''.join(export_stream(engine, 'user_analytics', start, end, output='csv', batch_size=1000))
+    exported_csv = list(csv.DictReader(io.StringIO(text)))
+    if len(exported) != len(payloads) or len(exported_csv) != len(payloads):
+        return len(payloads)
+    exported.sort(key=lambda row: row['id'])
+    exported_csv.sort(key=lambda row: int(row['id']))
+    return (sum(row['analytics_metadata'] != payload for row, payload in zip(exported, payloads))
+            + sum(json.loads(row['analytics_metadata']) != payload for row, payload in zip(exported_csv, payloads)))
+
+
+def archive_round_trip(archive_dir, payloads):
+    """Archive every row, then count payloads that differ when searched back."""
+    from backend.retention import archive_table, search_archive
+
+    today = datetime.datetime.utcnow()
+    archive_table('user_analytics', today + datetime.timedelta(days=1), archive_dir, 1000)
+    archived = search_archive(archive_dir, 'user_analytics', today.date() - datetime.timedelta(days=1),
+                              today.date() + datetime.timedelta(days=1), limit=len(payloads) + 1)
+    if len(archived) != len(payloads):
+        return len(payloads)
+    archived.sort(key=lambda record: record['id'])
+    return sum(record['analytics_metadata'] != payload for record, payload in zip(archived, payloads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare full vs compact UserAnalytics storage')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--reads', type=int, default=200, help='GET /api/analytics/user/<id> calls')
+    args = parser.parse_args()
+
+    results = {mode: run_mode(mode, args.rows, args.reads) for mode in ('full', 'compact')}
+
+    print(f"\n{'mode':<9}{'db B/row':>10}{'payload B/row':>15}{'writes/s':>10}{'rows read/s':>13}{'mismatches':>12}{'export':>8}{'archive':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<9}{r['db_bytes_per_row']:>10.0f}{r['payload_bytes_per_row']:>15.0f}"
+              f"{r['writes_per_s']:>10.0f}{r['rows_read_per_s']:>13.0f}{r['mismatches']:>12}"
+              f"{r['export_mismatches']:>8}{r['archive_mismatches']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Cost of Merkle anchoring and of inclusion proofs.
+
+1. For trees of growing size, reports build time, proof length and the time
+   to verify one proof. Proof length and verify time grow with log2(n).
+2. Writes `--rows` AuditLog rows to a temporary SQLite database, anchors
+   them into a file sink, and times the anchoring and a proof from the admin
+   API path.
+3. Checks the edge cases: a missing id (a transaction still committing) holds
+   anchoring back until it commits or has settled as a rollback, and a proof
+   for a batch retention partially archived is a 410, not a 500.
+
+Exits 1 if a check fails.
+
+Usage (from the Flask directory):
+    python benchmarks/audit_anchoring.py --rows 200000
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def tree_costs(sizes):
+    from backend.anchoring import inclusion_proof, leaf_hash, merkle_levels, verify_proof
+
+    print(f"{'leaves':>10}{'build s':>10}{'proof len':>11}{'verify us':>11}")
+    for n in sizes:
+        leaves = [leaf_hash(n.to_bytes(8, 'big') + i.to_bytes(8, 'big')) for i in range(n)]
+        started = time.perf_counter()
+        levels = merkle_levels(leaves)
+        build = time.perf_counter() - started
+        root = levels[-1][0]
+        samples = range(0, n, max(1, n // 200))
+        proofs = [(leaves[i], inclusion_proof(levels, i)) for i in samples]
+        started = time.perf_counter()
+        ok = all(verify_proof(leaf, proof, root) for leaf, proof in proofs)
+        verify = (time.perf_counter() - started) / len(proofs)
+        print(f"{n:>10}{build:>10.2f}{max(len(p) for _, p in proofs):>11}{verify * 1e6:>11.1f}"
+              f"{'' if ok else '  VERIFY FAILED'}")
+
+
+def anchor_rows(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'anchoring.db')
+        os.environ['AUDIT_ANCHOR_SINK'] = 'file://' + os.path.join(tmp, 'anchors.jsonl')
+        os.environ['AUDIT_ANCHOR_INTERVAL'] = '0'
+        os.environ['AUDIT_ANCHOR_SETTLE_SECONDS'] = '0'
+        from backend.app import create_app
+        from backend.anchoring import verify_proof
+        from backend.database import db
+        from backend.models import AuditLog
+
+        app = create_app()
+        anchorer = app.extensions['audit_anchorer']
+        with app.app_context():
+            now = datetime.datetime.utcnow()
+            table = AuditLog.__table__
+            for start in range(0, rows, 50000):
+                db.session.execute(table.insert(), [{
+                    'user_id': None, 'action': 'otp_attempt', 'timestamp': now,
+                    'details': {'success': n % 3 != 0, 'ip_address': f'10.0.{n % 256}.{n % 7}', 'otp_code': '12****'},
+                } for n in range(start, min(rows, start + 50000))])
+            db.session.commit()
+
+            started = time.perf_counter()
+            anchors = anchorer.anchor_pending()
+            anchoring = time.perf_counter() - started
+            print(f"\nanchored {rows} rows into {len(anchors)} roots in {anchoring:.2f}s "
+                  f"({rows / anchoring:.0f} rows/s)")
+
+            middle = anchors[-1].first_id + anchors[-1].leaf_count // 2
+            anchorer._trees.clear()
+            started = time.perf_counter()
+            proof = anchorer.proof(middle)
+            cold = time.perf_counter() - started
+            started = time.perf_counter()
+            anchorer.proof(middle + 1)
+            warm = time.perf_counter() - started
+            ok = verify_proof(proof['leaf'], proof['proof'], proof['root'])
+            print(f"proof for row {middle}: {len(proof['proof'])} hashes, {cold * 1000:.0f} ms cold "
+                  f"(tree rebuilt from rows), {warm * 1000:.1f} ms cached, verifies: {ok}")
+            return check_edge_cases(app, anchorer) and ok
+
+
+def check_edge_cases(app, anchorer):
+    """Gaps in ids and partially archived batches. Returns True if every check passes."""
+    from backend.auth import create_token
+    from backend.database import db
+    from backend.models import AuditAnchor, AuditLog, User
+
+    table = AuditLog.__table__
+    now = datetime.datetime.utcnow()
+    last = db.session.scalar(db.select(db.func.max(table.c.id)))
+
+    def insert(*ids):
+        db.session.execute(table.insert(), [{'id': i, 'user_id': None, 'action': 'otp_attempt', 'timestamp': now,
+                                             'details': {'success': True}} for i in ids])
+        db.session.commit()
+
+    results = []
+    # Row last+3 is "still committing": visible rows on both sides of it
+    anchorer.settle = 0.5
+    insert(last + 1, last + 2, last + 4, last + 5)
+    first = anchorer.anchor_pending()
+    results.append(('anchoring stops before an unsettled gap',
+                    [(a.first_id, a.last_id) for a in first] == [(last + 1, last + 2)]
+                    and anchorer.waiting_on_gap == last + 3))
+    insert(last + 3)
+    second = anchorer.anchor_pending()
+    results.append(('the late row is anchored once it commits',
+                    [(a.first_id, a.last_id, a.leaf_count) for a in second] == [(last + 3, last + 5, 3)]))
+    # A rollback: the gap is anchored past once it has settled
+    insert(last + 7)
+    held = anchorer.anchor_pending()
+    time.sleep(anchorer.settle)
+    settled = anchorer.anchor_pending()
+    results.append(('a settled gap is treated as a rollback',
+                    not held and [(a.first_id, a.last_id) for a in settled] == [(last + 7, last + 7)]))
+
+    # Retention archives part of the first big batch
+    anchor = db.session.scalars(db.select(AuditAnchor).order_by(AuditAnchor.id)).first()
+    db.session.execute(table.delete().where(table.c.id == anchor.first_id))
+    db.session.commit()
+    anchorer._trees.clear()
+    admin = User(email='anchor-admin@example.com', password_hash='x', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    token = create_token(admin.id, admin.email, 'admin')
+    response = app.test_client().get(f'/api/admin/audit-logs/{anchor.first_id + 1}/proof',
+                                     headers={'Authorization': f'Bearer {token}'})
+    results.append(('a partially archived batch answers 410', response.status_code == 410))
+
+    for name, passed in results:
+        print(f"{'ok  ' if passed else 'FAIL'} {name}")
+    return all(passed for _, passed in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merkle anchoring benchmark')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--max-leaves', type=int, default=1000000)
+    args = parser.parse_args()
+
+    sizes = [10 ** k for k in range(3, 7) if 10 ** k <= args.max_leaves]
+    tree_costs(sizes)
+    sys.exit(0 if anchor_rows(args.rows) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cost of the AuditLog hash chain: linking at insert time and verification.
+
+Writes `--rows` AuditLog rows to a temporary SQLite database through the same
+path as the batch ingest endpoint (link_rows plus one bulk insert per batch),
+timing inserts with and without linking. Then verifies the whole range with
+1 and with `--workers` processes and extrapolates the time for 100M rows.
+A resumed verification afterwards only reads the rows added since the last
+checkpoint. Last, rows are written with user ids in the forms clients send
+(5.0, true, "5"), through the unauthenticated endpoints and directly through
+the ORM, and must verify clean: the chain hashes user_id as the column stores
+it, and the endpoints reject ids it could not store as an integer. Exits 1 if
+any of those rows fails verification.
+
+Usage (from the Flask directory):
+    python benchmarks/audit_chain_verify.py --rows 500000 --workers 8
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def insert_rows(db, rows, link, batch=5000):
+    from backend import audit_chain
+    from backend.models import AuditLog
+
+    table = AuditLog.__table__
+    now = datetime.datetime.utcnow()
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        values = [{
+            'user_id': n % 1000, 'action': 'analytics_event', 'timestamp': now,
+            'details': {'page': f'/p/{n % 50}', 'duration': n % 600, 'success': n % 3 != 0},
+        } for n in range(start, min(rows, start + batch))]
+        if link:
+            audit_chain.link_rows(db.session, values)
+        db.session.execute(table.insert(), values)
+        db.session.commit()
+    return time.perf_counter() - started
+
+
+def check_client_ids(app, db):
+    """Rows written with loosely typed user ids must verify clean. Returns the problems found."""
+    from backend.audit_chain import verify_range
+    from backend.models import AuditLog
+
+    first_id = (db.session.scalar(db.select(db.func.max(AuditLog.id))) or 0) + 1
+    client = app.test_client()
+    statuses = {}
+    for user_id in (5, 5.0, '5', True, 5.5, '5.0', ' 5', 'abc'):
+        for path, body in (('/user_analytics', {'event': 'page_view'}), ('/otp_attempts', {'otp_code': '123456'})):
+            response = client.post(path, json=dict(body, user_id=user_id))
+            statuses.setdefault(repr(user_id), []).append(response.status_code)
+    # Writers that skip the endpoints' validation still hash what the column stores
+    db.session.add_all([AuditLog(user_id=user_id, action='analytics_event', details={'direct': True})
+                        for user_id in (5.0, True, False, '7')])
+    db.session.commit()
+
+    report = verify_range(start_id=first_id, workers=1, record=False)
+    print("client user ids (status per endpoint): " + ', '.join(f"{k} {v}" for k, v in statuses.items()))
+    print(f"verified {report['rows']} rows written with client user ids: {report['problem_count']} problems")
+    for problem in report['problems'][:5]:
+        print(f"  {problem}")
+    return report['problem_count']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AuditLog hash chain benchmark')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--segment-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'chain.db')
+        from backend.app import create_app
+        from backend.audit_chain import verify_range
+        from backend.database import db
+        from backend.models import AuditLog
+
+        app = create_app()
+        with app.app_context():
+            plain = insert_rows(db, args.rows // 10, link=False)
+            db.session.execute(AuditLog.__table__.delete())
+            db.session.commit()
+            linked = insert_rows(db, args.rows // 10, link=True)
+            print(f"insert {args.rows // 10} rows: {plain:.2f}s plain, {linked:.2f}s linked "
+                  f"({(linked - plain) / (args.rows // 10) * 1e6:.1f} us/row for the chain)")
+            insert_rows(db, args.rows - args.rows // 10, link=True)
+
+            for workers in sorted({1, args.workers}):
+                started = time.perf_counter()
+                report = verify_range(workers=workers, segment_size=args.segment_size, record=False)
+                elapsed = time.perf_counter() - started
+                rate = report['rows'] / elapsed
+                print(f"verify {report['rows']} rows with {workers} process(es): {elapsed:.2f}s, "
+                      f"{rate:.0f} rows/s, {report['problem_count']} problems; "
+                      f"100M rows would take {1e8 / rate / 60:.1f} min")
+
+            verify_range(workers=args.workers, segment_size=args.segment_size)
+            insert_rows(db, 10000, link=True)
+            started = time.perf_counter()
+            report = verify_range(workers=args.workers, segment_size=args.segment_size, resume=True)
+            print(f"resumed from checkpoint: {report['rows']} new rows verified in "
+                  f"{time.perf_counter() - started:.2f}s, {report['problem_count']} problems")
+
+            problems = check_client_ids(app, db)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
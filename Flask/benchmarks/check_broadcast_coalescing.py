@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Check and measure coalesced admin broadcasts.
+
+Starts a create_app() node in this process, connects an admin client and
+publishes `--events` risk updates for `--users` distinct users as fast as
+possible. With coalescing the client must receive roughly one message per
+BROADCAST_WINDOW_MS, holding the latest update of every user; the script
+prints messages sent vs events published and the broadcaster counters.
+Exits 1 if any user's latest update is missing.
+
+Before that, a slow consumer is checked against a stand-in Socket.IO server
+whose per-client send queues the script controls: a client skipped for a few
+windows must, once its queue drains, receive the latest update of every user
+and every aggregate field published while it was behind.
+
+Usage (from the Flask directory):
+    python benchmarks/check_broadcast_coalescing.py --events 5000 --users 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from socketio_connections import SocketIOClient, admin_auth, wait_for_port  # noqa: E402
+
+PORT = 18110
+
+
+async def check(websocket, args, auth):
+    await wait_for_port(PORT)
+    client = SocketIOClient('127.0.0.1', PORT, auth=auth)
+    await client.connect()
+    client.emit('join_admin_room', {})
+    await client.wait_event('status', 5)
+
+    started = time.perf_counter()
+    for n in range(args.events):
+        websocket.broadcast_risk_update({'user_id': n % args.users, 'risk_score': float(n), 'risk_label': 'high'})
+        if n % 100 == 99:
+            # Spread publishing over a few windows like a real burst would be
+            await asyncio.sleep(0.01)
+    published = time.perf_counter() - started
+
+    latest, messages, coalesced = {}, 0, 0
+    while coalesced < args.events:
+        try:
+            message = await client.wait_event('risk_data_update', 5)
+        except (asyncio.TimeoutError, ConnectionError):
+            break
+        if 'updates' not in message:
+            # A live metrics snapshot, not one of ours
+            continue
+        messages += 1
+        coalesced += message['coalesced']
+        for update in message['updates']:
+            latest[update['user_id']] = update['risk_score']
+    client.close()
+
+    expected = {user: float(n) for n, user in ((n, n % args.users) for n in range(args.events))}
+    print(f"published {args.events} events in {published:.2f}s, received {messages} messages "
+          f"covering {coalesced} events ({args.events / max(1, messages):.0f} events/message)")
+    print(f"broadcaster: {websocket.broadcast_stats()}")
+    missing = sum(1 for user, score in expected.items() if latest.get(user) != score)
+    print(f"users with stale or missing latest update: {missing}")
+    return missing
+
+
+class _FakeSocket:
+    def __init__(self):
+        self.backlog = 0
+        self.queue = self
+
+    def qsize(self):
+        return self.backlog
+
+
+class _FakeSocketIO:
+    """Just enough of flask_socketio.SocketIO for RoomBroadcaster: one room of local clients."""
+
+    def __init__(self, room, sids):
+        self.room = room
+        self.sockets = {sid: _FakeSocket() for sid in sids}
+        self.received = {sid: [] for sid in sids}
+        self.server = self
+        self.manager = self
+        self.eio = self
+        self.rooms = {}
+
+    def start_background_task(self, target):
+        # Never run: the check flushes by hand, one window at a time
+        return object()
+
+    def get_participants(self, namespace, room):
+        return [(sid, sid) for sid in self.sockets] if room == self.room else []
+
+    def emit(self, event, message, room=None, skip_sid=None, to=None):
+        targets = [to] if to is not None else [sid for sid in self.sockets if sid not in (skip_sid or ())]
+        for sid in targets:
+            self.received[sid].append(message)
+
+
+def check_slow_consumer(users=50, windows=6):
+    """Messages a client skipped while slow must reach it once it catches up. Returns problems found."""
+    from backend.broadcast import RoomBroadcaster
+
+    socketio = _FakeSocketIO('admin_room', ['fast', 'slow'])
+    broadcaster = RoomBroadcaster(socketio, window_ms=250, max_backlog=10)
+    expected_stats = {}
+    for window in range(windows):
+        # Behind for every window but the first and the last
+        socketio.sockets['slow'].backlog = 100 if 0 < window < windows - 1 else 0
+        for user in range(users):
+            if (user + window) % 3 == 0:
+                broadcaster.publish('admin_room', 'risk_data_update', 'risk_update',
+                                    {'user_id': user, 'risk_score': float(window)}, key=user)
+        stats = {f'field_{window}': window, 'window': window}
+        expected_stats.update(stats)
+        broadcaster.publish('admin_room', 'metrics_update', 'metrics', stats)
+        broadcaster.flush()
+
+    problems = 0
+    for sid, messages in socketio.received.items():
+        latest, fields = {}, {}
+        for message in messages:
+            for update in message.get('updates', []):
+                latest[update['user_id']] = update['risk_score']
+            if message['type'] == 'metrics':
+                fields.update(message['data'])
+        expected = {}
+        for window in range(windows):
+            for user in range(users):
+                if (user + window) % 3 == 0:
+                    expected[user] = float(window)
+        stale = sum(1 for user, score in expected.items() if latest.get(user) != score)
+        missing_fields = sum(1 for key, value in expected_stats.items() if fields.get(key) != value)
+        print(f"slow-consumer check, client '{sid}': {len(messages)} messages, "
+              f"{stale} stale users, {missing_fields} missing aggregate fields")
+        problems += stale + missing_fields
+    print(f"slow-consumer broadcaster: {broadcaster.stats()}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Coalesced broadcast check')
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    from backend import app as app_module
+    from backend import websocket
+
+    slow_problems = check_slow_consumer()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app_module.Config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'broadcast.db')
+        app = app_module.create_app()
+        socketio = app.extensions['socketio']
+        threading.Thread(
+            target=socketio.run, args=(app,),
+            kwargs={'host': '127.0.0.1', 'port': PORT, 'allow_unsafe_werkzeug': True, 'log_output': False},
+            daemon=True
+        ).start()
+        missing = asyncio.run(check(websocket, args, admin_auth(app)))
+
+    sys.exit(1 if missing or slow_problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Upgrade check for the schema migrations (backend/migrations.py).
+
+Builds a SQLite database with the schema of the first release, before any
+migration existed, and a few rows in it, then starts the app on it, which
+runs every pending migration. Fails unless startup succeeds, the database
+ends at the latest migration, and every index and column declared on the
+models exists.
+
+Usage (from the Flask directory):
+    python benchmarks/check_migrations.py
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Tables as the first release's db.create_all() built them
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL,
+    email VARCHAR(120) NOT NULL,
+    password_hash VARCHAR(256) NOT NULL,
+    role VARCHAR(20),
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (email)
+);
+CREATE TABLE behavioral_data (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    fingerprint_data JSON NOT NULL,
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE risk_assessment (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    risk_score FLOAT NOT NULL,
+    risk_label VARCHAR(20) NOT NULL,
+    component_scores JSON,
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE audit_log (
+    id INTEGER NOT NULL,
+    user_id INTEGER,
+    action VARCHAR(50) NOT NULL,
+    details JSON,
+    timestamp DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE user_analytics (
+    id INTEGER NOT NULL,
+    user_id INTEGER,
+    session_id VARCHAR(50) NOT NULL,
+    page_url VARCHAR(255),
+    user_agent VARCHAR(255),
+    typing_wpm FLOAT,
+    typing_keystrokes INTEGER,
+    typing_corrections INTEGER,
+    mouse_clicks INTEGER,
+    mouse_movements INTEGER,
+    mouse_velocity FLOAT,
+    mouse_idle_time INTEGER,
+    scroll_depth FLOAT,
+    scroll_speed FLOAT,
+    scroll_events INTEGER,
+    focus_changes INTEGER,
+    focus_time INTEGER,
+    tab_switches INTEGER,
+    session_duration INTEGER,
+    page_views INTEGER,
+    interactions_count INTEGER,
+    analytics_metadata JSON,
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+"""
+
+
+def build_baseline(path):
+    now = datetime.datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO user (id, email, password_hash, role, created_at) VALUES (1, ?, 'x', 'user', ?)",
+                 ('old@example.com', now))
+    conn.executemany(
+        "INSERT INTO audit_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
+        [(1, 'login_success', json.dumps({'ip_address': '10.0.0.1'}), now),
+         (1, 'risk_assessment', json.dumps({'final_label': 'low', 'final_score': 12.5}), now)]
+    )
+    conn.execute("INSERT INTO user_analytics (user_id, session_id, created_at) VALUES (1, 's', ?)", (now,))
+    conn.commit()
+    conn.close()
+
+
+def check_schema(db):
+    """Problems with the upgraded schema, as printable strings."""
+    import sqlalchemy as sa
+    from backend.migrations import MIGRATIONS, current_version
+
+    problems = []
+    inspector = sa.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            problems.append(f"table {table.name} missing")
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        problems.extend(f"column {table.name}.{column.name} missing"
+                        for column in table.columns if column.name not in columns)
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        problems.extend(f"index {index.name} missing" for index in table.indexes if index.name not in indexes)
+    version, latest = current_version(), MIGRATIONS[-1][0]
+    if version != latest:
+        problems.append(f"schema at version {version}, expected {latest}")
+    return problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'baseline.db')
+        build_baseline(path)
+        os.environ['DATABASE_URL'] = 'sqlite:///' + path
+        from backend.app import create_app
+        from backend.database import db
+
+        try:
+            app = create_app()
+        except Exception as e:
+            print(f"\nStartup on a first-release database failed: {e!r}")
+            sys.exit(1)
+        with app.app_context():
+            problems = check_schema(db)
+            db.engine.dispose()
+
+    if problems:
+        print(f"\n{len(problems)} schema problems after upgrading a first-release database:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("\nA first-release database upgrades to the current schema.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for the hot endpoint queries.
+
+Seeds a throwaway SQLite database with N rows per table (1M by default), then
+runs EXPLAIN QUERY PLAN on each query the endpoints issue and fails if any of
+them falls back to a full table scan.
+
+Usage (from the Flask directory):
+    python benchmarks/check_query_plans.py --rows 1000000
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def seed(db, rows, users):
+    """Bulk insert synthetic rows with raw executemany for speed."""
+    now = datetime.datetime.utcnow()
+    rng = random.Random(42)
+    actions = ['login_success', 'risk_assessment', 'otp_attempt', 'analytics_event']
+    labels = ['low', 'medium', 'high']
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO user (id, email, password_hash, role, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(i, f'user{i}@example.com', 'x', 'user', now) for i in range(1, users + 1)]
+        )
+        batch = 100_000
+        for start in range(0, rows, batch):
+            chunk = range(start, min(start + batch, rows))
+            stamps = [now - datetime.timedelta(seconds=i) for i in chunk]
+            conn.exec_driver_sql(
+                "INSERT INTO behavioral_data (user_id, fingerprint_data, created_at) VALUES (?, ?, ?)",
+                [(rng.randint(1, users), '{}', ts) for ts in stamps]
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO user_analytics (user_id, session_id, created_at) VALUES (?, ?, ?)",
+                [(rng.randint(1, users), 's', ts) for ts in stamps]
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO audit_log (user_id, action, details, timestamp, success, ip_address) VALUES (?, ?, ?, ?, ?, ?)",
+                [(rng.randint(1, users), rng.choice(actions), '{}', ts,
+                  rng.random() < 0.9, f'10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}') for ts in stamps]
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO risk_assessment (user_id, risk_score, risk_label, created_at) VALUES (?, ?, ?, ?)",
+                [(rng.randint(1, users), 50.0, rng.choice(labels), ts) for ts in stamps]
+            )
+        conn.exec_driver_sql("ANALYZE")
+
+
+def endpoint_queries():
+    """The statements issued by the hot endpoints, as SQLAlchemy selects."""
+    import sqlalchemy as sa
+    from backend.models import BehavioralData, AuditLog, UserAnalytics, MetricRollup
+
+    return {
+        'fingerprint/analyze (latest fingerprint)':
+            sa.select(BehavioralData).where(BehavioralData.user_id == 7)
+            .order_by(BehavioralData.created_at.desc()).limit(1),
+        'analytics/user/<id>':
+            sa.select(UserAnalytics).where(UserAnalytics.user_id == 7)
+            .order_by(UserAnalytics.created_at.desc()).limit(50),
+        'admin/audit-logs':
+            sa.select(AuditLog).order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(100),
+        'admin/audit-logs?user_id=':
+            sa.select(AuditLog).where(AuditLog.user_id == 7)
+            .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(100),
+        'admin/audit-logs?action=':
+            sa.select(AuditLog).where(AuditLog.action == 'otp_attempt')
+            .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(100),
+        'failed OTP attempts from an IP in the last hour':
+            sa.select(sa.func.count()).select_from(AuditLog)
+            .where(AuditLog.ip_address == '10.0.1.2', AuditLog.action == 'otp_attempt',
+                   AuditLog.success.is_(False), AuditLog.timestamp >= datetime.datetime(2025, 1, 1)),
+        'analytics/dashboard (rollup total)':
+            sa.select(sa.func.sum(MetricRollup.count))
+            .where(MetricRollup.metric == 'risk_label', MetricRollup.dimension == 'high'),
+        'user_analytics (hourly rollup)':
+            sa.select(MetricRollup.hour, sa.func.sum(MetricRollup.count))
+            .where(MetricRollup.metric == 'audit_action', MetricRollup.hour >= datetime.datetime(2025, 1, 1))
+            .group_by(MetricRollup.hour),
+    }
+
+
+def check_plans(db):
+    failures = []
+    with db.engine.connect() as conn:
+        for name, query in endpoint_queries().items():
+            sql = str(query.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+            plan = [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+            uses_index = any('USING' in step and 'INDEX' in step for step in plan)
+            full_scan = any(step.startswith('SCAN') and 'INDEX' not in step for step in plan)
+            status = 'ok' if uses_index and not full_scan else 'FAIL'
+            print(f"[{status}] {name}: {' | '.join(plan)}")
+            if status != 'ok':
+                failures.append(name)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Assert hot endpoint queries use indexes')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows per table')
+    parser.add_argument('--users', type=int, default=10_000, help='Distinct users')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'plans.db')
+        from backend.app import create_app
+        from backend.database import db
+
+        app = create_app()
+        with app.app_context():
+            print(f"Seeding {args.rows:,} rows per table...")
+            seed(db, args.rows, args.users)
+            failures = check_plans(db)
+            db.engine.dispose()
+
+    if failures:
+        print(f"\n{len(failures)} queries fall back to table scans: {', '.join(failures)}")
+        sys.exit(1)
+    print("\nAll endpoint queries use an index.")
+
+
+if __name__ == '__main__':
+    main()
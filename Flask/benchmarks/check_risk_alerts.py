@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Check the high-risk event stream end to end, and its backpressure.
+
+1. Starts a node with RISK_ALERT_THRESHOLD=0, so every assessment is
+   flagged. Connects an admin client and one client per user, and posts
+   `--assessments` risk assessments through /api/risk/assess. Every user must
+   show up in a risk_data_update for the admins and get a risk_alert in
+   their own room, within `--max-latency` seconds of the response.
+2. Publishes many events into a small bus with no dispatcher running, and
+   checks that publishing stays cheap, keeps only the newest events and
+   counts the dropped ones.
+3. Connects a client with a plain user token that claims the admin role in
+   its events, and checks it is refused the admin room and admin streams,
+   and another user's room.
+
+Exits 1 on failure.
+
+Usage (from the Flask directory):
+    python benchmarks/check_risk_alerts.py --assessments 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from socketio_connections import SocketIOClient, admin_auth, percentile, wait_for_port  # noqa: E402
+
+PORT = 18140
+
+FEATURES = {
+    'typing_speed': 400.0, 'mouse_distance': 1.0, 'click_count': 90, 'session_duration': 2,
+    'scroll_depth': 0.0, 'ip_location_score': 1.0, 'device_type_score': 1.0,
+}
+
+
+async def stream_check(app, args):
+    from backend.auth import create_token
+    from backend.database import db
+    from backend.models import User
+
+    with app.app_context():
+        users = [User(email=f'risk{n}@example.com', password_hash='x') for n in range(args.assessments)]
+        db.session.add_all(users)
+        db.session.commit()
+        tokens = {user.id: create_token(user.id, user.email, user.role) for user in users}
+
+    await wait_for_port(PORT)
+    admin = SocketIOClient('127.0.0.1', PORT, auth=admin_auth(app))
+    await admin.connect()
+    admin.emit('join_admin_room', {})
+    await admin.wait_event('status', 5)
+    user_clients = {}
+    for user_id in tokens:
+        client = SocketIOClient('127.0.0.1', PORT, auth={'token': tokens[user_id]})
+        await client.connect()
+        client.emit('join_user_room', {'user_id': user_id})
+        await client.wait_event('status', 5)
+        user_clients[user_id] = client
+
+    responded, admin_seen, user_seen = {}, {}, {}
+
+    async def watch_admin():
+        while len(admin_seen) < len(tokens):
+            message = await admin.wait_event('risk_data_update', args.max_latency + 5)
+            for update in message.get('updates', []):
+                admin_seen.setdefault(update['user_id'], time.perf_counter())
+
+    async def watch_user(user_id, client):
+        await client.wait_event('risk_alert', args.max_latency + 5)
+        user_seen[user_id] = time.perf_counter()
+
+    watchers = [asyncio.ensure_future(watch_admin())]
+    watchers += [asyncio.ensure_future(watch_user(user_id, client)) for user_id, client in user_clients.items()]
+
+    http = app.test_client()
+    for user_id, token in tokens.items():
+        response = await asyncio.to_thread(
+            http.post, '/api/risk/assess', json=FEATURES, headers={'Authorization': f'Bearer {token}'}
+        )
+        responded[user_id] = time.perf_counter()
+        assert response.status_code == 200, response.get_data(as_text=True)
+    await asyncio.wait(watchers, timeout=args.max_latency + 5)
+
+    failures = 0
+    for name, seen in (('admin_room', admin_seen), ('user rooms', user_seen)):
+        latencies = [seen[user_id] - responded[user_id] for user_id in seen]
+        missing = len(tokens) - len(seen)
+        slow = sum(1 for latency in latencies if latency > args.max_latency)
+        print(f"{name:<11} {len(seen)}/{len(tokens)} users flagged, latency p50 "
+              f"{percentile(latencies, 50) * 1000:.0f} ms, max {max(latencies, default=0) * 1000:.0f} ms, "
+              f"{slow} over {args.max_latency:.1f}s")
+        failures += missing + slow
+    for client in [admin, *user_clients.values()]:
+        client.close()
+    return failures
+
+
+async def access_check(app):
+    """Failures of a user client that claims to be an admin."""
+    from backend.auth import create_token
+
+    with app.app_context():
+        token = create_token(999999, 'impostor@example.com', 'user')
+    client = SocketIOClient('127.0.0.1', PORT, auth={'token': token})
+    await client.connect()
+    failures = 0
+    client.emit('join_admin_room', {'user_id': 1, 'role': 'admin'})
+    try:
+        await client.wait_event('error', 5)
+    except asyncio.TimeoutError:
+        print("access: a user token claiming admin was NOT refused the admin room")
+        failures += 1
+    client.emit('request_risk_data', {'user_id': 1, 'role': 'admin'})
+    try:
+        await client.wait_event('risk_data_update', 1)
+        print("access: a user token claiming admin was sent admin risk data")
+        failures += 1
+    except asyncio.TimeoutError:
+        pass
+    client.emit('join_user_room', {'user_id': 1})
+    try:
+        await client.wait_event('error', 5)
+    except asyncio.TimeoutError:
+        print("access: a user token was NOT refused another user's room")
+        failures += 1
+    client.close()
+    print(f"access: admin claims and other users' rooms refused for a user token: {failures == 0}")
+    return failures
+
+
+def backpressure_check():
+    from backend.risk_events import RiskEventBus
+
+    bus = RiskEventBus(threshold=0, capacity=100)
+    count = 100000
+    started = time.perf_counter()
+    for n in range(count):
+        bus.publish_assessment(n, 99.0, 'high', {})
+    elapsed = time.perf_counter() - started
+    stats = bus.stats()
+    newest = [event['user_id'] for event in bus._queue]
+    ok = stats['dropped'] == count - 100 and newest == list(range(count - 100, count))
+    print(f"backpressure: {count} publishes at {elapsed / count * 1e6:.1f} us each, depth {stats['depth']}, "
+          f"dropped {stats['dropped']}, newest kept: {newest == list(range(count - 100, count))}")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='High-risk event stream check')
+    parser.add_argument('--assessments', type=int, default=50)
+    parser.add_argument('--max-latency', type=float, default=1.0, help='seconds')
+    args = parser.parse_args()
+
+    from backend import app as app_module
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app_module.Config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'risk_alerts.db')
+        app_module.Config.RISK_ALERT_THRESHOLD = 0.0
+        app = app_module.create_app()
+        socketio = app.extensions['socketio']
+        threading.Thread(
+            target=socketio.run, args=(app,),
+            kwargs={'host': '127.0.0.1', 'port': PORT, 'allow_unsafe_werkzeug': True, 'log_output': False},
+            daemon=True
+        ).start()
+        failures = asyncio.run(stream_check(app, args))
+        failures += asyncio.run(access_check(app))
+
+    failures += backpressure_check()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
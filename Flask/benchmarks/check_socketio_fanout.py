@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Check that Socket.IO broadcasts reach clients on every backend node.
+
+Starts two nodes in this process, each a create_app() served on its own
+port, sharing the in-process local:// message queue. An admin client joins
+admin_room on each node, a broadcast is sent from one node only, and both
+clients must receive it. Exits 1 on failure.
+
+Usage (from the Flask directory):
+    python benchmarks/check_socketio_fanout.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from socketio_connections import SocketIOClient, admin_auth, wait_for_port  # noqa: E402
+
+PORTS = (18100, 18101)
+
+
+def start_node(app_module, port):
+    app = app_module.create_app()
+    socketio = app.extensions['socketio']
+    thread = threading.Thread(
+        target=socketio.run, args=(app,),
+        kwargs={'host': '127.0.0.1', 'port': port, 'allow_unsafe_werkzeug': True, 'log_output': False},
+        daemon=True
+    )
+    thread.start()
+    return app
+
+
+async def check(websocket, auth):
+    clients = []
+    for port in PORTS:
+        await wait_for_port(port)
+        client = SocketIOClient('127.0.0.1', port, auth=auth)
+        await client.connect()
+        client.emit('join_admin_room', {})
+        await client.wait_event('status', 5)
+        clients.append(client)
+
+    # The module-level helpers emit through the most recently created node
+    websocket.broadcast_risk_update({'user_id': 42, 'risk_score': 91.0, 'risk_label': 'high'})
+
+    failures = 0
+    for port, client in zip(PORTS, clients):
+        try:
+            # Skip the live metric snapshots sent on joining the room
+            update = await client.wait_event('risk_data_update', 5)
+            while update['data'].get('user_id') != 42:
+                update = await client.wait_event('risk_data_update', 5)
+            print(f"node :{port} received risk_data_update for user {update['data']['user_id']}")
+        except (asyncio.TimeoutError, ConnectionError):
+            print(f"node :{port} did NOT receive risk_data_update")
+            failures += 1
+        client.close()
+    return failures
+
+
+def main():
+    from backend import app as app_module
+    from backend import websocket
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app_module.Config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'fanout.db')
+        app_module.Config.SOCKETIO_MESSAGE_QUEUE = 'local://'
+        apps = [start_node(app_module, port) for port in PORTS]
+        # Let both queue listeners subscribe before broadcasting
+        time.sleep(0.5)
+        failures = asyncio.run(check(websocket, admin_auth(apps[0])))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the JSON providers.
+
+Builds responses shaped like the real ones - an /api/admin/audit-logs page of
+risk-assessment and login entries, and /api/analytics/user/<id> records with
+full tracker payloads - and times `app.json.response()` with Flask's default
+provider, the stdlib provider and the orjson provider. Also checks that the
+stdlib and orjson providers produce byte-identical output.
+
+Usage (from the Flask directory):
+    python benchmarks/json_serialization.py --rows 500
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analytics_storage import tracker_payload  # noqa: E402
+
+
+def audit_log_page(rng, rows):
+    start = datetime.datetime(2025, 1, 1)
+    page = []
+    for i in range(rows):
+        if i % 3:
+            details = {
+                'final_score': rng.uniform(0, 100),
+                'final_label': rng.choice(['low', 'medium', 'high']),
+                'components': {
+                    'ml_score': rng.uniform(0, 100),
+                    'ml_risk_label': rng.choice(['low', 'medium', 'high']),
+                    'fingerprint_diff': round(rng.uniform(0, 80), 2),
+                    'intent_score': round(rng.uniform(5, 30), 2),
+                },
+            }
+            action = 'risk_assessment'
+        else:
+            details = {'email': f'user{i}@example.com', 'success': rng.random() > 0.2,
+                       'ip_address': f'10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}'}
+            action = 'login_success'
+        page.append({
+            'id': i + 1,
+            'user_id': rng.randint(1, 1000),
+            'action': action,
+            'timestamp': start + datetime.timedelta(seconds=i * 37, microseconds=rng.randint(0, 999999)),
+            'details': details,
+        })
+    return page
+
+
+def analytics_records(rng, rows):
+    start = datetime.datetime(2025, 1, 1)
+    records = []
+    for i in range(rows):
+        payload = tracker_payload(rng, f'session_{i // 20}')
+        records.append({
+            'id': i + 1,
+            'session_id': payload['sessionId'],
+            'page_url': payload['pageUrl'],
+            'typing_wpm': payload['typing']['wpm'],
+            'mouse_clicks': payload['mouse']['clicks'],
+            'scroll_depth': payload['scroll']['maxDepth'],
+            'focus_time': payload['focus']['totalFocusTime'],
+            'session_duration': payload['sessionDuration'],
+            'created_at': start + datetime.timedelta(seconds=i * 11),
+            'analytics_metadata': payload,
+        })
+    return records
+
+
+def time_provider(app, provider, responses, repeat):
+    app.json = provider
+    best = float('inf')
+    with app.app_context():
+        for _ in range(repeat):
+            started = time.process_time()
+            for response in responses:
+                provider.response(response)
+            best = min(best, time.process_time() - started)
+        sizes = sum(len(provider.response(response).get_data()) for response in responses)
+    return best / len(responses), sizes / len(responses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON providers on realistic responses')
+    parser.add_argument('--rows', type=int, default=500, help='rows per response')
+    parser.add_argument('--responses', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from backend.json_provider import OrjsonProvider, StdlibProvider
+
+    app = Flask(__name__)
+    rng = random.Random(7)
+    workloads = {
+        'audit-logs': [audit_log_page(rng, args.rows) for _ in range(args.responses)],
+        'analytics': [analytics_records(rng, args.rows) for _ in range(args.responses)],
+    }
+    providers = {'flask': DefaultJSONProvider(app), 'stdlib': StdlibProvider(app)}
+    if OrjsonProvider is not None:
+        providers['orjson'] = OrjsonProvider(app)
+    else:
+        print("orjson is not installed; skipping it")
+
+    print(f"\n{'workload':<12}{'provider':<9}{'ms/response':>12}{'KB/response':>13}{'vs flask':>10}")
+    for name, responses in workloads.items():
+        baseline = None
+        for provider_name, provider in providers.items():
+            seconds, size = time_provider(app, provider, responses, args.repeat)
+            baseline = baseline or seconds
+            print(f"{name:<12}{provider_name:<9}{seconds * 1000:>12.2f}{size / 1024:>13.1f}{baseline / seconds:>9.1f}x")
+
+        if 'orjson' in providers:
+            with app.app_context():
+                identical = sum(
+                    providers['stdlib'].response(r).get_data() == providers['orjson'].response(r).get_data()
+                    for r in responses
+                )
+            print(f"{name:<12}stdlib and orjson output identical for {identical}/{len(responses)} responses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Sustainable session-logging throughput on the simulated CyberIdentity ledger.
+
+Registers `--users` sender DIDs, then for each batching mode (single
+logSession per session, logSessionBatch, or one logSession of a Merkle root)
+and each offered rate in `--rates`, generates Poisson session arrivals for
+`--duration` simulated seconds. Blocks are mined every `--block-time` seconds
+with a `--gas-limit` gas budget. After the arrivals stop, up to `--drain`
+more blocks are mined.
+
+Per run it reports the sessions/s actually included, the backlog left when
+the arrivals stopped, latency from session to block inclusion (p50/p95/p99),
+gas per session and block fullness. A rate is sustainable when that backlog
+is included within two blocks. The last column is the gas-bound ceiling,
+gas_limit / (gas per session * block_time).
+
+The ledger runs as a discrete-event simulation, so an hour of chain time
+takes seconds. `sim s` is the wall time of the run.
+
+Usage (from the Flask directory):
+    python benchmarks/ledger_throughput.py --rates 10,30,60,120,500 --duration 300
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from socketio_connections import percentile  # noqa: E402
+
+from backend.ledger_sim import CyberIdentityLedger, SessionBatcher, address_for, session_hash  # noqa: E402
+
+
+def simulate(mode, rate, args):
+    rng = random.Random(args.seed)
+    ledger = CyberIdentityLedger(block_time=args.block_time, block_gas_limit=args.gas_limit)
+    senders = [address_for(f'user{n}') for n in range(args.users)]
+    for sender in senders:
+        ledger.registerDID(sender, f'did:walmart-secure:{sender}', now=0.0)
+    while ledger.mempool:
+        ledger.mine_block(0.0)
+    registration = ledger.stats()
+
+    batcher = SessionBatcher(ledger, mode, max_batch=args.batch_size, max_wait=args.max_wait)
+    latencies, included, offered = [], 0, 0
+    now, next_block, next_arrival = 0.0, args.block_time, rng.expovariate(rate)
+    backlog_at_end, drain_blocks = None, 0
+    last_block = args.duration + args.drain * args.block_time
+    started = time.perf_counter()
+
+    while now < last_block:
+        deadline = batcher.next_deadline()
+        now = min(next_block, next_arrival if next_arrival < args.duration else float('inf'),
+                  deadline if deadline is not None else float('inf'))
+        if now == next_arrival:
+            batcher.add(rng.choice(senders), session_hash(offered, now), now)
+            offered += 1
+            next_arrival += rng.expovariate(rate)
+        elif now == next_block:
+            if backlog_at_end is None and now >= args.duration:
+                batcher.flush(now)
+                backlog_at_end = sum(len(queued) for tx, queued in batcher.carried.items())
+            block = ledger.mine_block(now)
+            if backlog_at_end is not None:
+                drain_blocks += 1
+            for tx_hash in block['transactions']:
+                queued = batcher.carried.pop(tx_hash, ())
+                latencies.extend(now - queued_at for queued_at in queued)
+                if now <= args.duration:
+                    included += len(queued)
+            next_block += args.block_time
+            if backlog_at_end is not None and not batcher.carried:
+                break
+        else:
+            batcher.poll(now)
+    elapsed = time.perf_counter() - started
+
+    stats = ledger.stats()
+    gas = stats['gas_used'] - registration['gas_used']
+    # Sessions the app logged; in merkle mode the ledger only holds their roots
+    sessions = len(latencies)
+    blocks = stats['blocks'] - registration['blocks']
+    per_session = gas / sessions if sessions else float('nan')
+    stranded = sum(len(queued) for queued in batcher.carried.values())
+    capacity = args.gas_limit / per_session / args.block_time if sessions else float('nan')
+    return {
+        'mode': mode, 'offered': rate, 'included': included / args.duration,
+        'backlog': backlog_at_end or 0, 'stranded': stranded,
+        'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95), 'p99': percentile(latencies, 99),
+        'gas': per_session, 'fullness': (gas / (blocks * args.gas_limit)) if blocks else 0.0,
+        'capacity': capacity, 'elapsed': elapsed,
+        'sustainable': stranded == 0 and drain_blocks <= 2,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CyberIdentity ledger throughput simulation')
+    parser.add_argument('--modes', default='single,batch,merkle')
+    parser.add_argument('--rates', default='10,30,60,120,500', help='offered sessions/s, comma separated')
+    parser.add_argument('--users', type=int, default=50, help='sender accounts')
+    parser.add_argument('--duration', type=float, default=300.0, help='simulated seconds of arrivals')
+    parser.add_argument('--drain', type=int, default=10, help='blocks mined after the arrivals stop')
+    parser.add_argument('--block-time', type=float, default=12.0)
+    parser.add_argument('--gas-limit', type=int, default=30_000_000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--max-wait', type=float, default=6.0, help='seconds a session may wait for its batch')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(',')]
+    print(f"{args.users} senders, {args.block_time:.0f}s blocks, {args.gas_limit / 1e6:.0f}M gas, "
+          f"batches of up to {args.batch_size} or {args.max_wait:.0f}s")
+    print(f"{'mode':<8}{'offered/s':>10}{'incl/s':>9}{'backlog':>9}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}"
+          f"{'gas/sess':>10}{'full':>7}{'sim s':>7}  {'ceiling/s':>9}")
+    for mode in args.modes.split(','):
+        best = None
+        for rate in rates:
+            result = simulate(mode, rate, args)
+            if result['sustainable']:
+                best = rate
+            print(f"{mode:<8}{rate:>10.0f}{result['included']:>9.1f}{result['backlog']:>9}"
+                  f"{result['p50']:>8.1f}{result['p95']:>8.1f}{result['p99']:>8.1f}{result['gas']:>10.0f}"
+                  f"{result['fullness'] * 100:>6.0f}%{result['elapsed']:>7.1f}  {result['capacity']:>9.0f}"
+                  f"{'' if result['sustainable'] else '  backlog growing'}")
+        print(f"{mode}: highest sustainable offered rate {best if best is not None else 'none'} sessions/s\n")
+
+
+if __name__ == '__main__':
+    main()
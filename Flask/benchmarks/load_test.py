@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the Flask backend.
+
+Seeds a temporary SQLite database (users, fingerprints, analytics and audit
+rows), then drives `create_app()` with a weighted traffic mix from
+`--concurrency` worker threads for `--duration` seconds:
+
+    login               POST /api/login
+    analytics_store     POST /api/analytics/store
+    fingerprint_update  POST /api/fingerprint/update
+    fingerprint_analyze POST /api/fingerprint/analyze
+    risk_assess         POST /api/risk/assess
+    risk_score          POST /risk-score (half anonymous, half for a seeded user)
+    admin_users         GET  /api/admin/users
+    admin_audit_logs    GET  /api/admin/audit-logs
+
+Transports:
+- inprocess: one Flask test client per worker; no sockets, measures the app;
+- socket: the app served by `socketio.run` in a child process on a local
+  port, and one keep-alive http.client connection per worker.
+
+Reports requests/s and p50/p95/p99 latency per endpoint, then compares them
+with the committed baseline for the transport in benchmarks/baselines/
+load_test.json. A p50 or p95 more than `--tolerance` above the baseline
+fails the run. So do a p99 more than twice that, total throughput more than
+`--tolerance` below it, or any unexpected status code. A worker that fails
+(a login, a dropped connection) aborts the run with exit status 1.
+Baselines are machine-specific: refresh them on the reference host with
+--update-baseline.
+
+Usage (from the Flask directory):
+    python benchmarks/load_test.py --transport inprocess --concurrency 8 --duration 20
+    python benchmarks/load_test.py --transport socket --concurrency 16
+    python benchmarks/load_test.py --transport inprocess --update-baseline
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analytics_storage import tracker_payload  # noqa: E402
+from socketio_connections import percentile  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'load_test.json')
+FLASK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PORT = 18150
+PASSWORD = 'LoadTest123!'
+ADMIN_EMAIL, ADMIN_PASSWORD = 'admin@walmart.com', 'AdminPassword123'
+
+
+def features(rng):
+    return {
+        'typing_speed': round(rng.uniform(20, 400), 1),
+        'mouse_distance': round(rng.uniform(0, 5000), 1),
+        'click_count': rng.randint(0, 120),
+        'session_duration': rng.randint(5, 3600),
+        'scroll_depth': round(rng.uniform(0, 100), 1),
+        'ip_location_score': round(rng.uniform(0, 1), 2),
+        'device_type_score': round(rng.uniform(0, 1), 2),
+    }
+
+
+# name -> (weight, method, path, auth, body(rng, ctx)); auth is 'user', 'admin' or None
+ENDPOINTS = {
+    'login': (10, 'POST', '/api/login', None,
+              lambda rng, ctx: {'email': rng.choice(ctx['emails']), 'password': PASSWORD}),
+    'analytics_store': (25, 'POST', '/api/analytics/store', 'user',
+                        lambda rng, ctx: tracker_payload(rng, f'load-{rng.randint(0, 10**6)}')),
+    'fingerprint_update': (15, 'POST', '/api/fingerprint/update', 'user', lambda rng, ctx: features(rng)),
+    'fingerprint_analyze': (10, 'POST', '/api/fingerprint/analyze', 'user', lambda rng, ctx: features(rng)),
+    'risk_assess': (10, 'POST', '/api/risk/assess', 'user', lambda rng, ctx: features(rng)),
+    'risk_score': (20, 'POST', '/risk-score', None,
+                   lambda rng, ctx: dict(features(rng), **({'user_id': rng.choice(ctx['user_ids'])}
+                                                          if rng.random() < 0.5 else {}))),
+    'admin_users': (5, 'GET', '/api/admin/users?limit=50', 'admin', None),
+    'admin_audit_logs': (5, 'GET', '/api/admin/audit-logs?limit=50', 'admin', None),
+}
+
+
+# === Seeding ===
+
+def seed(app, users, audit_rows, seed_value):
+    """Users with one shared password hash, a fingerprint and a snapshot each, and audit history."""
+    from backend import audit_chain
+    from backend.auth import hash_password
+    from backend.database import db
+    from backend.ingestion import analytics_values
+    from backend.models import AuditLog, BehavioralData, User, UserAnalytics
+
+    rng = random.Random(seed_value)
+    now = datetime.datetime.utcnow()
+    password_hash = hash_password(PASSWORD)
+    with app.app_context():
+        admin = User(email=ADMIN_EMAIL, password_hash=hash_password(ADMIN_PASSWORD), role='admin')
+        db.session.add(admin)
+        db.session.flush()
+        people = [User(email=f'load{n}@example.com', password_hash=password_hash) for n in range(users)]
+        db.session.add_all(people)
+        db.session.flush()
+        db.session.execute(BehavioralData.__table__.insert(), [
+            {'user_id': user.id, 'fingerprint_data': features(rng), 'created_at': now} for user in people
+        ])
+        db.session.execute(UserAnalytics.__table__.insert(), [
+            dict(analytics_values(user.id, tracker_payload(rng, f'seed-{user.id}'), 'full'), created_at=now)
+            for user in people
+        ])
+        actions = ['login_attempt', 'otp_attempt', 'analytics_event', 'risk_assessment']
+        for start in range(0, audit_rows, 5000):
+            rows = [{
+                'user_id': rng.choice(people).id, 'action': rng.choice(actions),
+                'details': {'success': rng.random() < 0.9, 'ip_address': f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}'},
+                'timestamp': now - datetime.timedelta(seconds=rng.randint(0, 30 * 86400)),
+            } for _ in range(start, min(audit_rows, start + 5000))]
+            audit_chain.link_rows(db.session, rows)
+            db.session.execute(AuditLog.__table__.insert(), rows)
+        db.session.commit()
+        return [user.email for user in people], [user.id for user in people]
+
+
+# === Transports ===
+
+class InProcessTransport:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body, headers):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        try:
+            return response.status_code, response.get_json(silent=True)
+        finally:
+            # Streamed listings keep their app context, and its connection, until closed
+            response.close()
+
+
+class SocketTransport:
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, method, path, body, headers):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = dict(headers, **({'Content-Type': 'application/json'} if payload is not None else {}))
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The dev server closes idle keep-alive connections; reconnect once
+            self.connection.close()
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        data = response.read()
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+def start_server(database_url):
+    """Serve create_app() from a child process; returns it once the port accepts connections."""
+    code = (
+        'from backend.app import create_app\n'
+        'app = create_app()\n'
+        f"app.extensions['socketio'].run(app, host='127.0.0.1', port={PORT}, "
+        'allow_unsafe_werkzeug=True, log_output=False)\n'
+    )
+    env = dict(os.environ, DATABASE_URL=database_url)
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=FLASK_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('Server process exited during startup')
+        try:
+            socket.create_connection(('127.0.0.1', PORT), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f'Server did not listen on port {PORT}')
+
+
+# === Load ===
+
+def login(transport, email, password):
+    status, body = transport.request('POST', '/api/login', {'email': email, 'password': password}, {})
+    if status != 200:
+        raise RuntimeError(f'Login for {email} failed with {status}')
+    return body['access_token']
+
+
+def run_load(make_transport, ctx, args):
+    names = list(ENDPOINTS)
+    weights = [ENDPOINTS[name][0] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    timing = {}
+
+    def begin():
+        # Runs once every worker has logged in, before any of them is released
+        now = time.perf_counter()
+        timing['warm_until'] = now + args.warmup
+        timing['stop_at'] = now + args.warmup + args.duration
+
+    start = threading.Barrier(args.concurrency, action=begin)
+    failures = []
+
+    def worker(index):
+        try:
+            run_worker(index)
+        except threading.BrokenBarrierError:
+            # Another worker failed before the start; it recorded why
+            pass
+        except Exception as e:
+            with lock:
+                failures.append(f'worker {index}: {e!r}')
+            # Release the workers still waiting for the start
+            start.abort()
+
+    def run_worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        transport = make_transport()
+        user_email = ctx['emails'][index % len(ctx['emails'])]
+        tokens = {'user': login(transport, user_email, PASSWORD), 'admin': login(transport, ADMIN_EMAIL, ADMIN_PASSWORD)}
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        start.wait()
+        warm_until, stop_at = timing['warm_until'], timing['stop_at']
+        while True:
+            name = rng.choices(names, weights)[0]
+            _, method, path, auth, body = ENDPOINTS[name]
+            headers = {'Authorization': f'Bearer {tokens[auth]}'} if auth else {}
+            payload = body(rng, ctx) if body else None
+            began = time.perf_counter()
+            status, _ = transport.request(method, path, payload, headers)
+            ended = time.perf_counter()
+            if began < warm_until:
+                continue
+            if status >= 400:
+                local_errors[name] += 1
+            if ended >= stop_at:
+                break
+            local[name].append(ended - began)
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise RuntimeError('Load workers failed: ' + '; '.join(failures))
+
+    endpoints = {}
+    for name in names:
+        latencies = samples[name]
+        endpoints[name] = {
+            'requests': len(latencies),
+            'rps': len(latencies) / args.duration,
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'errors': errors[name],
+        }
+    return {
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'total_rps': sum(item['requests'] for item in endpoints.values()) / args.duration,
+        'endpoints': endpoints,
+    }
+
+
+# === Reporting ===
+
+def print_results(transport, results):
+    print(f"\n{transport}: {results['concurrency']} workers, {results['duration']:.0f}s, "
+          f"{results['total_rps']:.0f} requests/s")
+    print(f"{'endpoint':<21}{'requests':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, item in results['endpoints'].items():
+        print(f"{name:<21}{item['requests']:>9}{item['rps']:>8.1f}{item['p50']:>9.1f}{item['p95']:>9.1f}"
+              f"{item['p99']:>9.1f}{item['errors']:>8}")
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against `baseline`, as printable strings."""
+    regressions = []
+    for name, item in results['endpoints'].items():
+        if item['errors']:
+            regressions.append(f"{name}: {item['errors']} error responses")
+        base = baseline['endpoints'].get(name)
+        if not base or not item['requests']:
+            continue
+        for metric, allowed in (('p50', tolerance), ('p95', tolerance), ('p99', 2 * tolerance)):
+            # Sub-millisecond latencies are noise; allow at least 1 ms of slack
+            limit = max(base[metric] * (1 + allowed), base[metric] + 1.0)
+            if item[metric] > limit:
+                regressions.append(f"{name}: {metric} {item[metric]:.1f} ms > {limit:.1f} ms "
+                                   f"(baseline {base[metric]:.1f} ms)")
+    floor = baseline['total_rps'] * (1 - tolerance)
+    if results['total_rps'] < floor:
+        regressions.append(f"throughput {results['total_rps']:.0f} req/s < {floor:.0f} req/s "
+                           f"(baseline {baseline['total_rps']:.0f} req/s)")
+    return regressions
+
+
+def load_baselines():
+    try:
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test')
+    parser.add_argument('--transport', choices=['inprocess', 'socket'], default='inprocess')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=3.0, help='unmeasured seconds first')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--audit-rows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed fractional slowdown')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = 'sqlite:///' + os.path.join(tmp, 'load_test.db')
+        os.environ['DATABASE_URL'] = database_url
+        from backend.app import create_app
+
+        app = create_app()
+        emails, user_ids = seed(app, args.users, args.audit_rows, args.seed)
+        ctx = {'emails': emails, 'user_ids': user_ids}
+
+        server = None
+        if args.transport == 'socket':
+            server = start_server(database_url)
+            make_transport = lambda: SocketTransport(PORT)  # noqa: E731
+        else:
+            make_transport = lambda: InProcessTransport(app)  # noqa: E731
+        try:
+            results = run_load(make_transport, ctx, args)
+        except RuntimeError as e:
+            print(f"\nLOAD TEST FAILED: {e}")
+            sys.exit(1)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(10)
+
+    print_results(args.transport, results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baselines = load_baselines()
+    if args.update_baseline:
+        baselines[args.transport] = results
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline for {args.transport} written to {BASELINE_PATH}")
+        return
+
+    baseline = baselines.get(args.transport)
+    if baseline is None:
+        print(f"\nNo {args.transport} baseline in {BASELINE_PATH}; run with --update-baseline to record one")
+        return
+    if baseline['concurrency'] != args.concurrency:
+        print(f"\nWARNING: baseline was recorded at concurrency {baseline['concurrency']}")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nREGRESSION against the {args.transport} baseline (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions against the {args.transport} baseline (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cost of the Prometheus instrumentation (backend/metrics.py) per request.
+
+Runs the app in process with METRICS_ENABLED off and on, each in its own
+child process (the registry is process-wide), and times `--requests`
+calls of a route without SQL (`/`) and of one with a few queries
+(`/api/analytics/user/<id>`). Prints the best mean per request in each mode
+and the difference. On a busy or single-core host that difference is within
+run-to-run noise, so the hooks are also timed directly, per request and per
+SQL statement. Last comes the size and render time of a scrape.
+
+Usage (from the Flask directory):
+    python benchmarks/metrics_overhead.py --requests 5000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROUTES = ['/', '/api/analytics/user/{user_id}']
+
+
+def measure(requests, rounds):
+    """Child process: mean microseconds per request for each route (best of `rounds`)."""
+    from backend.app import create_app
+    from backend.auth import create_token, hash_password
+    from backend.database import db
+    from backend.metrics import metrics
+    from backend.models import User
+
+    app = create_app()
+    with app.app_context():
+        user = User(email='metrics@example.com', password_hash=hash_password('x'))
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        headers = {'Authorization': f'Bearer {create_token(user_id, "metrics@example.com", "user")}'}
+    client = app.test_client()
+    result = {}
+    for route in ROUTES:
+        path = route.format(user_id=user_id)
+        best = float('inf')
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(requests):
+                response = client.get(path, headers=headers)
+                # Servers close the response; the metrics are recorded then
+                response.close()
+            best = min(best, (time.perf_counter() - started) / requests * 1e6)
+        result[route] = best
+    result.update(hook_costs())
+    started = time.perf_counter()
+    text = metrics.render()
+    result['render_ms'] = (time.perf_counter() - started) * 1000
+    result['render_bytes'] = len(text)
+    return result
+
+
+def hook_costs(iterations=200000):
+    """Microseconds the hooks add per SQL statement and per request, timed directly."""
+    from backend import metrics as instrumentation
+
+    def execute(*args):
+        pass
+
+    timed = instrumentation._timed(execute)
+    instrumentation._current.db = [0, 0.0]
+    started = time.perf_counter()
+    for _ in range(iterations):
+        execute(None, 'SELECT 1', (), None)
+    bare = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(iterations):
+        timed(None, 'SELECT 1', (), None)
+    per_query = (time.perf_counter() - started - bare) / iterations * 1e6
+    instrumentation._current.db = None
+
+    registry = instrumentation.metrics
+    started = time.perf_counter()
+    for _ in range(iterations):
+        # What _start_request and the on-close record() do besides reading the request
+        instrumentation._current.db = [0, 0.0]
+        instrumentation._current.started = time.perf_counter()
+        registry.requests.observe(time.perf_counter() - instrumentation._current.started, 'GET', '/bench', '200')
+        registry.request_queries.observe(3, '/bench')
+        registry.request_db_time.observe(0.0004, '/bench')
+        registry.queries.inc(3, 'request')
+        registry.query_time.inc(0.0004, 'request')
+    per_request = (time.perf_counter() - started) / iterations * 1e6
+    instrumentation._current.db = None
+    return {'per_query_us': per_query, 'per_request_us': per_request}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prometheus instrumentation overhead')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--child', choices=['off', 'on'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.requests, args.rounds)))
+        return
+
+    results = {}
+    for mode in ('off', 'on'):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tmp, 'metrics.db'),
+                       METRICS_ENABLED='true' if mode == 'on' else 'false')
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', mode, '--requests', str(args.requests),
+                 '--rounds', str(args.rounds)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'route':<34}{'off us':>10}{'on us':>10}{'overhead us':>13}")
+    for route in ROUTES:
+        off, on = results['off'][route], results['on'][route]
+        print(f"{route:<34}{off:>10.1f}{on:>10.1f}{on - off:>13.1f}  ({(on - off) / off * 100:.1f}%)")
+    print(f"hooks timed directly: {results['on']['per_request_us']:.1f} us per request "
+          f"+ {results['on']['per_query_us']:.2f} us per SQL statement")
+    print(f"scrape: {results['on']['render_bytes']} bytes rendered in {results['on']['render_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the compiled payload decoders.
+
+Compares, per tracker snapshot:
+
+- legacy:   the nested `data.get('typing', {}).get(...)` chains the analytics
+            endpoint used before decoders.py (no validation; crashes on a
+            missing focusEvents)
+- legacy+validate: the same, preceded by the old hand-written validation the
+            batch endpoint ran
+- compiled: decoders.ANALYTICS.decode (validates and flattens in one pass)
+- values:   ingestion.analytics_values, i.e. decode plus building the row
+
+and reports decodes per second and microseconds per payload.
+
+Usage (from the Flask directory):
+    python benchmarks/payload_decoders.py --payloads 50000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analytics_storage import tracker_payload  # noqa: E402
+
+
+def legacy_values(data):
+    return dict(
+        session_id=data.get('sessionId', ''),
+        page_url=data.get('pageUrl'),
+        user_agent=data.get('userAgent'),
+        typing_wpm=data.get('typing', {}).get('wpm'),
+        typing_keystrokes=data.get('typing', {}).get('keystrokes'),
+        typing_corrections=data.get('typing', {}).get('backspaces'),
+        mouse_clicks=data.get('mouse', {}).get('clicks'),
+        mouse_movements=data.get('mouse', {}).get('totalDistance'),
+        mouse_velocity=data.get('mouse', {}).get('averageSpeed'),
+        mouse_idle_time=data.get('mouse', {}).get('idleTime'),
+        scroll_depth=data.get('scroll', {}).get('maxDepth'),
+        scroll_speed=data.get('scroll', {}).get('scrollSpeed'),
+        scroll_events=data.get('scroll', {}).get('totalScrollDistance'),
+        focus_changes=data.get('focus', {}).get('focusEvents') + data.get('focus', {}).get('blurEvents', 0),
+        focus_time=data.get('focus', {}).get('totalFocusTime'),
+        tab_switches=data.get('focus', {}).get('tabSwitches'),
+        session_duration=data.get('sessionDuration'),
+        interactions_count=data.get('typing', {}).get('keystrokes', 0) + data.get('mouse', {}).get('clicks', 0),
+        analytics_metadata=data,
+    )
+
+
+def legacy_validate(data):
+    if not isinstance(data, dict) or not data:
+        return 'Snapshot must be a non-empty object'
+    for section in ('typing', 'mouse', 'scroll', 'focus'):
+        if section in data and not isinstance(data[section], dict):
+            return f"'{section}' must be an object"
+    if not isinstance(data.get('focus', {}).get('focusEvents'), (int, float)):
+        return "'focus.focusEvents' is required and must be a number"
+    for section, field in (('focus', 'blurEvents'), ('typing', 'keystrokes'), ('mouse', 'clicks')):
+        if field in data.get(section, {}) and not isinstance(data[section][field], (int, float)):
+            return f"'{section}.{field}' must be a number"
+    return None
+
+
+def legacy_validated_values(data):
+    if legacy_validate(data) is None:
+        return legacy_values(data)
+
+
+def measure(fn, payloads, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for payload in payloads:
+            fn(payload)
+        best = min(best, time.perf_counter() - started)
+    return len(payloads) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare compiled decoders with the legacy .get() chains')
+    parser.add_argument('--payloads', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5, help='runs per variant; the best one is reported')
+    args = parser.parse_args()
+
+    from backend.decoders import ANALYTICS
+    from backend.ingestion import analytics_values
+
+    rng = random.Random(7)
+    payloads = [tracker_payload(rng, f'session_{i // 20}') for i in range(args.payloads)]
+
+    variants = {
+        'legacy': legacy_values,
+        'legacy+validate': legacy_validated_values,
+        'compiled': ANALYTICS.decode,
+        'values': lambda data: analytics_values(1, data),
+    }
+    rates = {name: measure(fn, payloads, args.repeat) for name, fn in variants.items()}
+
+    print(f"\n{'variant':<17}{'payloads/s':>12}{'us/payload':>12}{'vs legacy':>11}")
+    for name, rate in rates.items():
+        print(f"{name:<17}{rate:>12.0f}{1e6 / rate:>12.2f}{rate / rates['legacy']:>10.2f}x")
+
+
+if __name__ == '__main__':
+    main()
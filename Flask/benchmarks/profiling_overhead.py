@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Cost of the request profiler (backend/profiling.py) per request.
+
+Runs the app in process once per profiler setting, each in its own child
+process (the profiler is process-wide), and times `--requests` calls of
+`/api/analytics/user/<id>`:
+
+- off: no PROFILE_* settings, nothing installed
+- slow: PROFILE_SLOW_MS set high enough that nothing is kept, so every
+  request is tracked by the stack sampler and then dropped
+- stack: PROFILE_SAMPLE_RATE=1, every request sampled and kept
+- cprofile: PROFILE_SAMPLE_RATE=1 with PROFILE_MODE=cprofile
+
+Prints the best mean per request of each setting and its difference from
+off. Metrics are turned off in every child so only the profiler differs.
+
+Usage (from the Flask directory):
+    python benchmarks/profiling_overhead.py --requests 2000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROUTE = '/api/analytics/user/{user_id}'
+
+SETTINGS = {
+    'off': {},
+    'slow': {'PROFILE_SLOW_MS': '60000'},
+    'stack': {'PROFILE_SAMPLE_RATE': '1'},
+    'cprofile': {'PROFILE_SAMPLE_RATE': '1', 'PROFILE_MODE': 'cprofile'},
+}
+
+
+def measure(requests, rounds):
+    """Child process: mean microseconds per request (best of `rounds`) and the traces kept."""
+    from backend.app import create_app
+    from backend.auth import create_token, hash_password
+    from backend.database import db
+    from backend.models import User
+    from backend.profiling import profiler
+
+    app = create_app()
+    with app.app_context():
+        user = User(email='profiling@example.com', password_hash=hash_password('x'))
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        headers = {'Authorization': f'Bearer {create_token(user_id, "profiling@example.com", "user")}'}
+    client = app.test_client()
+    path = ROUTE.format(user_id=user_id)
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = client.get(path, headers=headers)
+            # Servers close the response; traces are finished then
+            response.close()
+        best = min(best, (time.perf_counter() - started) / requests * 1e6)
+    return {'us': best, 'kept': len(profiler.summaries())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Request profiler overhead')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--child', choices=list(SETTINGS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.requests, args.rounds)))
+        return
+
+    results = {}
+    for name, settings in SETTINGS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {key: value for key, value in os.environ.items() if not key.startswith('PROFILE_')}
+            env.update(settings, DATABASE_URL='sqlite:///' + os.path.join(tmp, 'profiling.db'),
+                       METRICS_ENABLED='false')
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', name, '--requests', str(args.requests),
+                 '--rounds', str(args.rounds)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            results[name] = json.loads(output.strip().splitlines()[-1])
+
+    off = results['off']['us']
+    print(f"{'setting':<12}{'us/request':>12}{'overhead us':>13}{'kept':>7}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['us']:>12.1f}{result['us'] - off:>13.1f}{result['kept']:>7}"
+              f"  ({(result['us'] - off) / off * 100:.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
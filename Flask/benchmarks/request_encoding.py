@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Bandwidth and parse-cost benchmark for ingestion request encodings.
+
+Encodes realistic tracker snapshots as plain JSON, gzip/deflate JSON, msgpack
+and gzip msgpack, then reports bytes on the wire per payload and the server
+CPU time `read_payload` (the decoder behind the ingestion endpoints) spends
+per payload for each encoding.
+
+Usage (from the Flask directory):
+    python benchmarks/request_encoding.py --payloads 20000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+import msgpack
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analytics_storage import tracker_payload  # noqa: E402
+
+ENCODINGS = {
+    'json': ('application/json', None, lambda p: json.dumps(p).encode('utf-8')),
+    'json+gzip': ('application/json', 'gzip', lambda p: gzip.compress(json.dumps(p).encode('utf-8'))),
+    'json+deflate': ('application/json', 'deflate', lambda p: zlib.compress(json.dumps(p).encode('utf-8'))),
+    'msgpack': ('application/msgpack', None, lambda p: msgpack.packb(p, use_bin_type=True)),
+    'msgpack+gzip': ('application/msgpack', 'gzip', lambda p: gzip.compress(msgpack.packb(p, use_bin_type=True))),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ingestion request encodings')
+    parser.add_argument('--payloads', type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    from backend.app import create_app
+    from backend.request_bodies import read_payload
+
+    app = create_app()
+    rng = random.Random(7)
+    payloads = [tracker_payload(rng, f'session_{i // 20}') for i in range(args.payloads)]
+
+    results = {}
+    for name, (mimetype, encoding, encode) in ENCODINGS.items():
+        bodies = [encode(p) for p in payloads]
+        headers = {'Content-Encoding': encoding} if encoding else {}
+        environs = [
+            app.test_request_context('/api/analytics/store', method='POST', data=body,
+                                     content_type=mimetype, headers=headers)
+            for body in bodies
+        ]
+        started = time.process_time()
+        for ctx in environs:
+            with ctx:
+                decoded = read_payload()
+        cpu = time.process_time() - started
+        assert decoded == payloads[-1]
+        results[name] = (sum(map(len, bodies)) / len(bodies), cpu / len(bodies) * 1e6)
+
+    base_bytes, base_cpu = results['json']
+    print(f"\n{'encoding':<14}{'B/payload':>11}{'vs json':>9}{'parse us':>10}{'vs json':>9}")
+    for name, (size, cpu_us) in results.items():
+        print(f"{name:<14}{size:>11.0f}{size / base_bytes:>8.0%} {cpu_us:>10.1f}{cpu_us / base_cpu:>8.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Concurrent-connection benchmark for the Socket.IO server.
+
+Starts one or more backend nodes (`python -m backend.server`, eventlet by
+default) and opens, from a single asyncio process:
+
+- `--idle` clients (default 10000) that connect, answer pings and stay quiet;
+- `--active` clients (default 1000) that connect with a user token, join
+  their user room and send `request_analytics` every `--interval` seconds
+  for `--duration` seconds, timing each round trip to the `analytics_update`
+  reply.
+
+Reports connection setup rate, server memory, round-trip percentiles and
+timeouts. Clients are spread round-robin over the nodes; with more than one
+node pass a shared `--message-queue` (e.g. redis://localhost:6379/0).
+
+The client speaks Engine.IO v4 / Socket.IO v5 directly over a WebSocket
+(wsproto), so thousands of connections cost one coroutine each.
+
+Usage (from the Flask directory):
+    python benchmarks/socketio_connections.py --idle 10000 --active 1000
+    python benchmarks/socketio_connections.py --nodes 2 --message-queue redis://localhost:6379/0
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import secrets
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import jwt
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import (AcceptConnection, BytesMessage, CloseConnection, Ping, RejectConnection, Request,
+                             TextMessage)
+
+FLASK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Shared by the nodes, so the tokens of the active clients are valid on all of them
+SECRET_KEY = secrets.token_hex(32)
+
+
+class SocketIOClient:
+    """Minimal Socket.IO client: default namespace, text and binary events, ping replies."""
+
+    def __init__(self, host, port, encoding=None, auth=None):
+        self.host = host
+        self.port = port
+        self.encoding = encoding
+        # Namespace connect payload, e.g. {'token': jwt}
+        self.auth = auth
+        self.events = asyncio.Queue()
+        self._text = []
+        self._bytes = []
+        # (event, args, attachments still expected) for a binary event being received
+        self._binary = None
+        self.bytes_received = 0
+
+    async def connect(self, timeout=30):
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+        self.ws = WSConnection(ConnectionType.CLIENT)
+        target = '/socket.io/?EIO=4&transport=websocket'
+        if self.encoding:
+            target += f'&encoding={self.encoding}'
+        self.writer.write(self.ws.send(Request(host=f'{self.host}:{self.port}', target=target)))
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+        # Engine.IO open packet, then the Socket.IO namespace connect
+        await asyncio.wait_for(self._wait_for('connected'), timeout)
+
+    async def _wait_for(self, name):
+        while True:
+            event, _ = await self.events.get()
+            if event == name:
+                return
+            if event == 'closed':
+                raise ConnectionError('connection closed during handshake')
+
+    def _send_text(self, text):
+        self.writer.write(self.ws.send(TextMessage(data=text)))
+
+    def emit(self, event, data):
+        self._send_text('42' + json.dumps([event, data], separators=(',', ':')))
+
+    def _handle_packet(self, text):
+        if text.startswith('0'):
+            self._send_text('40' + (json.dumps(self.auth, separators=(',', ':')) if self.auth else ''))
+        elif text == '2':
+            self._send_text('3')
+        elif text.startswith('40'):
+            self.events.put_nowait(('connected', None))
+        elif text.startswith('42'):
+            event, *args = json.loads(text[2:])
+            self.events.put_nowait((event, args[0] if args else None))
+        elif text.startswith('45'):
+            # Binary event: "45<n>-[...]" followed by n binary frames
+            count, _, body = text[2:].partition('-')
+            event, *args = json.loads(body)
+            self._binary = (event, args, int(count), [])
+
+    def _handle_attachment(self, data):
+        event, args, count, attachments = self._binary
+        attachments.append(data)
+        if len(attachments) == count:
+            self._binary = None
+            args = [attachments[arg['num']] if isinstance(arg, dict) and arg.get('_placeholder') else arg
+                    for arg in args]
+            self.events.put_nowait((event, args[0] if args else None))
+
+    async def _read_loop(self):
+        try:
+            while True:
+                data = await self.reader.read(65536)
+                if not data:
+                    break
+                self.bytes_received += len(data)
+                self.ws.receive_data(data)
+                for event in self.ws.events():
+                    if isinstance(event, TextMessage):
+                        self._text.append(event.data)
+                        if event.message_finished:
+                            self._handle_packet(''.join(self._text))
+                            self._text = []
+                    elif isinstance(event, BytesMessage):
+                        self._bytes.append(event.data)
+                        if event.message_finished:
+                            if self._binary:
+                                self._handle_attachment(b''.join(self._bytes))
+                            self._bytes = []
+                    elif isinstance(event, Ping):
+                        self.writer.write(self.ws.send(event.response()))
+                    elif isinstance(event, (CloseConnection, RejectConnection)):
+                        return
+                    elif isinstance(event, AcceptConnection):
+                        continue
+                await self.writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.events.put_nowait(('closed', None))
+
+    async def wait_event(self, name, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            event, data = await asyncio.wait_for(self.events.get(), remaining)
+            if event == name:
+                return data
+            if event == 'closed':
+                raise ConnectionError('connection closed')
+
+    def close(self):
+        self._reader_task.cancel()
+        self.writer.close()
+
+
+def start_node(port, db_path, async_mode, message_queue):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', SOCKETIO_ASYNC_MODE=async_mode,
+               SECRET_KEY=SECRET_KEY)
+    if message_queue:
+        env['SOCKETIO_MESSAGE_QUEUE'] = message_queue
+    return subprocess.Popen(
+        [sys.executable, '-m', 'backend.server', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=FLASK_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def admin_auth(app):
+    """Connect payload proving an admin, for a node served by `app` in this process."""
+    from backend.auth import create_token
+
+    with app.app_context():
+        return {'token': create_token(1, 'admin@example.com', 'admin')}
+
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def user_auth(user_id):
+    """Connect payload proving `user_id` to the nodes started by start_node()."""
+    payload = {'user_id': user_id, 'role': 'user', 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)}
+    return {'token': jwt.encode(payload, SECRET_KEY, algorithm='HS256')}
+
+
+async def open_clients(ports, count, concurrency, first_user_id=None):
+    """Connect `count` clients; with `first_user_id`, client n proves user first_user_id + n."""
+    semaphore = asyncio.Semaphore(concurrency)
+    clients, failures = [], 0
+
+    async def open_one(index):
+        nonlocal failures
+        async with semaphore:
+            user_id = None if first_user_id is None else first_user_id + index
+            client = SocketIOClient('127.0.0.1', ports[index % len(ports)],
+                                    auth=user_auth(user_id) if user_id is not None else None)
+            client.user_id = user_id
+            try:
+                await client.connect()
+                clients.append(client)
+            except (OSError, ConnectionError, asyncio.TimeoutError):
+                failures += 1
+
+    await asyncio.gather(*(open_one(i) for i in range(count)))
+    return clients, failures
+
+
+async def run_active(client, user_id, duration, interval, timeout, latencies, counters):
+    client.emit('join_user_room', {'user_id': user_id})
+    await client.wait_event('status', timeout)
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        client.emit('request_analytics', {'user_id': user_id, 'role': 'user'})
+        try:
+            await client.wait_event('analytics_update', timeout)
+            latencies.append(time.perf_counter() - started)
+        except (asyncio.TimeoutError, ConnectionError):
+            counters['timeouts'] += 1
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def benchmark(args, ports, pids):
+    baseline = sum(rss_mb(pid) for pid in pids)
+    started = time.perf_counter()
+    idle, idle_failures = await open_clients(ports, args.idle, args.concurrency)
+    idle_seconds = time.perf_counter() - started
+    print(f"idle:   {len(idle)} connected, {idle_failures} failed, "
+          f"{len(idle) / idle_seconds:.0f} connections/s")
+
+    active, active_failures = await open_clients(ports, args.active, args.concurrency, first_user_id=100000)
+    print(f"active: {len(active)} connected, {active_failures} failed")
+    memory = sum(rss_mb(pid) for pid in pids)
+    print(f"server RSS: {baseline:.0f} MB idle, {memory:.0f} MB with {len(idle) + len(active)} clients "
+          f"({(memory - baseline) * 1024 / max(1, len(idle) + len(active)):.1f} KB/connection)")
+
+    latencies, counters = [], {'timeouts': 0}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_active(client, client.user_id, args.duration, args.interval, args.timeout, latencies, counters)
+        for client in active
+    ), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    still_open = sum(1 for client in idle if not client.writer.is_closing() and not client._reader_task.done())
+    print(f"\nround trips: {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.0f}/s), "
+          f"{counters['timeouts']} timeouts")
+    if latencies:
+        print(f"latency ms: p50 {percentile(latencies, 50) * 1000:.1f}  p95 {percentile(latencies, 95) * 1000:.1f}  "
+              f"p99 {percentile(latencies, 99) * 1000:.1f}  mean {statistics.mean(latencies) * 1000:.1f}")
+    print(f"idle clients still connected: {still_open}/{len(idle)}")
+
+    for client in idle + active:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Socket.IO concurrent-connection benchmark')
+    parser.add_argument('--idle', type=int, default=10000)
+    parser.add_argument('--active', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of active traffic')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between requests per active client')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=200, help='connections being opened at once')
+    parser.add_argument('--nodes', type=int, default=1)
+    parser.add_argument('--base-port', type=int, default=18000)
+    parser.add_argument('--async-mode', default='eventlet', choices=['eventlet', 'gevent', 'threading'])
+    parser.add_argument('--message-queue', help='shared queue URL; required with --nodes > 1')
+    args = parser.parse_args()
+
+    if args.nodes > 1 and not args.message_queue:
+        parser.error('--nodes > 1 needs --message-queue')
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = args.idle + args.active + 100
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ports = [args.base_port + n for n in range(args.nodes)]
+        nodes = [start_node(port, os.path.join(tmp, 'bench.db'), args.async_mode, args.message_queue)
+                 for port in ports]
+        try:
+            async def run():
+                for port in ports:
+                    await wait_for_port(port)
+                await benchmark(args, ports, [node.pid for node in nodes])
+            asyncio.run(run())
+        finally:
+            for node in nodes:
+                node.terminate()
+                node.wait(10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Bytes on the wire and server CPU for the dashboard stream encodings.
+
+For a realistic `risk_data_update` (a coalesced window of per-user updates)
+and `analytics_update` (a live metrics snapshot), encodes `--messages`
+emits the way the server does, per encoding:
+
+- json: the default, a JSON text packet with an ISO timestamp;
+- msgpack: what a client that negotiated msgpack receives, a binary event
+  whose single argument is the msgpack-packed message;
+- msgpack-server: python-socketio's server-wide msgpack serializer, for
+  reference (it can't be negotiated per client).
+
+Wire bytes include the WebSocket frame headers. CPU is process time to
+encode, including the Socket.IO packet.
+
+With --live it also starts a node, connects one JSON and one msgpack admin
+client and broadcasts the messages through emit_to_admin, checking that
+both decode the same content and counting the bytes each one received.
+
+Usage (from the Flask directory):
+    python benchmarks/socketio_serialization.py --messages 10000 --live
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import msgpack  # noqa: E402
+from socketio import msgpack_packet, packet  # noqa: E402
+
+from backend.socket_codec import JSON, MSGPACK, encode  # noqa: E402
+
+PORT = 18130
+
+
+def risk_message(rng, users=20):
+    updates = [{
+        'user_id': rng.randint(1, 100000),
+        'risk_score': rng.uniform(0, 100),
+        'risk_label': rng.choice(['low', 'medium', 'high']),
+        'component_scores': {
+            'ml_score': rng.uniform(0, 100),
+            'ml_risk_label': rng.choice(['low', 'medium', 'high']),
+            'fingerprint_diff': rng.uniform(0, 50),
+            'intent_score': rng.uniform(5, 30),
+        },
+    } for _ in range(users)]
+    return {'type': 'risk_data', 'data': updates[-1], 'updates': updates, 'coalesced': users * 3,
+            'timestamp': datetime.datetime.now()}
+
+
+def analytics_message(rng):
+    return {'type': 'user_analytics', 'data': {
+        'active_users': rng.randint(0, 5000),
+        'new_users': rng.randint(0, 100),
+        'analytics_snapshots': rng.randint(0, 100000),
+        'average_session_duration': round(rng.uniform(60, 3600), 1),
+        'login_success_rate': round(rng.uniform(80, 100), 1),
+        'window_seconds': 300,
+    }, 'coalesced': 1, 'timestamp': datetime.datetime.now()}
+
+
+def frame_bytes(payload):
+    size = len(payload)
+    return size + (2 if size < 126 else 4 if size < 65536 else 10)
+
+
+def encode_json(event, message):
+    return packet.Packet(packet.EVENT, data=[event, encode(message, JSON)]).encode()
+
+
+def encode_msgpack(event, message):
+    return packet.Packet(packet.EVENT, data=[event, encode(message, MSGPACK)]).encode()
+
+
+def encode_msgpack_server(event, message):
+    return msgpack_packet.MsgPackPacket(packet.EVENT, data=[event, encode(message, JSON)]).encode()
+
+
+def wire_bytes(encoded):
+    if isinstance(encoded, list):
+        # Text header plus one frame per binary attachment
+        return frame_bytes(encoded[0].encode()) + sum(frame_bytes(part) for part in encoded[1:])
+    if isinstance(encoded, str):
+        encoded = encoded.encode()
+    return frame_bytes(encoded)
+
+
+ENCODERS = {'json': encode_json, 'msgpack': encode_msgpack, 'msgpack-server': encode_msgpack_server}
+
+
+def offline(args):
+    for event, build in (('risk_data_update', risk_message), ('analytics_update', analytics_message)):
+        rng = random.Random(args.seed)
+        messages = [build(rng) for _ in range(args.messages)]
+        print(f"\n{event} ({args.messages} messages)")
+        print(f"{'encoding':<16}{'bytes/msg':>10}{'MB total':>10}{'CPU s':>8}{'us/msg':>8}")
+        baseline = None
+        for name, encoder in ENCODERS.items():
+            started = time.process_time()
+            encoded = [encoder(event, message) for message in messages]
+            cpu = time.process_time() - started
+            total = sum(wire_bytes(item) for item in encoded)
+            baseline = baseline or total
+            print(f"{name:<16}{total / len(messages):>10.0f}{total / 1e6:>10.2f}{cpu:>8.2f}"
+                  f"{cpu / len(messages) * 1e6:>8.1f}   ({100.0 * total / baseline:.0f}% of json bytes)")
+
+
+async def live_check(websocket, args, auth):
+    from socketio_connections import SocketIOClient, wait_for_port
+
+    await wait_for_port(PORT)
+    clients = {}
+    for encoding in (JSON, MSGPACK):
+        client = SocketIOClient('127.0.0.1', PORT, encoding=encoding, auth=auth)
+        await client.connect()
+        client.emit('join_admin_room', {})
+        await client.wait_event('status', 5)
+        # Drain the live metric snapshots sent on joining
+        await asyncio.sleep(0.5)
+        while not client.events.empty():
+            client.events.get_nowait()
+        client.bytes_received = 0
+        clients[encoding] = client
+
+    rng = random.Random(args.seed)
+    sent = [risk_message(rng) for _ in range(args.messages)]
+    received = {encoding: [] for encoding in clients}
+
+    async def collect(encoding, client):
+        while len(received[encoding]) < len(sent):
+            message = await client.wait_event('risk_data_update', 30)
+            if encoding == MSGPACK:
+                if not isinstance(message, bytes):
+                    raise TypeError("msgpack client was sent a JSON message")
+                message = msgpack.unpackb(message)
+            # Live metric snapshots share the event name; keep only ours
+            if 'updates' in message:
+                received[encoding].append(message)
+
+    collectors = [asyncio.ensure_future(collect(encoding, client)) for encoding, client in clients.items()]
+    for message in sent:
+        websocket.emit_to_admin('risk_data_update', message)
+        await asyncio.sleep(0)
+    await asyncio.gather(*collectors)
+
+    print(f"\nlive: {len(sent)} risk_data_update broadcasts through emit_to_admin")
+    same = all(j['updates'] == m['updates'] and j['data'] == m['data']
+               for j, m in zip(received[JSON], received[MSGPACK]))
+    for encoding, client in clients.items():
+        print(f"{encoding:<8} client received {client.bytes_received / 1e6:.2f} MB "
+              f"({client.bytes_received / len(sent):.0f} bytes/msg)")
+        client.close()
+    print(f"content identical after decoding: {same}")
+    return same
+
+
+def live(args):
+    from backend import app as app_module
+    from backend import websocket
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app_module.Config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp, 'serialization.db')
+        app = app_module.create_app()
+        socketio = app.extensions['socketio']
+        threading.Thread(
+            target=socketio.run, args=(app,),
+            kwargs={'host': '127.0.0.1', 'port': PORT, 'allow_unsafe_werkzeug': True, 'log_output': False},
+            daemon=True
+        ).start()
+        from socketio_connections import admin_auth
+        return asyncio.run(live_check(websocket, args, admin_auth(app)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Socket.IO stream encoding benchmark')
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--live', action='store_true', help='also broadcast through a running node')
+    args = parser.parse_args()
+
+    offline(args)
+    if args.live and not live(args):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
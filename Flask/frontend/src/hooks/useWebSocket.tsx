@@ -24,6 +24,8 @@ export const useWebSocket = () => {
       reconnection: true,
       reconnectionAttempts: 5,
       reconnectionDelay: 1000,
+      // Proves who we are, so request_analytics can answer with our own figures
+      auth: (cb) => cb({ token: localStorage.getItem('token') }),
     });
 
     socketRef.current = socket;